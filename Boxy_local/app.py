@@ -1,20 +1,46 @@
 from flask import Flask, render_template, request, jsonify, session, make_response
 import secrets
 import os
-import requests
+import http_client
+import metrics
+import app_logging
+import logging
+import query_stats
+import profiling
 import hashlib
-import hmac
 import csv
 import io
+import time
 from datetime import datetime, timedelta
 from database import get_db_connection, init_database
-from config import RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET
+from cache import TTLCache, ChangeNotifier
+from json_provider import BoxyJSONProvider
+from app_logging import setup_logging
+from rows import Delivery, DeliverySummary, attach_stops, fetch_all
+from delivery_events import get_timeline, get_events_since, get_event_counts
+from bookings import next_delivery_ids, build_booking, insert_bookings, booking_response
+from pricing import calculate_total_distance, calculate_price
+from quotes import QUOTE_TTL, issue_quote, quote_key, redeem_quote
+from bulk_import import MAX_BULK_ROWS, import_bookings, rows_from_csv, rows_from_json
+from validation import validate_tracking_id
+import schema
+import delivery_state
+from payments import (verify_checkout_signature, verify_webhook_signature, parse_webhook,
+                      record_payment, apply_payment, received_payment_ids, tracking_id_for_order)
+from background import run_in_background
+from payment_orders import prepare_payment, OrderError
+from config import RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET, RAZORPAY_WEBHOOK_SECRET
 from email_service import send_confirmation_email, send_tracking_update, send_payment_receipt, send_password_reset_otp_email, send_registration_otp_email
-import sys
-sys.stdout.reconfigure(encoding='utf-8')
 
 
+setup_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
+app.json = BoxyJSONProvider(app)
+app_logging.init_app(app)
+metrics.init_app(app)
+profiling.init_app(app)
 app.secret_key = secrets.token_hex(16)
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
@@ -51,10 +77,16 @@ def partner():
     return render_template('partner.html')
 
 # API Routes for Partner Operations
+def invalid_payload(errors):
+    """400 for a payload that failed its schema: the first error as the message, plus all of them"""
+    return jsonify({'success': False, 'message': errors[0], 'errors': errors}), 400
+
 @app.route('/api/partner/register', methods=['POST'])
 def partner_register():
     try:
-        data = request.json
+        data, errors = schema.PARTNER_REGISTRATION.validate(request.json)
+        if errors:
+            return invalid_payload(errors)
         
         # Generate partner ID
         with get_db_connection() as conn:
@@ -64,7 +96,7 @@ def partner_register():
             partner_id = f"PARTNER{count + 1:04d}"
             
             # Check if email already exists
-            cursor.execute("SELECT id FROM partners WHERE email = %s", (data.get('email'),))
+            cursor.execute("SELECT id FROM partners WHERE email = %s", (data['email'],))
             if cursor.fetchone():
                 return jsonify({'success': False, 'message': 'Email already registered'}), 400
             
@@ -75,14 +107,14 @@ def partner_register():
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'offline', TRUE)
             """, (
                 partner_id,
-                data.get('firstName'),
-                data.get('lastName'),
-                data.get('phone'),
-                data.get('email'),
-                data.get('vehicleType'),
-                data.get('vehicleNumber'),
-                data.get('aadhar'),
-                data.get('password')
+                data['firstName'],
+                data['lastName'],
+                data['phone'],
+                data['email'],
+                data['vehicleType'],
+                data['vehicleNumber'],
+                data['aadhar'],
+                data['password']
             ))
             
             conn.commit()
@@ -132,19 +164,20 @@ def partner_status():
     try:
         partner_id = session.get('partner_id')
         if not partner_id:
-            print(f"DEBUG: No partner_id in session. Session: {dict(session)}")
+            logger.debug("partner_status: no partner_id in session (keys: %s)", list(session.keys()))
             return jsonify({'success': False, 'message': 'Not logged in'}), 401
         
+        if request.method == 'POST':
+            data, errors = schema.PARTNER_STATUS.validate(request.json)
+            if errors:
+                return invalid_payload(errors)
+        
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
             if request.method == 'POST':
-                data = request.json
-                if not data:
-                    return jsonify({'success': False, 'message': 'No data provided'}), 400
-                
-                new_status = data.get('status', 'offline')
-                print(f"DEBUG: Updating partner {partner_id} status to {new_status}")
+                new_status = data['status']
+                logger.debug("Updating partner %s status to %s", partner_id, new_status)
                 
                 # Update status in database
                 cursor.execute("""
@@ -153,27 +186,25 @@ def partner_status():
                 
                 # Check if update was successful
                 rows_affected = cursor.rowcount
-                print(f"DEBUG: Rows affected: {rows_affected}")
+                logger.debug("Rows affected: %s", rows_affected)
                 
                 if rows_affected == 0:
                     return jsonify({'success': False, 'message': 'Partner not found or no changes made'}), 404
                 
                 conn.commit()
-                print(f"DEBUG: Status updated successfully to {new_status}")
+                logger.debug("Partner %s status updated to %s", partner_id, new_status)
             
             # Get current status
             cursor.execute("SELECT status FROM partners WHERE id = %s", (partner_id,))
             result = cursor.fetchone()
             
             if result:
-                print(f"DEBUG: Current status from DB: {result['status']}")
+                logger.debug("Partner %s status from DB: %s", partner_id, result['status'])
                 return jsonify({'success': True, 'status': result['status']})
             else:
                 return jsonify({'success': False, 'message': 'Partner not found'}), 404
     except Exception as e:
-        print(f"ERROR in partner_status: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("partner_status failed")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/partner/deliveries', methods=['GET'])
@@ -184,90 +215,43 @@ def get_partner_deliveries():
             return jsonify({'success': False, 'message': 'Not logged in'}), 401
         
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             # Get partner's vehicle type (to filter available deliveries by preferred_vehicle)
             cursor.execute("SELECT vehicle_type FROM partners WHERE id = %s", (partner_id,))
             partner_row = cursor.fetchone()
-            partner_vehicle_type = (partner_row.get('vehicle_type') or '').strip().lower() if partner_row else ''
+            partner_vehicle_type = (partner_row[0] or '').strip().lower() if partner_row else ''
             
             # Get partner's deliveries
             cursor.execute("""
                 SELECT id, sender_name, sender_address, receiver_name, receiver_address,
                        receiver_phone, parcel_type, weight, status, partner_id, total_stops,
                        created_at, accepted_at, updated_at, delivered_at,
-                       total_amount, payment_status, payment_method
+                       total_amount, payment_status, payment_method, preferred_vehicle
                 FROM deliveries 
                 WHERE partner_id = %s
                 ORDER BY created_at DESC
             """, (partner_id,))
-            partner_deliveries = cursor.fetchall()
-            
-            # Get stops for partner deliveries
-            for delivery in partner_deliveries:
-                delivery_id = delivery['id']
-                cursor.execute("""
-                    SELECT stop_number, drop_address, receiver_name, receiver_phone, status, delivered_at
-                    FROM delivery_stops
-                    WHERE booking_id = %s
-                    ORDER BY stop_number
-                """, (delivery_id,))
-                delivery['stops'] = cursor.fetchall()
-                # Convert datetime objects to strings
-                for stop in delivery['stops']:
-                    for key, value in stop.items():
-                        if isinstance(value, datetime):
-                            stop[key] = value.isoformat()
-            
-            # Convert datetime objects to strings for deliveries
-            for delivery in partner_deliveries:
-                for key, value in delivery.items():
-                    if isinstance(value, datetime):
-                        delivery[key] = value.isoformat()
+            partner_deliveries = fetch_all(Delivery, cursor)
             
             # Get available deliveries: only show deliveries that match partner's vehicle type
             # Car deliveries → only car partners; bike → only bike partners; scooter → only scooter partners.
             # Deliveries with no preferred_vehicle are shown to all partners.
-            cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'preferred_vehicle'")
-            has_preferred_vehicle = cursor.fetchone() is not None
+            cursor.execute("""
+                SELECT id, sender_name, sender_address, receiver_name, receiver_address,
+                       receiver_phone, parcel_type, weight, status, partner_id, total_stops,
+                       created_at, accepted_at, updated_at, delivered_at,
+                       total_amount, payment_status, payment_method, preferred_vehicle
+                FROM deliveries 
+                WHERE status = 'available'
+                  AND (COALESCE(preferred_vehicle, '') = '' OR LOWER(TRIM(preferred_vehicle)) = %s)
+                ORDER BY created_at DESC
+            """, (partner_vehicle_type,))
+            available_deliveries = fetch_all(Delivery, cursor)
             
-            if has_preferred_vehicle:
-                cursor.execute("""
-                    SELECT id, sender_name, sender_address, receiver_name, receiver_address,
-                           receiver_phone, parcel_type, weight, status, partner_id, total_stops,
-                           created_at, accepted_at, updated_at, delivered_at, preferred_vehicle
-                    FROM deliveries 
-                    WHERE status = 'available'
-                      AND (COALESCE(preferred_vehicle, '') = '' OR LOWER(TRIM(preferred_vehicle)) = %s)
-                    ORDER BY created_at DESC
-                """, (partner_vehicle_type,))
-            else:
-                cursor.execute("""
-                    SELECT id, sender_name, sender_address, receiver_name, receiver_address,
-                           receiver_phone, parcel_type, weight, status, partner_id, total_stops,
-                           created_at, accepted_at, updated_at, delivered_at
-                    FROM deliveries 
-                    WHERE status = 'available'
-                    ORDER BY created_at DESC
-                """)
-            available_deliveries = cursor.fetchall()
-            
-            # Get stops for available deliveries
-            for delivery in available_deliveries:
-                delivery_id = delivery['id']
-                cursor.execute("""
-                    SELECT stop_number, drop_address, receiver_name, receiver_phone, status
-                    FROM delivery_stops
-                    WHERE booking_id = %s
-                    ORDER BY stop_number
-                """, (delivery_id,))
-                delivery['stops'] = cursor.fetchall()
-            
-            # Convert datetime objects to strings
-            for delivery in available_deliveries:
-                for key, value in delivery.items():
-                    if isinstance(value, datetime):
-                        delivery[key] = value.isoformat()
+            # Stops for both lists, one query each
+            attach_stops(cursor, partner_deliveries)
+            attach_stops(cursor, available_deliveries)
             
             return jsonify({
                 'success': True,
@@ -284,49 +268,21 @@ def accept_delivery():
         if not partner_id:
             return jsonify({'success': False, 'message': 'Not logged in'}), 401
         
+        data, errors = schema.ACCEPT_DELIVERY.validate(request.json)
+        if errors:
+            return invalid_payload(errors)
+        delivery_id = data['delivery_id']
+        
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
-            # Check if partner is online
-            cursor.execute("SELECT status FROM partners WHERE id = %s", (partner_id,))
-            partner = cursor.fetchone()
-            if not partner or partner['status'] != 'online':
-                return jsonify({'success': False, 'message': 'You must be online to accept deliveries'}), 400
-            
-            data = request.json
-            delivery_id = data.get('delivery_id')
-            
-            # Check if delivery exists and is available
-            cursor.execute("""
-                SELECT id, status, preferred_vehicle FROM deliveries WHERE id = %s
-            """, (delivery_id,))
-            delivery = cursor.fetchone()
+            # Assign delivery to partner (availability, online status and vehicle type are checked by the same UPDATE)
+            if not delivery_state.accept(cursor, delivery_id, partner_id):
+                message, http_status = delivery_state.explain_rejection(cursor, delivery_id, 'accepted', partner_id)
+                return jsonify({'success': False, 'message': message}), http_status
             
-            if not delivery:
-                return jsonify({'success': False, 'message': 'Delivery not found'}), 404
-            
-            if delivery['status'] != 'available':
-                return jsonify({'success': False, 'message': 'Delivery is no longer available'}), 400
-            
-            # If delivery has preferred_vehicle, only allow partner whose vehicle_type matches
-            pref_vehicle = (delivery.get('preferred_vehicle') or '').strip().lower()
-            if pref_vehicle:
-                cursor.execute("SELECT vehicle_type FROM partners WHERE id = %s", (partner_id,))
-                partner_row = cursor.fetchone()
-                partner_vehicle = (partner_row.get('vehicle_type') or '').strip().lower() if partner_row else ''
-                if partner_vehicle != pref_vehicle:
-                    return jsonify({
-                        'success': False,
-                        'message': f'This delivery is for {pref_vehicle} only. Your vehicle type does not match.'
-                    }), 400
-            
-            # Assign delivery to partner
-            cursor.execute("""
-                UPDATE deliveries 
-                SET partner_id = %s, status = 'accepted', accepted_at = NOW()
-                WHERE id = %s
-            """, (partner_id, delivery_id))
             conn.commit()
+            invalidate_tracking_view(delivery_id)
             
             # Get updated delivery with sender_email
             cursor.execute("""
@@ -356,15 +312,6 @@ def accept_delivery():
             """, (delivery_id,))
             updated_delivery['stops'] = cursor.fetchall()
             
-            # Convert datetime objects to strings
-            for key, value in updated_delivery.items():
-                if isinstance(value, datetime):
-                    updated_delivery[key] = value.isoformat()
-            for stop in updated_delivery['stops']:
-                for key, value in stop.items():
-                    if isinstance(value, datetime):
-                        stop[key] = value.isoformat()
-            
             # Send tracking update email when delivery is accepted
             sender_email = updated_delivery.get('sender_email')
             if sender_email:
@@ -376,9 +323,9 @@ def accept_delivery():
                         status='accepted',
                         partner_name=partner_name
                     )
-                except Exception as e:
+                except Exception:
                     # Log error but don't fail the request
-                    print(f"Failed to send tracking update email: {str(e)}")
+                    logger.exception("Failed to send tracking update email")
             
             return jsonify({'success': True, 'delivery': updated_delivery})
     except Exception as e:
@@ -391,63 +338,24 @@ def update_delivery_status():
         if not partner_id:
             return jsonify({'success': False, 'message': 'Not logged in'}), 401
         
-        data = request.json
-        delivery_id = data.get('delivery_id')
-        new_status = data.get('status')
+        data, errors = schema.UPDATE_DELIVERY_STATUS.validate(request.json)
+        if errors:
+            return invalid_payload(errors)
+        delivery_id = data['delivery_id']
+        new_status = data['status']
         
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
-            # Check if delivery belongs to this partner
-            cursor.execute("""
-                SELECT id, partner_id FROM deliveries WHERE id = %s
-            """, (delivery_id,))
-            delivery = cursor.fetchone()
-            
-            if not delivery:
-                return jsonify({'success': False, 'message': 'Delivery not found'}), 404
-            
-            if delivery['partner_id'] != partner_id:
-                return jsonify({'success': False, 'message': 'Unauthorized'}), 403
-            
-            # Update delivery status
-            if new_status == 'delivered':
-                # Check if this is a multi-stop delivery
-                cursor.execute("SELECT COUNT(*) as total FROM delivery_stops WHERE booking_id = %s", (delivery_id,))
-                stops_count = cursor.fetchone()['total']
-                
-                if stops_count > 1:
-                    # For multi-stop, check if all stops are delivered
-                    cursor.execute("""
-                        SELECT COUNT(*) as total, SUM(CASE WHEN status = 'delivered' THEN 1 ELSE 0 END) as delivered
-                        FROM delivery_stops WHERE booking_id = %s
-                    """, (delivery_id,))
-                    stop_stats = cursor.fetchone()
-                    
-                    # Only mark as delivered if all stops are delivered
-                    if stop_stats['delivered'] == stop_stats['total']:
-                        cursor.execute("""
-                            UPDATE deliveries 
-                            SET status = %s, updated_at = NOW(), delivered_at = NOW(), payment_status = 'pending'
-                            WHERE id = %s
-                        """, (new_status, delivery_id))
-                    else:
-                        return jsonify({'success': False, 'message': 'All stops must be delivered first'}), 400
-                else:
-                    # Single stop delivery - mark as delivered and set payment pending
-                    cursor.execute("""
-                        UPDATE deliveries 
-                        SET status = %s, updated_at = NOW(), delivered_at = NOW(), payment_status = 'pending'
-                        WHERE id = %s
-                    """, (new_status, delivery_id))
-            else:
-                cursor.execute("""
-                    UPDATE deliveries 
-                    SET status = %s, updated_at = NOW()
-                    WHERE id = %s
-                """, (new_status, delivery_id))
+            # Ownership, current status and (for multi-stop) pending stops are checked by the same UPDATE
+            if not delivery_state.advance(cursor, delivery_id, partner_id, new_status):
+                message, http_status = delivery_state.explain_rejection(cursor, delivery_id, new_status, partner_id)
+                return jsonify({'success': False, 'message': message}), http_status
             
             conn.commit()
+            invalidate_tracking_view(delivery_id)
+            if new_status == 'delivered':
+                run_in_background(prepare_delivery_payment, delivery_id)
             
             # Get updated delivery with sender_email
             cursor.execute("""
@@ -469,11 +377,6 @@ def update_delivery_status():
                 if partner:
                     partner_name = f"{partner['first_name']} {partner['last_name']}"
             
-            # Convert datetime objects to strings
-            for key, value in updated_delivery.items():
-                if isinstance(value, datetime):
-                    updated_delivery[key] = value.isoformat()
-            
             # Send tracking update email if sender email is provided
             sender_email = updated_delivery.get('sender_email')
             if sender_email:
@@ -485,9 +388,9 @@ def update_delivery_status():
                         status=new_status,
                         partner_name=partner_name
                     )
-                except Exception as e:
+                except Exception:
                     # Log error but don't fail the request
-                    print(f"Failed to send tracking update email: {str(e)}")
+                    logger.exception("Failed to send tracking update email")
             
             return jsonify({'success': True, 'delivery': updated_delivery})
     except Exception as e:
@@ -501,48 +404,27 @@ def deliver_stop():
         if not partner_id:
             return jsonify({'success': False, 'message': 'Not logged in'}), 401
         
-        data = request.json
-        delivery_id = data.get('delivery_id')
-        stop_number = data.get('stop_number')
+        data, errors = schema.DELIVER_STOP.validate(request.json)
+        if errors:
+            return invalid_payload(errors)
+        delivery_id = data['delivery_id']
+        stop_number = data['stop_number']
         
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
-            # Verify delivery belongs to partner
-            cursor.execute("""
-                SELECT id, partner_id FROM deliveries WHERE id = %s
-            """, (delivery_id,))
-            delivery = cursor.fetchone()
-            
-            if not delivery or delivery['partner_id'] != partner_id:
-                return jsonify({'success': False, 'message': 'Unauthorized'}), 403
-            
-            # Update stop status
-            cursor.execute("""
-                UPDATE delivery_stops 
-                SET status = 'delivered', delivered_at = NOW()
-                WHERE booking_id = %s AND stop_number = %s
-            """, (delivery_id, stop_number))
-            
-            # Check if all stops are delivered
-            cursor.execute("""
-                SELECT COUNT(*) as total, SUM(CASE WHEN status = 'delivered' THEN 1 ELSE 0 END) as delivered
-                FROM delivery_stops WHERE booking_id = %s
-            """, (delivery_id,))
-            stop_stats = cursor.fetchone()
-            
-            # If all stops delivered, update main delivery status and set payment pending
-            if stop_stats['delivered'] == stop_stats['total']:
-                cursor.execute("""
-                    UPDATE deliveries 
-                    SET status = 'delivered', delivered_at = NOW(), payment_status = 'pending'
-                    WHERE id = %s
-                """, (delivery_id,))
+            # Mark the stop delivered; the booking flips to delivered (payment pending) with its last stop
+            stop_delivered, all_delivered = delivery_state.deliver_stop(cursor, delivery_id, stop_number, partner_id)
+            if not stop_delivered:
+                message, http_status = delivery_state.explain_stop_rejection(cursor, delivery_id, stop_number, partner_id)
+                return jsonify({'success': False, 'message': message}), http_status
             
             conn.commit()
+            invalidate_tracking_view(delivery_id)
+            if all_delivered:
+                run_in_background(prepare_delivery_payment, delivery_id)
             
             # Return delivery_id so frontend can redirect to payment if all stops delivered
-            all_delivered = stop_stats['delivered'] == stop_stats['total']
             return jsonify({
                 'success': True, 
                 'message': 'Stop marked as delivered',
@@ -552,47 +434,154 @@ def deliver_stop():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# Tracking views are cached per tracking ID as the fully serialized response body.
+# Handlers that change a delivery call invalidate_tracking_view() after committing.
+TRACKING_CACHE_TTL = int(os.getenv('TRACKING_CACHE_TTL', '30'))
+tracking_cache = TTLCache(max_entries=10000, ttl=TRACKING_CACHE_TTL)
+
+def load_tracking_view(cursor, tracking_id):
+    """Fetch a delivery with its stops for the tracking page, or None if it doesn't exist"""
+    cursor.execute("""
+        SELECT id, sender_name, sender_address, receiver_name, receiver_address,
+               receiver_phone, parcel_type, weight, status, partner_id, total_stops,
+               created_at, accepted_at, updated_at, delivered_at,
+               total_amount, payment_status, payment_method
+        FROM deliveries WHERE id = %s
+    """, (tracking_id,))
+    delivery = cursor.fetchone()
+    
+    if not delivery:
+        return None
+    
+    cursor.execute("""
+        SELECT stop_number, drop_address, receiver_name, receiver_phone, status, delivered_at
+        FROM delivery_stops
+        WHERE booking_id = %s
+        ORDER BY stop_number
+    """, (tracking_id,))
+    stops = cursor.fetchall()
+    
+    delivery['stops'] = stops
+    return delivery
+
+def invalidate_tracking_view(tracking_id):
+    """Drop the cached tracking view and payment status after a delivery changes"""
+    tracking_cache.delete(tracking_id)
+    payment_status_cache.delete(tracking_id)
+    payment_status_changes.notify(tracking_id)
+
+def tracking_view_response(body, etag):
+    """Build the tracking JSON response, answering 304 when the client already has this version"""
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.mimetype = 'application/json'
+    response.set_etag(etag)
+    # Browsers must revalidate every time, which is cheap thanks to the ETag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # API endpoint to get delivery details by tracking ID
 @app.route('/api/deliveries/track/<tracking_id>', methods=['GET'])
 def track_delivery(tracking_id):
     try:
-        with get_db_connection() as conn:
+        cached = tracking_cache.get(tracking_id)
+        if cached:
+            return tracking_view_response(*cached)
+        
+        # Taken before the read, so a view loaded before an invalidation is not cached after it.
+        # Non-zero means the delivery changed in the last TTL: read the primary, as a lagging
+        # replica may still have the old view.
+        generation = tracking_cache.generation(tracking_id)
+        with get_db_connection(readonly=not generation) as conn:
             cursor = conn.cursor(dictionary=True)
-            
-            # Get delivery
-            cursor.execute("""
-                SELECT id, sender_name, sender_address, receiver_name, receiver_address,
-                       receiver_phone, parcel_type, weight, status, partner_id, total_stops,
-                       created_at, accepted_at, updated_at, delivered_at,
-                       total_amount, payment_status, payment_method
-                FROM deliveries WHERE id = %s
-            """, (tracking_id,))
-            delivery = cursor.fetchone()
-            
-            if not delivery:
-                return jsonify({'success': False, 'message': 'Tracking number not found'}), 404
-            
-            # Get stops
-            cursor.execute("""
-                SELECT stop_number, drop_address, receiver_name, receiver_phone, status, delivered_at
-                FROM delivery_stops
-                WHERE booking_id = %s
-                ORDER BY stop_number
-            """, (tracking_id,))
-            stops = cursor.fetchall()
-            
-            # Convert datetime objects to strings
-            for key, value in delivery.items():
-                if isinstance(value, datetime):
-                    delivery[key] = value.isoformat()
-            for stop in stops:
-                for key, value in stop.items():
-                    if isinstance(value, datetime):
-                        stop[key] = value.isoformat()
-            
-            delivery['stops'] = stops
-            
-            return jsonify({'success': True, 'delivery': delivery})
+            delivery = load_tracking_view(cursor, tracking_id)
+        
+        if not delivery:
+            return jsonify({'success': False, 'message': 'Tracking number not found'}), 404
+        
+        body = app.json.dumps({'success': True, 'delivery': delivery})
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        tracking_cache.set(tracking_id, (body, etag), generation=generation)
+        return tracking_view_response(body, etag)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+# API endpoint for the tracking page timeline (full event history of one delivery)
+@app.route('/api/deliveries/track/<tracking_id>/events', methods=['GET'])
+def track_delivery_events(tracking_id):
+    try:
+        with get_db_connection(readonly=True) as conn:
+            cursor = conn.cursor(dictionary=True)
+            events = get_timeline(cursor, tracking_id)
+        
+        return jsonify({'success': True, 'tracking_id': tracking_id, 'events': events})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+MAX_BATCH_TRACKING_IDS = 300
+
+# API endpoint to track many parcels at once (business customers)
+@app.route('/api/deliveries/track/batch', methods=['POST'])
+def track_deliveries_batch():
+    try:
+        data = request.json or {}
+        tracking_ids = data.get('tracking_ids')
+        
+        if not isinstance(tracking_ids, list) or not tracking_ids:
+            return jsonify({'success': False, 'message': 'tracking_ids must be a non-empty list'}), 400
+        
+        if len(tracking_ids) > MAX_BATCH_TRACKING_IDS:
+            return jsonify({
+                'success': False,
+                'message': f'At most {MAX_BATCH_TRACKING_IDS} tracking IDs can be tracked at once'
+            }), 400
+        
+        # Validate and de-duplicate, keeping the caller's order
+        valid_ids = []
+        invalid = []
+        for tracking_id in tracking_ids:
+            is_valid, error = validate_tracking_id(tracking_id)
+            if not is_valid:
+                invalid.append({'tracking_id': tracking_id, 'message': error})
+                continue
+            tracking_id = tracking_id.strip().upper()
+            if tracking_id not in valid_ids:
+                valid_ids.append(tracking_id)
+        
+        deliveries = {}
+        if valid_ids:
+            placeholders = ', '.join(['%s'] * len(valid_ids))
+            with get_db_connection(readonly=True) as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(f"""
+                    SELECT id, status, payment_status, total_stops,
+                           created_at, accepted_at, updated_at, delivered_at
+                    FROM deliveries WHERE id IN ({placeholders})
+                """, valid_ids)
+                for delivery in cursor.fetchall():
+                    delivery_id = delivery.pop('id')
+                    delivery['stops'] = []
+                    deliveries[delivery_id] = delivery
+                
+                if deliveries:
+                    placeholders = ', '.join(['%s'] * len(deliveries))
+                    cursor.execute(f"""
+                        SELECT booking_id, stop_number, status, delivered_at
+                        FROM delivery_stops
+                        WHERE booking_id IN ({placeholders})
+                        ORDER BY booking_id, stop_number
+                    """, list(deliveries))
+                    for stop in cursor.fetchall():
+                        deliveries[stop.pop('booking_id')]['stops'].append(stop)
+        
+        return jsonify({
+            'success': True,
+            'deliveries': deliveries,
+            'not_found': [tracking_id for tracking_id in valid_ids if tracking_id not in deliveries],
+            'invalid': invalid
+        })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -605,12 +594,12 @@ def create_delivery():
             return jsonify({'success': False, 'message': 'Please login to send a parcel'}), 401
         
         data = request.json
-        stops = data.get('stops', [])
+        values, errors = schema.BOOKING.validate(data)
+        if errors:
+            return invalid_payload(errors)
+        stops = values['stops']
         total_stops = len(stops)
         
-        if total_stops == 0:
-            return jsonify({'success': False, 'message': 'At least one stop is required'}), 400
-        
         with get_db_connection() as conn:
             # Get customer information from database
             cursor = conn.cursor(dictionary=True)
@@ -631,206 +620,33 @@ def create_delivery():
             # Use first stop as primary receiver (for backward compatibility)
             first_stop = stops[0]
             
-            # Validate all stops required fields
-            for i, stop in enumerate(stops):
-                if not stop.get('receiver_name', '').strip():
-                    return jsonify({'success': False, 'message': f'Receiver name is required for stop {i+1}'}), 400
-                if not stop.get('drop_address', '').strip():
-                    return jsonify({'success': False, 'message': f'Receiver address is required for stop {i+1}'}), 400
-                if not stop.get('receiver_phone', '').strip():
-                    return jsonify({'success': False, 'message': f'Receiver phone is required for stop {i+1}'}), 400
-            
-            # Validate parcel type "other" has specification
-            parcel_type = data.get('parcelType', '')
-            if parcel_type == 'other' and not (data.get('parcelOtherSpec') or '').strip():
-                return jsonify({'success': False, 'message': 'Please specify what you are sending when parcel type is Other'}), 400
-            
-            # Bike/Scooter size limits (cm)
-            preferred_vehicle = (data.get('preferredVehicle') or '').lower()
-            if preferred_vehicle in ('bike', 'scooter'):
-                try:
-                    height = float(data.get('parcelHeight') or 0)
-                    width = float(data.get('parcelWidth') or 0)
-                except (TypeError, ValueError):
-                    height = width = 0
-                if height > 60 or width > 45:
-                    return jsonify({
-                        'success': False,
-                        'message': 'For Bike/Scooter delivery, parcel size must not exceed 60 cm height and 45 cm width. Please reduce dimensions or choose Car.'
-                    }), 400
-            
             cursor.close()
             cursor = conn.cursor()
             
-            # Generate delivery ID
-            cursor.execute("SELECT COUNT(*) FROM deliveries")
-            count = cursor.fetchone()[0]
-            delivery_id = f"QP{count + 1:09d}"
-            
-            # Calculate total amount (include car fee if preferred vehicle is car)
+            # Calculate total amount (include car fee if preferred vehicle is car).
+            # A quote token from /api/calculate-price for this same route, weight and
+            # vehicle already carries the price, so no distance lookups are needed.
             pickup_address = sender_address
-            weight = float(data.get('parcelWeight', 0))
-            total_distance = calculate_total_distance(pickup_address, stops)
-            preferred_vehicle = (data.get('preferredVehicle') or '').strip() or None
-            price_breakdown = calculate_price(total_distance, weight, total_stops, preferred_vehicle)
-            total_amount = price_breakdown['total']
-            
-            # Check if total_amount column exists
-            cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'total_amount'")
-            has_total_amount = cursor.fetchone() is not None
-            
-            # Check if sender_email column exists
-            cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'sender_email'")
-            has_sender_email = cursor.fetchone() is not None
-            
-            # Insert new delivery
-            if has_total_amount and has_sender_email:
-                cursor.execute("""
-                    INSERT INTO deliveries (id, sender_name, sender_address, sender_email, receiver_name, 
-                                         receiver_address, receiver_phone, parcel_type, weight, status, total_stops, total_amount)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'available', %s, %s)
-                """, (
-                    delivery_id,
-                    sender_name,
-                    sender_address,
-                    sender_email if sender_email else None,
-                    first_stop.get('receiver_name'),
-                    first_stop.get('drop_address'),
-                    first_stop.get('receiver_phone'),
-                    data.get('parcelType'),
-                    weight,
-                    total_stops,
-                    total_amount
-                ))
-            elif has_total_amount:
-                # sender_email column doesn't exist yet
-                cursor.execute("""
-                    INSERT INTO deliveries (id, sender_name, sender_address, receiver_name, 
-                                         receiver_address, receiver_phone, parcel_type, weight, status, total_stops, total_amount)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'available', %s, %s)
-                """, (
-                    delivery_id,
-                    sender_name,
-                    sender_address,
-                    first_stop.get('receiver_name'),
-                    first_stop.get('drop_address'),
-                    first_stop.get('receiver_phone'),
-                    data.get('parcelType'),
-                    weight,
-                    total_stops,
-                    total_amount
-                ))
-            elif has_sender_email:
-                # total_amount column doesn't exist yet
-                cursor.execute("""
-                    INSERT INTO deliveries (id, sender_name, sender_address, sender_email, receiver_name, 
-                                         receiver_address, receiver_phone, parcel_type, weight, status, total_stops)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'available', %s)
-                """, (
-                    delivery_id,
-                    sender_name,
-                    sender_address,
-                    sender_email if sender_email else None,
-                    first_stop.get('receiver_name'),
-                    first_stop.get('drop_address'),
-                    first_stop.get('receiver_phone'),
-                    data.get('parcelType'),
-                    weight,
-                    total_stops
-                ))
-                # Try to add total_amount after insert
-                try:
-                    cursor.execute("UPDATE deliveries SET total_amount = %s WHERE id = %s", (total_amount, delivery_id))
-                except:
-                    pass  # Column doesn't exist yet, will be added by migration
-            else:
-                # Fallback: insert without total_amount and sender_email (migration will add them later)
-                cursor.execute("""
-                    INSERT INTO deliveries (id, sender_name, sender_address, receiver_name, 
-                                         receiver_address, receiver_phone, parcel_type, weight, status, total_stops)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'available', %s)
-                """, (
-                    delivery_id,
-                    sender_name,
-                    sender_address,
-                    first_stop.get('receiver_name'),
-                    first_stop.get('drop_address'),
-                    first_stop.get('receiver_phone'),
-                    data.get('parcelType'),
-                    weight,
-                    total_stops
-                ))
-                # Try to add total_amount and sender_email after insert
-                try:
-                    cursor.execute("UPDATE deliveries SET total_amount = %s WHERE id = %s", (total_amount, delivery_id))
-                except:
-                    pass  # Column doesn't exist yet, will be added by migration
-                try:
-                    if sender_email:
-                        cursor.execute("UPDATE deliveries SET sender_email = %s WHERE id = %s", (sender_email, delivery_id))
-                except:
-                    pass  # Column doesn't exist yet, will be added by migration
-            
-            # Update optional parcel detail columns if they exist
-            parcel_other_spec = data.get('parcelOtherSpec') or None
-            parcel_height = data.get('parcelHeight')
-            parcel_width = data.get('parcelWidth')
-            preferred_vehicle = data.get('preferredVehicle') or None
-            if parcel_height is not None and parcel_height != '':
-                try:
-                    parcel_height = float(parcel_height)
-                except (TypeError, ValueError):
-                    parcel_height = None
-            else:
-                parcel_height = None
-            if parcel_width is not None and parcel_width != '':
-                try:
-                    parcel_width = float(parcel_width)
-                except (TypeError, ValueError):
-                    parcel_width = None
-            else:
-                parcel_width = None
-            try:
-                cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'parcel_type_specification'")
-                if cursor.fetchone():
-                    cursor.execute(
-                        "UPDATE deliveries SET parcel_type_specification = %s, parcel_height = %s, parcel_width = %s, preferred_vehicle = %s WHERE id = %s",
-                        (parcel_other_spec, parcel_height, parcel_width, preferred_vehicle, delivery_id)
-                    )
-            except Exception:
-                pass
+            weight = values['parcelWeight']
+            preferred_vehicle = values['preferredVehicle']
+            total_amount = redeem_quote(data.get('quoteToken'), pickup_address, stops, weight, preferred_vehicle)
+            if total_amount is None:
+                total_distance = calculate_total_distance(pickup_address, stops)
+                price_breakdown = calculate_price(total_distance, weight, total_stops, preferred_vehicle)
+                total_amount = price_breakdown['total']
             
-            # Insert all stops
-            for stop in stops:
-                cursor.execute("""
-                    INSERT INTO delivery_stops (booking_id, stop_number, drop_address, receiver_name, receiver_phone, status)
-                    VALUES (%s, %s, %s, %s, %s, 'pending')
-                """, (
-                    delivery_id,
-                    stop.get('stop_number'),
-                    stop.get('drop_address'),
-                    stop.get('receiver_name'),
-                    stop.get('receiver_phone')
-                ))
+            # Generate delivery ID only now: reserving it locks the id counter until the commit,
+            # so no Distance Matrix call may happen while it is held
+            delivery_id = next_delivery_ids(cursor, 1)[0]
             
+            # One INSERT for the delivery, one for all its stops, one for the event
+            booking = build_booking(delivery_id, sender_name, sender_address, sender_email, values, data,
+                                    total_amount, datetime.now().replace(microsecond=0))
+            insert_bookings(cursor, [booking])
             conn.commit()
             
-            # Get created delivery
-            cursor_dict = conn.cursor(dictionary=True)
-            cursor_dict.execute("""
-                SELECT id, sender_name, sender_address, receiver_name, receiver_address,
-                       receiver_phone, parcel_type, weight, status, partner_id, total_stops,
-                       created_at, accepted_at, updated_at, delivered_at
-                FROM deliveries WHERE id = %s
-            """, (delivery_id,))
-            delivery_dict = cursor_dict.fetchone()
-            cursor_dict.close()
-            
-            # Convert datetime objects to strings
-            if delivery_dict:
-                for key, value in delivery_dict.items():
-                    if isinstance(value, datetime):
-                        delivery_dict[key] = value.isoformat()
+            # The response comes from what was just written, not a re-read
+            delivery_dict = booking_response(booking)
             
             # Send confirmation email if sender email is provided
             if sender_email:
@@ -847,9 +663,9 @@ def create_delivery():
                         total_stops=total_stops,
                         total_amount=total_amount
                     )
-                except Exception as e:
+                except Exception:
                     # Log error but don't fail the request
-                    print(f"Failed to send confirmation email: {str(e)}")
+                    logger.exception("Failed to send confirmation email")
             
             return jsonify({
                 'success': True, 
@@ -860,117 +676,63 @@ def create_delivery():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
-# Pricing Configuration
-BASE_FARE = 30
-PRICE_PER_KM = 8
-PRICE_PER_KG = 5
-EXTRA_STOP_CHARGE = 15
-CAR_EXTRA_CHARGE = 80
-
-# Google Distance Matrix API Key (set in environment variable or config)
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')
-
-def calculate_distance(origin, destination, api_key=None):
-    """
-    Calculate distance between two addresses using Google Distance Matrix API
-    Returns distance in kilometers, or None if API call fails
-    """
-    if not api_key:
-        # Fallback: Return estimated distance (for demo purposes)
-        # In production, you should always use the API
-        return None
-    
+@app.route('/api/deliveries/bulk', methods=['POST'])
+def bulk_create_deliveries():
+    """Book many parcels at once from a CSV file (multipart 'file' or text/csv body) or a JSON array"""
     try:
-        url = "https://maps.googleapis.com/maps/api/distancematrix/json"
-        params = {
-            'origins': origin,
-            'destinations': destination,
-            'key': api_key,
-            'units': 'metric'
-        }
-        
-        response = requests.get(url, params=params, timeout=5)
-        data = response.json()
+        customer_id = session.get('customer_id')
+        if not customer_id:
+            return jsonify({'success': False, 'message': 'Please login to send parcels'}), 401
         
-        if data['status'] == 'OK' and data['rows'][0]['elements'][0]['status'] == 'OK':
-            distance_text = data['rows'][0]['elements'][0]['distance']['text']
-            distance_value = data['rows'][0]['elements'][0]['distance']['value'] / 1000  # Convert to km
-            return round(distance_value, 2)
+        upload = request.files.get('file')
+        if upload:
+            rows = rows_from_csv(upload.read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            rows = rows_from_csv(request.get_data(as_text=True))
+        elif request.is_json:
+            rows = rows_from_json(request.get_json(silent=True))
         else:
-            return None
+            rows = None
+        
+        if rows is None:
+            return jsonify({'success': False, 'message': 'Upload a CSV file or a JSON array of deliveries'}), 400
+        if not rows:
+            return jsonify({'success': False, 'message': 'The upload contains no deliveries'}), 400
+        if len(rows) > MAX_BULK_ROWS:
+            return jsonify({'success': False, 'message': f'At most {MAX_BULK_ROWS} deliveries per upload'}), 400
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT first_name, last_name, address, email
+                FROM customers WHERE id = %s
+            """, (customer_id,))
+            customer = cursor.fetchone()
+            cursor.close()
+            if not customer:
+                return jsonify({'success': False, 'message': 'Customer not found. Please login again'}), 401
+            
+            sender = {
+                'name': f"{customer['first_name']} {customer['last_name']}",
+                'address': customer['address'],
+                'email': customer.get('email'),
+            }
+            results = import_bookings(conn, sender, rows)
+        
+        created = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': True,
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        })
     except Exception as e:
-        print(f"Distance calculation error: {e}")
-        return None
-
-def calculate_total_distance(pickup_address, stops):
-    """
-    Calculate total distance for multi-stop delivery
-    Returns total distance in kilometers
-    """
-    total_distance = 0
-    
-    if not stops or len(stops) == 0:
-        return 0
-    
-    # Calculate pickup to first stop
-    if GOOGLE_API_KEY:
-        distance = calculate_distance(pickup_address, stops[0]['drop_address'], GOOGLE_API_KEY)
-        if distance:
-            total_distance += distance
-        else:
-            # Fallback: estimate 5km per segment
-            total_distance += 5
-    else:
-        # Fallback: estimate 5km per segment
-        total_distance += 5
-    
-    # Calculate distances between stops
-    for i in range(len(stops) - 1):
-        if GOOGLE_API_KEY:
-            distance = calculate_distance(
-                stops[i]['drop_address'], 
-                stops[i + 1]['drop_address'], 
-                GOOGLE_API_KEY
-            )
-            if distance:
-                total_distance += distance
-            else:
-                total_distance += 5
-        else:
-            total_distance += 5
-    
-    return round(total_distance, 2)
+        return jsonify({'success': False, 'message': str(e)}), 500
 
-def calculate_price(distance, weight, num_stops, preferred_vehicle=None):
-    """
-    Calculate delivery price based on:
-    - Base Fare: ₹30
-    - Price per km: ₹8
-    - Price per kg: ₹5
-    - Extra stop charge: ₹15 per stop (after first stop)
-    - Car delivery: +₹80 when preferred_vehicle is 'car'
-    """
-    base_fare = BASE_FARE
-    distance_cost = distance * PRICE_PER_KM
-    weight_cost = weight * PRICE_PER_KG
-    extra_stops = max(0, num_stops - 1)  # First stop is free
-    extra_stop_cost = extra_stops * EXTRA_STOP_CHARGE
-    car_fee = CAR_EXTRA_CHARGE if (preferred_vehicle or '').lower() == 'car' else 0
-    
-    total = base_fare + distance_cost + weight_cost + extra_stop_cost + car_fee
-    
-    return {
-        'base_fare': base_fare,
-        'distance': round(distance, 2),
-        'distance_cost': round(distance_cost, 2),
-        'weight': round(weight, 2),
-        'weight_cost': round(weight_cost, 2),
-        'num_stops': num_stops,
-        'extra_stops': extra_stops,
-        'extra_stop_cost': round(extra_stop_cost, 2),
-        'car_fee': car_fee,
-        'total': round(total, 2)
-    }
+# Price breakdowns of recent quotes by (route hash, weight, vehicle): the form asks
+# again as the customer edits it, and each answer would otherwise look up every leg
+QUOTE_CACHE_TTL = int(os.getenv('QUOTE_CACHE_TTL', '300'))
+quote_cache = TTLCache(max_entries=10000, ttl=QUOTE_CACHE_TTL)
 
 @app.route('/api/calculate-price', methods=['POST'])
 def calculate_price_endpoint():
@@ -986,16 +748,23 @@ def calculate_price_endpoint():
                 'message': 'Pickup address and at least one stop are required'
             }), 400
         
-        # Calculate total distance
-        total_distance = calculate_total_distance(pickup_address, stops)
-        
-        # Calculate price (include car fee if preferred vehicle is car)
         preferred_vehicle = (data.get('preferred_vehicle') or '').strip() or None
-        price_breakdown = calculate_price(total_distance, weight, len(stops), preferred_vehicle)
+        key = quote_key(pickup_address, stops, weight, preferred_vehicle)
+        price_breakdown = quote_cache.get(key)
+        if price_breakdown is None:
+            # Calculate total distance
+            total_distance = calculate_total_distance(pickup_address, stops)
+            
+            # Calculate price (include car fee if preferred vehicle is car)
+            price_breakdown = calculate_price(total_distance, weight, len(stops), preferred_vehicle)
+            quote_cache.set(key, price_breakdown)
         
+        # Booking with the token (create_delivery's quoteToken) skips pricing the route again
         return jsonify({
             'success': True,
-            'price_breakdown': price_breakdown
+            'price_breakdown': price_breakdown,
+            'quote_token': issue_quote(pickup_address, stops, weight, preferred_vehicle, price_breakdown['total']),
+            'quote_expires_in': QUOTE_TTL
         })
     except Exception as e:
         return jsonify({
@@ -1030,12 +799,11 @@ def admin_logout():
 def send_registration_otp():
     """Send OTP for email verification during registration"""
     try:
-        data = request.json
-        email = data.get('email', '').strip()
-        first_name = data.get('firstName', '').strip()
-
-        if not email:
-            return jsonify({'success': False, 'message': 'Email is required'}), 400
+        data, errors = schema.REGISTRATION_OTP.validate(request.json)
+        if errors:
+            return invalid_payload(errors)
+        email = data['email']
+        first_name = data['firstName'] or ''
 
         with get_db_connection() as conn:
             cursor = conn.cursor()
@@ -1053,37 +821,32 @@ def send_registration_otp():
         # Send registration OTP email
         try:
             send_registration_otp_email(email, otp, first_name)
-        except Exception as e:
-            print(f"Failed to send registration OTP email: {e}")
+        except Exception:
+            logger.exception("Failed to send registration OTP email")
             return jsonify({'success': False, 'message': 'Failed to send OTP. Please try again.'}), 500
 
         return jsonify({
             'success': True,
             'message': 'OTP has been sent to your email!'
         })
-    except Exception as e:
-        print(f"Send registration OTP error: {e}")
+    except Exception:
+        logger.exception("Send registration OTP error")
         return jsonify({'success': False, 'message': 'An error occurred. Please try again.'}), 500
 
 @app.route('/api/customer/verify-registration-otp', methods=['POST'])
 def verify_registration_otp():
     """Verify OTP and complete registration"""
     try:
-        data = request.json
-        first_name = data.get('firstName')
-        last_name = data.get('lastName')
-        email = data.get('email')
-        phone = data.get('phone')
-        address = data.get('address')
-        password = data.get('password')
-        otp = data.get('otp', '').strip()
-
-        # Basic validation
-        if not all([first_name, last_name, email, phone, address, password, otp]):
-            return jsonify({'success': False, 'message': 'All fields are required'}), 400
-
-        if len(otp) != 4 or not otp.isdigit():
-            return jsonify({'success': False, 'message': 'Invalid OTP format'}), 400
+        data, errors = schema.CUSTOMER_REGISTRATION.validate(request.json)
+        if errors:
+            return invalid_payload(errors)
+        first_name = data['firstName']
+        last_name = data['lastName']
+        email = data['email']
+        phone = data['phone']
+        address = data['address']
+        password = data['password']
+        otp = data['otp']
 
         with get_db_connection() as conn:
             cursor = conn.cursor()
@@ -1135,7 +898,7 @@ def verify_registration_otp():
                 }
             }), 201
     except Exception as e:
-        print(f"Customer registration error: {e}")
+        logger.exception("Customer registration error")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/customer/login', methods=['POST'])
@@ -1169,7 +932,7 @@ def customer_login():
             else:
                 return jsonify({'success': False, 'message': 'Invalid email/phone or password'}), 401
     except Exception as e:
-        print(f"Customer login error: {e}")
+        logger.exception("Customer login error")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/customer/logout', methods=['POST'])
@@ -1241,16 +1004,16 @@ def customer_forgot_password():
             # Send password reset email with OTP
             try:
                 send_password_reset_otp_email(email, otp)
-            except Exception as e:
-                print(f"Failed to send password reset email: {e}")
+            except Exception:
+                logger.exception("Failed to send password reset email")
                 # Still return success to not reveal if email exists
 
             return jsonify({
                 'success': True,
                 'message': 'If an account exists with this email, an OTP has been sent.'
             })
-    except Exception as e:
-        print(f"Forgot password error: {e}")
+    except Exception:
+        logger.exception("Forgot password error")
         return jsonify({'success': False, 'message': 'An error occurred. Please try again.'}), 500
 
 @app.route('/api/customer/verify-otp', methods=['POST'])
@@ -1289,8 +1052,8 @@ def customer_verify_otp():
             'message': 'OTP verified successfully',
             'token': session_token
         })
-    except Exception as e:
-        print(f"Verify OTP error: {e}")
+    except Exception:
+        logger.exception("Verify OTP error")
         return jsonify({'success': False, 'message': 'An error occurred. Please try again.'}), 500
 
 @app.route('/api/customer/reset-password', methods=['POST'])
@@ -1347,8 +1110,8 @@ def customer_reset_password():
             'success': True,
             'message': 'Password reset successfully! You can now log in with your new password.'
         })
-    except Exception as e:
-        print(f"Reset password error: {e}")
+    except Exception:
+        logger.exception("Reset password error")
         return jsonify({'success': False, 'message': 'An error occurred. Please try again.'}), 500
 
 @app.route('/api/admin/stats', methods=['GET'])
@@ -1357,7 +1120,7 @@ def admin_stats():
         if not session.get('admin_logged_in'):
             return jsonify({'success': False, 'message': 'Not authenticated'}), 401
         
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             cursor = conn.cursor(dictionary=True)
             
             # Total parcels
@@ -1422,8 +1185,8 @@ def admin_deliveries():
         
         limit = request.args.get('limit', 20, type=int)
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+        with get_db_connection(readonly=True) as conn:
+            cursor = conn.cursor()
             cursor.execute("""
                 SELECT d.id, d.sender_name, d.receiver_name, d.status, 
                        d.created_at, d.delivered_at, d.total_stops,
@@ -1434,19 +1197,8 @@ def admin_deliveries():
                 LIMIT %s
             """, (limit,))
             
-            deliveries = cursor.fetchall()
-            
-            # Format dates and add partner name
-            for delivery in deliveries:
-                if delivery['first_name'] and delivery['last_name']:
-                    delivery['partner_name'] = f"{delivery['first_name']} {delivery['last_name']}"
-                else:
-                    delivery['partner_name'] = 'Unassigned'
-                
-                if delivery['created_at']:
-                    delivery['created_at'] = delivery['created_at'].strftime('%b %d, %Y')
-                if delivery['delivered_at']:
-                    delivery['delivered_at'] = delivery['delivered_at'].strftime('%b %d, %Y')
+            # Dates are formatted and partner_name added by DeliverySummary
+            deliveries = fetch_all(DeliverySummary, cursor)
             
             return jsonify({
                 'success': True,
@@ -1455,17 +1207,112 @@ def admin_deliveries():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/admin/events', methods=['GET'])
+def admin_events():
+    """Delivery events after a sequence number (delta sync: pass the last seq you saw as ?since=)"""
+    try:
+        if not session.get('admin_logged_in'):
+            return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+        
+        since = request.args.get('since', 0, type=int)
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        
+        # Primary, not a replica: the settle window in get_events_since assumes commits show at once
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            events = get_events_since(cursor, since, limit)
+        
+        return jsonify({
+            'success': True,
+            'events': events,
+            'last_seq': events[-1]['seq'] if events else since
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/events/summary', methods=['GET'])
+def admin_events_summary():
+    """Event counts per type and day, computed from the event log instead of the deliveries table"""
+    try:
+        if not session.get('admin_logged_in'):
+            return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+        
+        days = request.args.get('days', 7, type=int)
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+        
+        with get_db_connection(readonly=True) as conn:
+            cursor = conn.cursor(dictionary=True)
+            counts = get_event_counts(cursor, since)
+        
+        return jsonify({'success': True, 'since': since.date(), 'counts': counts})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/http-stats', methods=['GET'])
+def admin_http_stats():
+    """Outbound HTTP calls per host (Razorpay, Distance Matrix): counts, errors, retries, latency"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    return jsonify({'success': True, 'hosts': http_client.host_stats()})
+
+@app.route('/api/admin/db-stats', methods=['GET'])
+def admin_db_stats():
+    """Top statements by fingerprint (?sort=total_ms|count|mean_ms|p95_ms|max_ms|slow&limit=20)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in query_stats.SORT_KEYS:
+        return jsonify({'success': False, 'message': f"sort must be one of {', '.join(query_stats.SORT_KEYS)}"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    return jsonify({
+        'success': True,
+        'slow_query_ms': query_stats.SLOW_QUERY_MS,
+        'statements': query_stats.top_statements(limit, sort)
+    })
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+def admin_profiler():
+    """
+    POST {"seconds": 30, "interval_ms": 10} starts sampling this worker's threads;
+    GET returns its status, or with ?format=collapsed the stacks for a flamegraph
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    sampler = profiling.sampler
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            seconds = float(data.get('seconds', 30))
+            interval = float(data.get('interval_ms', 10)) / 1000
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'seconds and interval_ms must be numbers'}), 400
+        # Chained so NaN fails too; the window bounds interval, so it cannot be infinite
+        if (not 0 < seconds <= profiling.PROFILE_MAX_SECONDS
+                or not profiling.PROFILE_MIN_INTERVAL <= interval <= seconds):
+            return jsonify({'success': False, 'message':
+                            f'seconds must be above 0 and at most {profiling.PROFILE_MAX_SECONDS}, interval_ms at least '
+                            f'{profiling.PROFILE_MIN_INTERVAL * 1000:g} and at most the window'}), 400
+        if not sampler.start(seconds, interval):
+            return jsonify({'success': False, 'message': 'Profiler already running on this worker',
+                            'profiler': sampler.status()}), 409
+        return jsonify({'success': True, 'pid': os.getpid(), 'profiler': sampler.status()})
+
+    if request.args.get('format') == 'collapsed':
+        return sampler.collapsed(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return jsonify({'success': True, 'pid': os.getpid(), 'profiler': sampler.status()})
+
 # Payment Routes
 @app.route('/payment/<tracking_id>')
 def payment_page(tracking_id):
-    """Show payment page for a delivery"""
+    """Show payment page for a delivery (no outbound calls: the order is prepared in the background)"""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             cursor.execute("""
                 SELECT id, sender_name, sender_address, receiver_name, receiver_address,
                        total_amount, payment_status, payment_method, status, weight, 
-                       parcel_type, total_stops, preferred_vehicle
+                       parcel_type, total_stops, preferred_vehicle, razorpay_order_id
                 FROM deliveries WHERE id = %s
             """, (tracking_id,))
             delivery = cursor.fetchone()
@@ -1482,106 +1329,69 @@ def payment_page(tracking_id):
                 from flask import redirect, url_for
                 return redirect(url_for('track_parcel') + f'?tracking={tracking_id}')
             
-            # If total_amount is NULL or 0, calculate it
-            if not delivery['total_amount'] or delivery['total_amount'] == 0:
-                # Get stops to calculate distance
-                cursor.execute("""
-                    SELECT drop_address, stop_number
-                    FROM delivery_stops
-                    WHERE booking_id = %s
-                    ORDER BY stop_number
-                """, (tracking_id,))
-                stops_data = cursor.fetchall()
-                
-                stops = [{'drop_address': stop['drop_address']} for stop in stops_data]
-                weight = float(delivery.get('weight', 0) or 0)
-                total_stops = delivery.get('total_stops', 1) or len(stops) or 1
-                
-                # Calculate total amount (include car fee if preferred_vehicle is car)
-                pickup_address = delivery.get('sender_address', '')
-                total_distance = calculate_total_distance(pickup_address, stops)
-                pref_vehicle = delivery.get('preferred_vehicle')
-                price_breakdown = calculate_price(total_distance, weight, total_stops, pref_vehicle)
-                calculated_amount = price_breakdown['total']
-                
-                # Update the delivery with calculated amount
-                cursor.execute("""
-                    UPDATE deliveries 
-                    SET total_amount = %s 
-                    WHERE id = %s
-                """, (calculated_amount, tracking_id))
-                conn.commit()
-                
-                delivery['total_amount'] = calculated_amount
+            # The delivered transition normally prepared the order already; if that job
+            # has not run (or failed), start it now instead of calling out here
+            if not delivery['razorpay_order_id']:
+                run_in_background(prepare_delivery_payment, tracking_id)
             
-            return render_template('payment.html', delivery=delivery)
+            return render_template('payment.html', delivery=delivery, razorpay_key_id=RAZORPAY_KEY_ID)
     except Exception as e:
         return render_template('error.html', message=str(e)), 500
 
+def prepare_delivery_payment(tracking_id):
+    """Background job for the delivered transition: final amount and Razorpay order"""
+    try:
+        prepare_payment(tracking_id)
+    except Exception:
+        logger.exception("Could not prepare payment for %s", tracking_id)
+    invalidate_tracking_view(tracking_id)
+
 @app.route('/api/payment/create-order', methods=['POST'])
 def create_razorpay_order():
-    """Create a Razorpay order for payment"""
+    """Razorpay order for a delivered booking: the one prepared in the background, or a new one"""
     try:
         data = request.json
         tracking_id = data.get('tracking_id')
-        amount = float(data.get('amount', 0))
         
-        # Validate amount - if 0 or invalid, try to get from database
-        if amount <= 0:
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT total_amount, razorpay_order_id, status, payment_status
+                FROM deliveries WHERE id = %s
+            """, (tracking_id,))
+            delivery = cursor.fetchone()
+        
+        if not delivery:
+            return jsonify({'success': False, 'message': 'Delivery not found'}), 404
+        if delivery['payment_status'] == 'paid':
+            return jsonify({'success': False, 'message': 'Payment already processed'}), 400
+        if delivery['status'] != 'delivered':
+            return jsonify({'success': False, 'message': 'Delivery not yet completed'}), 400
+        
+        order_id = delivery['razorpay_order_id']
+        if not order_id:
+            # Background stage has not finished: prepare the order now
+            try:
+                order_id = prepare_payment(tracking_id)
+            except OrderError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            if not order_id:
+                return jsonify({
+                    'success': False, 
+                    'message': 'Minimum payment amount is ₹1.'
+                }), 400
             with get_db_connection() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute("SELECT total_amount FROM deliveries WHERE id = %s", (tracking_id,))
                 delivery = cursor.fetchone()
-                
-                if delivery and delivery.get('total_amount') and float(delivery['total_amount']) > 0:
-                    amount = float(delivery['total_amount'])
-                else:
-                    return jsonify({
-                        'success': False, 
-                        'message': 'Invalid amount. Amount must be greater than ₹0.'
-                    }), 400
-        
-        # Razorpay minimum amount is 1 rupee (100 paise)
-        if amount < 1:
-            return jsonify({
-                'success': False, 
-                'message': 'Minimum payment amount is ₹1.'
-            }), 400
         
-        # Create Razorpay order
-        order_data = {
-            'amount': int(amount * 100),  # Convert to paise
+        return jsonify({
+            'success': True,
+            'order_id': order_id,
+            'amount': int(round(float(delivery['total_amount']) * 100)),
             'currency': 'INR',
-            'receipt': tracking_id,
-            'notes': {
-                'tracking_id': tracking_id,
-                'description': f'Payment for Delivery {tracking_id}'
-            }
-        }
-        
-        # Make API request to Razorpay
-        response = requests.post(
-            'https://api.razorpay.com/v1/orders',
-            json=order_data,
-            auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET),
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        if response.status_code == 200:
-            order = response.json()
-            return jsonify({
-                'success': True,
-                'order_id': order['id'],
-                'amount': order['amount'],
-                'currency': order['currency'],
-                'key_id': RAZORPAY_KEY_ID
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': f'Failed to create order: {response.text}'
-            }), 400
-            
+            'key_id': RAZORPAY_KEY_ID
+        })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -1595,99 +1405,140 @@ def razorpay_success():
         razorpay_order_id = data.get('razorpay_order_id')
         razorpay_signature = data.get('razorpay_signature')
         
-        # Verify signature
-        message = f"{razorpay_order_id}|{razorpay_payment_id}"
-        generated_signature = hmac.new(
-            RAZORPAY_KEY_SECRET.encode('utf-8'),
-            message.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if generated_signature != razorpay_signature:
+        # The checkout signature proves Razorpay issued this payment for the order, so no
+        # extra GET /v1/payments round-trip is needed; the webhook confirms it independently.
+        if not verify_checkout_signature(razorpay_order_id, razorpay_payment_id, razorpay_signature,
+                                         RAZORPAY_KEY_SECRET):
             return jsonify({
                 'success': False,
                 'message': 'Payment signature verification failed'
             }), 400
         
-        # Verify payment with Razorpay API
-        try:
-            payment_response = requests.get(
-                f'https://api.razorpay.com/v1/payments/{razorpay_payment_id}',
-                auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
-            )
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
             
-            if payment_response.status_code != 200:
+            # The signature only covers the order and payment ids: the delivery paid for is
+            # the one the order was created for (at its total_amount), not the one claimed
+            order_tracking_id = tracking_id_for_order(cursor, razorpay_order_id)
+            if not order_tracking_id or (tracking_id and tracking_id != order_tracking_id):
                 return jsonify({
                     'success': False,
-                    'message': 'Payment verification failed'
+                    'message': 'Payment does not match this delivery'
                 }), 400
+            tracking_id = order_tracking_id
             
-            payment_data = payment_response.json()
+            # Record the payment (a webhook may already have) and complete the delivery once
+            record_payment(cursor, razorpay_payment_id, tracking_id, 'checkout', order_id=razorpay_order_id)
+            status, changed = apply_payment(cursor, razorpay_payment_id)
+            if status != 'applied':
+                conn.rollback()
+                message, http_status = delivery_state.explain_rejection(cursor, tracking_id, 'completed',
+                                                                        payment_method='online')
+                return jsonify({'success': False, 'message': message}), http_status
             
-            # Check if payment is successful
-            if payment_data.get('status') != 'captured' and payment_data.get('status') != 'authorized':
-                return jsonify({
-                    'success': False,
-                    'message': f"Payment status: {payment_data.get('status')}"
-                }), 400
-                
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'message': f'Payment verification error: {str(e)}'
-            }), 500
+            conn.commit()
+        
+        if changed:
+            invalidate_tracking_view(tracking_id)
+            run_in_background(send_online_payment_receipt, razorpay_payment_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Payment successful',
+            'payment_id': razorpay_payment_id
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/payment/razorpay-webhook', methods=['POST'])
+def razorpay_webhook():
+    """
+    Razorpay webhook (payment.captured / payment.authorized / order.paid).
+    Verifies the signature, records the payment once and acknowledges at once;
+    the delivery is updated by a background job. Replays are acknowledged and dropped.
+    """
+    try:
+        if not RAZORPAY_WEBHOOK_SECRET:
+            return jsonify({'success': False, 'message': 'Webhook not configured'}), 503
+        
+        body = request.get_data()
+        if not verify_webhook_signature(body, request.headers.get('X-Razorpay-Signature'),
+                                        RAZORPAY_WEBHOOK_SECRET):
+            return jsonify({'success': False, 'message': 'Invalid signature'}), 400
+        
+        payment = parse_webhook(request.get_json(force=True, silent=True) or {})
+        if payment is None:
+            return jsonify({'success': True, 'message': 'Event ignored'})
         
-        # Update delivery payment status
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            
-            # Get delivery info before updating
-            cursor.execute("""
-                SELECT sender_name, sender_email, total_amount
-                FROM deliveries WHERE id = %s
-            """, (tracking_id,))
-            delivery_info = cursor.fetchone()
-            
-            # Update payment status
-            cursor.execute("""
-                UPDATE deliveries 
-                SET payment_status = 'paid', 
-                    payment_method = 'online',
-                    status = 'completed'
-                WHERE id = %s AND payment_status = 'pending'
-            """, (tracking_id,))
-            
-            if cursor.rowcount == 0:
-                return jsonify({
-                    'success': False,
-                    'message': 'Payment already processed or delivery not found'
-                }), 400
-            
+            cursor = conn.cursor()
+            if not payment['tracking_id']:
+                # payment.captured without the order: find the delivery by its order id
+                payment['tracking_id'] = tracking_id_for_order(cursor, payment['order_id'])
+                if not payment['tracking_id']:
+                    return jsonify({'success': True, 'message': 'Event ignored'})
+            first = record_payment(cursor, payment['payment_id'], payment['tracking_id'], 'webhook',
+                                   order_id=payment['order_id'], amount=payment['amount'],
+                                   event_id=request.headers.get('X-Razorpay-Event-Id'))
             conn.commit()
-            
-            # Send payment receipt email if sender email is provided
-            if delivery_info and delivery_info.get('sender_email'):
-                try:
-                    send_payment_receipt(
-                        to_email=delivery_info['sender_email'],
-                        tracking_id=tracking_id,
-                        sender_name=delivery_info.get('sender_name', ''),
-                        total_amount=float(delivery_info.get('total_amount', 0)),
-                        payment_method='online',
-                        payment_id=razorpay_payment_id
-                    )
-                except Exception as e:
-                    # Log error but don't fail the request
-                    print(f"Failed to send payment receipt email: {str(e)}")
-            
-            return jsonify({
-                'success': True,
-                'message': 'Payment successful',
-                'payment_id': razorpay_payment_id
-            })
+        
+        if first:
+            run_in_background(process_payment_event, payment['payment_id'])
+        return jsonify({'success': True, 'message': 'Received' if first else 'Duplicate'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def process_payment_event(payment_id):
+    """Background job: complete the delivery for a recorded payment and send the receipt"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        status, changed = apply_payment(cursor, payment_id)
+        cursor.execute("SELECT tracking_id FROM payment_events WHERE payment_id = %s", (payment_id,))
+        event = cursor.fetchone()
+        conn.commit()
+    
+    if changed and status == 'applied':
+        invalidate_tracking_view(event['tracking_id'])
+        send_online_payment_receipt(payment_id)
+    elif changed:
+        logger.warning("Payment %s for %s was not applied: delivery not payable", payment_id, event['tracking_id'])
+
+def send_online_payment_receipt(payment_id):
+    """Email the sender a receipt for an applied online payment"""
+    try:
+        with get_db_connection(readonly=True) as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT d.id, d.sender_name, d.sender_email, d.total_amount
+                FROM payment_events p JOIN deliveries d ON d.id = p.tracking_id
+                WHERE p.payment_id = %s
+            """, (payment_id,))
+            delivery_info = cursor.fetchone()
+        
+        if delivery_info and delivery_info.get('sender_email'):
+            send_payment_receipt(
+                to_email=delivery_info['sender_email'],
+                tracking_id=delivery_info['id'],
+                sender_name=delivery_info.get('sender_name', ''),
+                total_amount=float(delivery_info.get('total_amount', 0)),
+                payment_method='online',
+                payment_id=payment_id
+            )
+    except Exception:
+        # Log error; the payment itself is already recorded
+        logger.exception("Failed to send payment receipt email")
+
+def apply_received_payments():
+    """Apply payments recorded before a restart whose background job never ran"""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            payment_ids = received_payment_ids(cursor)
+        for payment_id in payment_ids:
+            process_payment_event(payment_id)
+    except Exception:
+        logger.exception("Could not apply pending payments")
+
 @app.route('/payment-success/<tracking_id>')
 def payment_success_page(tracking_id):
     """Redirect to track parcel page after payment success"""
@@ -1705,43 +1556,22 @@ def cash_payment_confirm(booking_id):
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
-            # Verify delivery belongs to partner and is COD
-            cursor.execute("""
-                SELECT id, partner_id, payment_method, payment_status 
-                FROM deliveries 
-                WHERE id = %s
-            """, (booking_id,))
-            delivery = cursor.fetchone()
-            
-            if not delivery:
-                return jsonify({'success': False, 'message': 'Delivery not found'}), 404
-            
-            if delivery['partner_id'] != partner_id:
-                return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+            # Verify delivery belongs to partner, is COD and delivered, and mark it paid (delivered -> completed)
+            if not delivery_state.complete_payment(cursor, booking_id, 'cash', partner_id=partner_id):
+                message, http_status = delivery_state.explain_rejection(cursor, booking_id, 'completed',
+                                                                        partner_id, payment_method='cash')
+                return jsonify({'success': False, 'message': message}), http_status
             
-            if delivery['payment_method'] != 'cash':
-                return jsonify({'success': False, 'message': 'Not a cash payment'}), 400
+            conn.commit()
+            invalidate_tracking_view(booking_id)
             
-            # Get delivery info before updating
+            # Get delivery info for the receipt
             cursor.execute("""
                 SELECT sender_name, sender_email, total_amount
                 FROM deliveries WHERE id = %s
             """, (booking_id,))
             delivery_info = cursor.fetchone()
             
-            # Update payment status (use regular cursor for UPDATE)
-            cursor.execute("""
-                UPDATE deliveries 
-                SET payment_status = 'paid',
-                    status = 'completed'
-                WHERE id = %s
-            """, (booking_id,))
-            
-            if cursor.rowcount == 0:
-                return jsonify({'success': False, 'message': 'Failed to update payment status'}), 400
-            
-            conn.commit()
-            
             # Send payment receipt email if sender email is provided
             if delivery_info and delivery_info.get('sender_email'):
                 try:
@@ -1753,36 +1583,79 @@ def cash_payment_confirm(booking_id):
                         payment_method='cash',
                         payment_id=None
                     )
-                except Exception as e:
+                except Exception:
                     # Log error but don't fail the request
-                    print(f"Failed to send payment receipt email: {str(e)}")
+                    logger.exception("Failed to send payment receipt email")
             
             return jsonify({'success': True, 'message': 'Cash payment confirmed'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# Payment status is polled while a customer checks out, so it is cached briefly and
+# dropped by invalidate_tracking_view(), which also wakes long-polling requests.
+PAYMENT_STATUS_TTL = float(os.getenv('PAYMENT_STATUS_TTL', '5'))
+PAYMENT_STATUS_MAX_WAIT = float(os.getenv('PAYMENT_STATUS_MAX_WAIT', '25'))
+payment_status_cache = TTLCache(max_entries=10000, ttl=PAYMENT_STATUS_TTL)
+payment_status_changes = ChangeNotifier()
+
+def load_payment_status(tracking_id):
+    """The payment status response for a delivery (cached), or None if it doesn't exist"""
+    cached = payment_status_cache.get(tracking_id)
+    if cached:
+        return cached
+    
+    # As in track_delivery: just after a change, read the primary and don't cache an older read
+    generation = payment_status_cache.generation(tracking_id)
+    with get_db_connection(readonly=not generation) as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT payment_status, payment_method, total_amount, status
+            FROM deliveries WHERE id = %s
+        """, (tracking_id,))
+        delivery = cursor.fetchone()
+    
+    if not delivery:
+        return None
+    
+    result = {
+        'success': True,
+        'payment_status': delivery['payment_status'],
+        'payment_method': delivery['payment_method'],
+        'total_amount': float(delivery['total_amount']) if delivery['total_amount'] else 0,
+        'status': delivery['status'],
+        # Opaque value for ?since= when long polling
+        'version': f"{delivery['status']}/{delivery['payment_status']}/{delivery['payment_method']}"
+    }
+    payment_status_cache.set(tracking_id, result, generation=generation)
+    return result
+
 @app.route('/api/payment/status/<tracking_id>', methods=['GET'])
 def payment_status(tracking_id):
-    """Get payment status for a delivery"""
+    """
+    Get payment status for a delivery.
+    Long poll: ?since=<version>&wait=<seconds> holds the request until the version
+    differs from since or wait (at most PAYMENT_STATUS_MAX_WAIT) has passed.
+    """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT payment_status, payment_method, total_amount, status
-                FROM deliveries WHERE id = %s
-            """, (tracking_id,))
-            delivery = cursor.fetchone()
-            
-            if not delivery:
-                return jsonify({'success': False, 'message': 'Delivery not found'}), 404
-            
-            return jsonify({
-                'success': True,
-                'payment_status': delivery['payment_status'],
-                'payment_method': delivery['payment_method'],
-                'total_amount': float(delivery['total_amount']) if delivery['total_amount'] else 0,
-                'status': delivery['status']
-            })
+        since = request.args.get('since')
+        wait = min(request.args.get('wait', 0, type=float) or 0, PAYMENT_STATUS_MAX_WAIT)
+        deadline = time.monotonic() + wait
+        
+        while True:
+            # Watching before the read: a change committed between the read and the
+            # wait still wakes us, instead of being noticed only when the cache expires
+            with payment_status_changes.watch(tracking_id) as changed:
+                result = load_payment_status(tracking_id)
+                if result is None:
+                    return jsonify({'success': False, 'message': 'Delivery not found'}), 404
+                
+                remaining = deadline - time.monotonic()
+                if since is None or result['version'] != since or remaining <= 0:
+                    return jsonify(result)
+                
+                # Wake on a change made by this process; changes made by other workers are
+                # picked up when the cached entry expires
+                changed.wait(min(remaining, PAYMENT_STATUS_TTL))
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -1792,17 +1665,11 @@ def select_cod(tracking_id):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE deliveries 
-                SET payment_method = 'cash', 
-                    payment_status = 'pending_cash'
-                WHERE id = %s AND payment_status = 'pending'
-            """, (tracking_id,))
-            
-            if cursor.rowcount == 0:
+            if not delivery_state.select_cash(cursor, tracking_id):
                 return jsonify({'success': False, 'message': 'Payment already processed or delivery not found'}), 400
             
             conn.commit()
+            invalidate_tracking_view(tracking_id)
             
             return jsonify({
                 'success': True,
@@ -1817,7 +1684,7 @@ def admin_partners():
         if not session.get('admin_logged_in'):
             return jsonify({'success': False, 'message': 'Not authenticated'}), 401
         
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             cursor = conn.cursor(dictionary=True)
             cursor.execute("""
                 SELECT id, first_name, last_name, email, phone, vehicle_type, 
@@ -1848,7 +1715,7 @@ def export_admin_data_csv():
             return jsonify({'success': False, 'message': 'Not authenticated'}), 401
         
         # Get all deliveries data
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             cursor = conn.cursor(dictionary=True)
             cursor.execute("""
                 SELECT d.id, d.sender_name, d.sender_address, d.receiver_name, 
@@ -1925,5 +1792,8 @@ def generate_csv(deliveries):
     response.headers['Content-Disposition'] = f'attachment; filename=deliveries_export_{timestamp}.csv'
     return response
 
+# Finish payments recorded before the last restart
+run_in_background(apply_received_payments)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8000)
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Structured logging
+setup_logging() sends every log record through a queue to a listener thread, which
+formats it as one JSON line (ASCII-only, so no console encoding setup is needed) and
+writes it to stdout; the request thread only builds the record and enqueues it.
+init_app() gives each request an ID (X-Request-ID, or a new one, echoed back) that is
+added to every record logged while serving it, and logs one line per request with its
+route, status and duration. Debug output is gated by LOG_LEVEL (default INFO).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+
+from flask import request
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# One 'request' line per request (route, status, duration); set LOG_REQUESTS=0 to turn off
+LOG_REQUESTS = os.getenv('LOG_REQUESTS', '1').lower() not in ('0', 'false', 'no')
+
+_request_id = ContextVar('request_id', default=None)
+_listener = None
+request_logger = logging.getLogger('boxy.request')
+
+# LogRecord attributes that are not extra fields
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request_id and any extra fields"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _RequestContextFilter(logging.Filter):
+    """Stamp records with the current request ID (runs on the thread that logs)"""
+
+    def filter(self, record):
+        request_id = _request_id.get()
+        if request_id is not None:
+            record.request_id = request_id
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting (including tracebacks) to the listener thread.
+    Only the message is rendered here, as its arguments may change after the call.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(stream=None):
+    """Route all logging through the JSON queue handler (once per process)"""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(_RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush the queue and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _start_request():
+    request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    request.environ['boxy.log_start'] = time.perf_counter()
+
+
+def _finish_request(response):
+    request_id = _request_id.get()
+    if request_id is None:
+        return response
+    response.headers['X-Request-ID'] = request_id
+    if LOG_REQUESTS:
+        start = request.environ.get('boxy.log_start', time.perf_counter())
+        rule = request.url_rule
+        request_logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+            'route': rule.rule if rule is not None else None,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+        })
+    _request_id.set(None)
+    return response
+
+
+def init_app(app):
+    """Request IDs and one log line per request for app"""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
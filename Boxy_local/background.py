@@ -0,0 +1,28 @@
+"""
+Background work
+A small shared thread pool for work that must not hold up the HTTP response
+(webhook processing, emails). Jobs are lost if the process dies, so callers keep
+enough state in the database to redo them (see payments.received_payment_ids).
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '4'))
+
+_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix='boxy-background')
+
+
+def _report_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Background job failed: %s", error, exc_info=error)
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the background pool; failures are logged, not raised"""
+    future = _executor.submit(func, *args, **kwargs)
+    future.add_done_callback(_report_failure)
+    return future
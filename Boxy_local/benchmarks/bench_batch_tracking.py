@@ -0,0 +1,60 @@
+"""
+Benchmark: batch tracking endpoint vs one tracking call per parcel
+
+Run against a running Boxy server:
+    python benchmarks/bench_batch_tracking.py --count 200
+    python benchmarks/bench_batch_tracking.py QP000000001 QP000000002 ...
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+
+def time_single_calls(http, base_url, tracking_ids):
+    """Track each parcel with its own request, as merchants do today"""
+    start = time.perf_counter()
+    for tracking_id in tracking_ids:
+        http.get(f"{base_url}/api/deliveries/track/{tracking_id}", timeout=10)
+    return time.perf_counter() - start
+
+
+def time_batch_call(http, base_url, tracking_ids):
+    """Track all parcels with a single batch request"""
+    start = time.perf_counter()
+    response = http.post(f"{base_url}/api/deliveries/track/batch",
+                         json={'tracking_ids': tracking_ids}, timeout=30)
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tracking_ids', nargs='*', help='Tracking IDs to use')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--count', type=int, default=100,
+                        help='Use QP000000001..QPn when no tracking IDs are given')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    tracking_ids = args.tracking_ids or [f"QP{i:09d}" for i in range(1, args.count + 1)]
+    http = requests.Session()
+
+    single_times = []
+    batch_times = []
+    for _ in range(args.rounds):
+        single_times.append(time_single_calls(http, args.base_url, tracking_ids))
+        batch_times.append(time_batch_call(http, args.base_url, tracking_ids))
+
+    single = statistics.median(single_times)
+    batch = statistics.median(batch_times)
+    print(f"Parcels tracked:          {len(tracking_ids)}")
+    print(f"{len(tracking_ids)} single calls (median): {single * 1000:.1f} ms")
+    print(f"1 batch call (median):    {batch * 1000:.1f} ms")
+    print(f"Speed-up:                 {single / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
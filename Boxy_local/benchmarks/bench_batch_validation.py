@@ -0,0 +1,141 @@
+"""
+Column-wise validation (batch_validation.py) against row-by-row validation
+
+Generates --rows bulk upload rows (default 100k) with an --invalid share of broken
+values, plus valid values that take the slow paths (formatted phone numbers,
+non-ASCII names), and times the receiver name, drop address, receiver phone and
+parcel weight columns: validation.py called once per value vs validate_columns().
+Both sides must agree on every row before the times are shown, and booking_errors()
+must give the same errors as schema.BOOKING.validate() per row.
+    python benchmarks/bench_batch_validation.py
+    python benchmarks/bench_batch_validation.py --rows 100000 --invalid 0.2 --repeat 5
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import batch_validation
+import validation
+from schema import BOOKING, Address, Name, Phone
+
+FIRST_NAMES = ['Aarav', 'Priya', 'Ravi', 'Ananya', 'Vikram', 'Meera', "D'Souza", 'Zoë', 'Anne-Marie']
+STREETS = ['SG Highway, Bodakdev', 'CG Road, Navrangpura', 'Ashram Road, Usmanpura', 'Relief Road, Kalupur']
+
+BAD_NAMES = ['R', 'Ravi  Kumar', 'Ravi3', ' -Ravi', 'Ravi.', '', None]
+BAD_ADDRESSES = ['12 Road', '12; SG Highway, Bodakdev', '12  SG Highway, Bodakdev', '', 'x' * 201]
+BAD_PHONES = ['98765abc10', '987654321', '5876543210', '+91 98765 43210', '', None]
+BAD_WEIGHTS = ['', '-1', 'heavy', '1000.5', '0', None]
+
+
+def make_stop(rng, invalid):
+    name = f'{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)}'
+    address = f'{rng.randint(1, 999)}, {rng.choice(STREETS)}, Ahmedabad'
+    phone = f'{rng.choice("6789")}{rng.randint(0, 999999999):09d}'
+    if rng.random() < 0.1:
+        phone = f'{phone[:5]} {phone[5:]}'
+    if rng.random() < invalid:
+        which = rng.randrange(3)
+        if which == 0:
+            name = rng.choice(BAD_NAMES)
+        elif which == 1:
+            address = rng.choice(BAD_ADDRESSES)
+        else:
+            phone = rng.choice(BAD_PHONES)
+    return {'receiver_name': name, 'drop_address': address, 'receiver_phone': phone}
+
+
+def make_rows(count, invalid, seed):
+    """Rows shaped like bulk_import.rows_from_csv() output"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        stops = [make_stop(rng, invalid / 3) for _ in range(rng.choice((1, 1, 1, 2, 3, 5)))]
+        row = {'stops': stops, 'parcelType': rng.choice(['documents', 'electronics', 'food', 'clothes']),
+               'parcelWeight': f'{rng.uniform(0.5, 25):.1f}', 'parcelOtherSpec': '',
+               'parcelHeight': str(rng.randint(10, 55)), 'parcelWidth': str(rng.randint(10, 40)),
+               'preferredVehicle': rng.choice(['', 'bike', 'scooter', 'car', 'Car'])}
+        if rng.random() < invalid:
+            problem = rng.randrange(5)
+            if problem == 0:
+                row['parcelWeight'] = rng.choice(BAD_WEIGHTS)
+            elif problem == 1:
+                row['parcelType'] = 'other'
+            elif problem == 2:
+                row['parcelHeight'] = '75'
+            elif problem == 3:
+                row['preferredVehicle'] = 'truck'
+            else:
+                row['stops'] = rng.choice([[], [stops[0]] * 6, ['not a stop']])
+        rows.append(row)
+    return rows
+
+
+def scalar_columns(columns):
+    """validation.py, one call per value; a row is marked when any of its values fails"""
+    mask = [False] * len(columns['weight'])
+    for name, check in (('name', lambda value: validation.validate_name(value, 'Receiver name')),
+                        ('address', lambda value: validation.validate_address(value, 'Drop address')),
+                        ('phone', validation.validate_phone),
+                        ('weight', lambda value: validation.validate_parcel_weight(None if value == '' else value))):
+        for index, value in enumerate(columns[name]):
+            if not check(value)[0]:
+                mask[index] = True
+    return mask
+
+
+def scalar_bookings(rows):
+    errors = {}
+    for index, row in enumerate(rows):
+        found = BOOKING.validate(row)[1]
+        if found:
+            errors[index] = found
+    return errors
+
+
+def best_time(repeat, func, *args):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--invalid', type=float, default=0.05, help='share of rows with a broken value')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.invalid, args.seed)
+    first_stops = [row['stops'][0] if row['stops'] and isinstance(row['stops'][0], dict) else {} for row in rows]
+    columns = {'name': [stop.get('receiver_name') for stop in first_stops],
+               'address': [stop.get('drop_address') for stop in first_stops],
+               'phone': [stop.get('receiver_phone') for stop in first_stops],
+               'weight': [row['parcelWeight'] for row in rows]}
+    fields = {'name': Name('Receiver name'), 'address': Address('Drop address'), 'phone': Phone(),
+              'weight': BOOKING.fields['parcelWeight']}
+    print(f"{args.rows:,} rows, NumPy {'available' if batch_validation.numpy else 'not installed'}")
+
+    scalar_time, expected = best_time(args.repeat, scalar_columns, columns)
+    column_time, (mask, _) = best_time(args.repeat, batch_validation.validate_columns, columns, fields)
+    if list(map(bool, mask)) != expected:
+        sys.exit("columns: validate_columns() and validation.py disagree")
+    print(f"  columns   {sum(expected):>7,} rows flagged   validation.py {scalar_time * 1000:>8.1f} ms   "
+          f"columns {column_time * 1000:>8.1f} ms   {scalar_time / column_time:.1f}x")
+
+    expected, got = scalar_bookings(rows), batch_validation.booking_errors(rows)
+    if got != expected:
+        first = min(index for index in expected.keys() | got.keys() if expected.get(index) != got.get(index))
+        sys.exit(f"bookings: row {first + 1} is {expected.get(first)} per row, {got.get(first)} in the batch")
+    print(f"  bookings  {len(expected):>7,} rows invalid   (same errors as BOOKING.validate per row)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: booking creation throughput, 1 to 5 stops
+
+For each stop count, writes BENCH* bookings one transaction at a time, the way
+/api/deliveries/create does, using two strategies:
+  legacy  - column probes, INSERT, follow-up UPDATE, one INSERT per stop, re-SELECT
+  bulk    - bookings.insert_bookings(): one INSERT per table, response built in memory
+Pricing is left out (it calls the Distance Matrix API). Reports bookings/sec and
+removes the seeded rows afterwards. Point it at a scratch database:
+    DB_NAME=Boxy_bench python benchmarks/bench_booking_create.py --bookings 500
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_db import cleanup
+from bookings import build_booking, booking_response, insert_bookings
+from database import get_db_connection
+from delivery_events import record_event
+
+DATA = {
+    'parcelType': 'documents',
+    'parcelWeight': '2.5',
+    'parcelHeight': '20',
+    'parcelWidth': '15',
+    'preferredVehicle': 'bike',
+}
+# DATA as schema.BOOKING.validate() cleans it, stops aside
+VALUES = {'parcelType': 'documents', 'parcelWeight': 2.5, 'preferredVehicle': 'bike'}
+
+
+def make_stops(count):
+    return [{
+        'stop_number': number,
+        'drop_address': f'Receiver address {number}',
+        'receiver_name': f'Receiver {number}',
+        'receiver_phone': '9000000001',
+    } for number in range(1, count + 1)]
+
+
+def create_legacy(conn, delivery_id, stops):
+    """The pre-bulk create_delivery write path"""
+    cursor = conn.cursor()
+    cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'total_amount'")
+    cursor.fetchone()
+    cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'sender_email'")
+    cursor.fetchone()
+    cursor.execute("""
+        INSERT INTO deliveries (id, sender_name, sender_address, sender_email, receiver_name,
+                             receiver_address, receiver_phone, parcel_type, weight, status, total_stops, total_amount)
+        VALUES (%s, 'Sender', 'Sender address 1', 'bench@boxy.local', %s, %s, %s, %s, %s, 'available', %s, 100)
+    """, (delivery_id, stops[0]['receiver_name'], stops[0]['drop_address'], stops[0]['receiver_phone'],
+          DATA['parcelType'], float(DATA['parcelWeight']), len(stops)))
+    cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'parcel_type_specification'")
+    cursor.fetchone()
+    cursor.execute(
+        "UPDATE deliveries SET parcel_type_specification = %s, parcel_height = %s, parcel_width = %s, preferred_vehicle = %s WHERE id = %s",
+        (None, 20.0, 15.0, DATA['preferredVehicle'], delivery_id))
+    for stop in stops:
+        cursor.execute("""
+            INSERT INTO delivery_stops (booking_id, stop_number, drop_address, receiver_name, receiver_phone, status)
+            VALUES (%s, %s, %s, %s, %s, 'pending')
+        """, (delivery_id, stop['stop_number'], stop['drop_address'], stop['receiver_name'], stop['receiver_phone']))
+    record_event(cursor, delivery_id, 'created', status='available', payment_status='pending')
+    conn.commit()
+    cursor_dict = conn.cursor(dictionary=True)
+    cursor_dict.execute("""
+        SELECT id, sender_name, sender_address, receiver_name, receiver_address,
+               receiver_phone, parcel_type, weight, status, partner_id, total_stops,
+               created_at, accepted_at, updated_at, delivered_at
+        FROM deliveries WHERE id = %s
+    """, (delivery_id,))
+    delivery = cursor_dict.fetchone()
+    cursor_dict.close()
+    return delivery
+
+
+def create_bulk(conn, delivery_id, stops):
+    """The current create_delivery write path"""
+    cursor = conn.cursor()
+    booking = build_booking(delivery_id, 'Sender', 'Sender address 1', 'bench@boxy.local',
+                            dict(VALUES, stops=stops), DATA, 100, datetime.now().replace(microsecond=0))
+    insert_bookings(cursor, [booking])
+    conn.commit()
+    return booking_response(booking)
+
+
+def run(create, bookings, stop_count, offset):
+    stops = make_stops(stop_count)
+    with get_db_connection() as conn:
+        start = time.perf_counter()
+        for i in range(bookings):
+            create(conn, f"BENCH{offset + i:09d}", stops)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=300, help='bookings per strategy and stop count')
+    args = parser.parse_args()
+
+    cleanup()
+    try:
+        print(f"{'stops':>5}  {'legacy/s':>10}  {'bulk/s':>10}  {'speedup':>7}")
+        offset = 1
+        for stop_count in range(1, 6):
+            legacy = run(create_legacy, args.bookings, stop_count, offset)
+            offset += args.bookings
+            bulk = run(create_bulk, args.bookings, stop_count, offset)
+            offset += args.bookings
+            print(f"{stop_count:>5}  {args.bookings / legacy:>10,.0f}  {args.bookings / bulk:>10,.0f}  "
+                  f"{legacy / bulk:>6.2f}x")
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
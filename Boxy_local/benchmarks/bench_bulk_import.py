@@ -0,0 +1,117 @@
+"""
+Benchmark: bulk booking import of a generated CSV upload
+
+Generates --rows bookings (1-5 stops, addresses drawn from a small pool the way a
+merchant's regular customers repeat, --invalid share of broken rows), then times
+each bulk_import stage: CSV parsing, validation, pricing (reporting how many
+distance lookups deduplication saved) and, unless --no-db, the chunked inserts.
+Imported rows are deleted afterwards. Point it at a scratch database:
+    DB_NAME=Boxy_bench python benchmarks/bench_bulk_import.py --rows 10000
+    python benchmarks/bench_bulk_import.py --rows 10000 --no-db
+    python benchmarks/bench_bulk_import.py --rows 10000 --write-csv bookings.csv
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bulk_import
+from pricing import route_legs
+
+SENDER = {'name': 'Bench Merchant', 'address': '12 Bench Road, Ahmedabad', 'email': None}
+
+HEADER = (['receiver_name', 'drop_address', 'receiver_phone']
+          + [f'stop{n}_{field}' for n in range(2, 6)
+             for field in ('receiver_name', 'drop_address', 'receiver_phone')]
+          + list(bulk_import.CSV_FIELDS))
+
+
+def generate_csv(rows, invalid_share, address_pool, seed):
+    rng = random.Random(seed)
+    addresses = [f'{n} Market Street, Ahmedabad' for n in range(1, address_pool + 1)]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(HEADER)
+    for _ in range(rows):
+        stop_count = rng.randint(1, 5)
+        stops = []
+        for n in range(5):
+            if n < stop_count:
+                stops += ['Receiver Name', rng.choice(addresses), f'9{rng.randint(0, 999999999):09d}']
+            else:
+                stops += ['', '', '']
+        vehicle = rng.choice(['', 'bike', 'scooter', 'car'])
+        weight = f'{rng.uniform(0.5, 20):.1f}'
+        if rng.random() < invalid_share:
+            weight = rng.choice(['', '-1', 'heavy'])
+        writer.writerow(stops + ['documents', weight, '', '30', '20', vehicle])
+    return output.getvalue()
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {elapsed * 1000:>9.1f} ms")
+    return result, elapsed
+
+
+def delete_imported(delivery_ids):
+    from database import get_db_connection
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(delivery_ids), 1000):
+            chunk = delivery_ids[start:start + 1000]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM delivery_events WHERE tracking_id IN ({placeholders})", chunk)
+            cursor.execute(f"DELETE FROM deliveries WHERE id IN ({placeholders})", chunk)
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--invalid', type=float, default=0.02, help='share of rows with a bad weight')
+    parser.add_argument('--addresses', type=int, default=200, help='distinct drop addresses')
+    parser.add_argument('--chunk-size', type=int, default=bulk_import.BULK_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-db', action='store_true', help='stop after pricing')
+    parser.add_argument('--write-csv', metavar='PATH', help='only write the generated CSV')
+    args = parser.parse_args()
+
+    text = generate_csv(args.rows, args.invalid, args.addresses, args.seed)
+    if args.write_csv:
+        Path(args.write_csv).write_text(text, encoding='utf-8')
+        print(f"Wrote {args.rows} rows to {args.write_csv}")
+        return
+
+    print(f"{args.rows} rows, {len(text) / 1024:,.0f} KiB of CSV")
+    rows, parse_time = timed('parse', bulk_import.rows_from_csv, text)
+    (results, valid), validate_time = timed('validate', bulk_import.validate_rows, rows)
+    prices, price_time = timed('price', bulk_import.price_rows, SENDER['address'], valid)
+    total = parse_time + validate_time + price_time
+
+    legs = [leg for values in valid.values() for leg in route_legs(SENDER['address'], values['stops'])]
+    print(f"  {len(valid)} valid, {len(rows) - len(valid)} rejected; "
+          f"{len(set(legs))} distance lookups instead of {len(legs)}")
+
+    if not args.no_db:
+        from database import get_db_connection
+        with get_db_connection() as conn:
+            _, insert_time = timed('insert', bulk_import.insert_rows, conn, SENDER, rows, valid,
+                                   prices, results, args.chunk_size)
+        total += insert_time
+        delivery_ids = [result['delivery_id'] for result in results if result['success']]
+        print(f"  {len(delivery_ids)} bookings saved in chunks of {args.chunk_size}")
+        delete_imported(delivery_ids)
+
+    print(f"{args.rows / total:,.0f} rows/sec end to end ({total:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
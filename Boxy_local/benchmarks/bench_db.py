@@ -0,0 +1,88 @@
+"""
+Seed and cleanup helpers shared by the database benchmarks
+All seeded rows use BENCH* ids (and @bench.boxy.local emails) so they can be removed
+afterwards.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import get_db_connection
+
+PARTNER_ID = 'PARTNERBENCH'
+EMAIL_DOMAIN = 'bench.boxy.local'
+PASSWORD = 'bench'
+
+
+def seed_bookings(count, stops_per_booking=1, status='available', partner_id=None):
+    """Insert count BENCH* bookings (plus the benchmark partner) and return their ids"""
+    delivery_ids = [f"BENCH{i:09d}" for i in range(1, count + 1)]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT IGNORE INTO partners (id, first_name, last_name, phone, email, vehicle_type,
+                                         vehicle_number, aadhar, password, status, approved)
+            VALUES (%s, 'Bench', 'Partner', '9000000000', 'bench.partner@boxy.local', 'bike',
+                    'GJ01AB0000', '123456789012', 'bench', 'online', TRUE)
+        """, (PARTNER_ID,))
+        cursor.executemany("""
+            INSERT INTO deliveries (id, sender_name, sender_address, receiver_name, receiver_address,
+                                    receiver_phone, parcel_type, weight, status, partner_id,
+                                    total_stops, total_amount)
+            VALUES (%s, 'Sender', 'Sender address 1', 'Receiver', 'Receiver address 1',
+                    '9000000001', 'documents', 1.0, %s, %s, %s, 100)
+        """, [(delivery_id, status, partner_id, stops_per_booking) for delivery_id in delivery_ids])
+        cursor.executemany("""
+            INSERT INTO delivery_stops (booking_id, stop_number, drop_address, receiver_name, receiver_phone)
+            VALUES (%s, %s, 'Receiver address 1', 'Receiver', '9000000001')
+        """, [(delivery_id, stop_number)
+              for delivery_id in delivery_ids
+              for stop_number in range(1, stops_per_booking + 1)])
+        conn.commit()
+    return delivery_ids
+
+
+def seed_partners(count, status='online'):
+    """Insert count approved BENCH* partners; returns their login emails (password PASSWORD)"""
+    rows = [(f"BENCHP{i:06d}", f"partner{i}@{EMAIL_DOMAIN}", f"8{i:09d}", status)
+            for i in range(1, count + 1)]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT IGNORE INTO partners (id, first_name, last_name, phone, email, vehicle_type,
+                                         vehicle_number, aadhar, password, status, approved)
+            VALUES (%s, 'Bench', 'Partner', %s, %s, 'bike', 'GJ01AB0000', '123456789012', %s, %s, TRUE)
+        """, [(partner_id, phone, email, PASSWORD, status) for partner_id, email, phone, status in rows])
+        conn.commit()
+    return [email for _, email, _, _ in rows]
+
+
+def seed_customers(count):
+    """Insert count BENCH* customers; returns their login emails (password PASSWORD)"""
+    rows = [(f"BENCHC{i:06d}", f"customer{i}@{EMAIL_DOMAIN}", f"7{i:09d}") for i in range(1, count + 1)]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT IGNORE INTO customers (id, first_name, last_name, email, phone, address, password)
+            VALUES (%s, 'Bench', 'Customer', %s, %s, 'Bench pickup address, Ahmedabad', %s)
+        """, [(customer_id, email, phone, PASSWORD) for customer_id, email, phone in rows])
+        conn.commit()
+    return [email for _, email, _ in rows]
+
+
+def cleanup():
+    """
+    Remove everything the seed_* helpers created, and bookings made by seeded customers
+    (stops go with their booking)
+    """
+    bench_bookings = "(SELECT id FROM deliveries WHERE id LIKE %s OR sender_email LIKE %s)"
+    patterns = ('BENCH%', f'%@{EMAIL_DOMAIN}')
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"DELETE FROM delivery_events WHERE tracking_id IN {bench_bookings}", patterns)
+        cursor.execute(f"DELETE FROM payment_events WHERE tracking_id IN {bench_bookings}", patterns)
+        cursor.execute("DELETE FROM deliveries WHERE id LIKE %s OR sender_email LIKE %s", patterns)
+        cursor.execute("DELETE FROM partners WHERE id = %s OR id LIKE %s", (PARTNER_ID, 'BENCHP%'))
+        cursor.execute("DELETE FROM customers WHERE id LIKE %s", ('BENCHC%',))
+        conn.commit()
@@ -0,0 +1,78 @@
+"""
+Benchmark: delivery_events ingestion rate
+
+Inserts synthetic events the way the app does (one event per transaction) and
+in batches (executemany, one commit per batch), and reports events/sec.
+Point it at a scratch database, e.g.:
+    DB_NAME=Boxy_bench python benchmarks/bench_event_ingestion.py --events 20000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import get_db_connection
+from delivery_events import create_events_table, event_row, record_event, record_events
+
+EVENT_FLOW = ('created', 'accepted', 'picked', 'on_the_way', 'delivered', 'paid')
+
+
+def synthetic_events(count):
+    """Event tuples cycling through the normal life of a booking"""
+    rows = []
+    for i in range(count):
+        event_type = EVENT_FLOW[i % len(EVENT_FLOW)]
+        tracking_id = f"BENCH{i // len(EVENT_FLOW):09d}"
+        rows.append(event_row(tracking_id, event_type, status=event_type, partner_id='PARTNER0001'))
+    return rows
+
+
+def ingest_one_per_transaction(conn, rows):
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    for row in rows:
+        record_event(cursor, row[0], row[1], status=row[2], partner_id=row[4])
+        conn.commit()
+    return time.perf_counter() - start
+
+
+def ingest_batched(conn, rows, batch_size):
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        record_events(cursor, rows[i:i + batch_size])
+        conn.commit()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--cleanup', action='store_true', help='Delete the BENCH* events afterwards')
+    args = parser.parse_args()
+
+    rows = synthetic_events(args.events)
+    with get_db_connection() as conn:
+        create_events_table(conn.cursor())
+        conn.commit()
+
+        single_rows = rows[:min(len(rows), 2000)]
+        elapsed = ingest_one_per_transaction(conn, single_rows)
+        print(f"One event per transaction: {len(single_rows) / elapsed:,.0f} events/sec "
+              f"({len(single_rows)} events in {elapsed:.2f}s)")
+
+        elapsed = ingest_batched(conn, rows, args.batch_size)
+        print(f"Batches of {args.batch_size}:          {len(rows) / elapsed:,.0f} events/sec "
+              f"({len(rows)} events in {elapsed:.2f}s)")
+
+        if args.cleanup:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM delivery_events WHERE tracking_id LIKE 'BENCH%'")
+            conn.commit()
+
+
+if __name__ == '__main__':
+    main()
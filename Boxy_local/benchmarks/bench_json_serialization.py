@@ -0,0 +1,121 @@
+"""
+Benchmark: serializing partner payloads (/api/partner/status) to JSON
+
+Builds rows shaped like mysql-connector's dictionary rows (datetime and Decimal values,
+stops per delivery) for --deliveries deliveries and times building the response:
+  legacy   - the old per-row isoformat() loops + Flask's default provider
+  json     - json_provider.encode_value with the standard library
+  orjson   - BoxyJSONProvider backed by orjson (if installed)
+No database needed:
+    python benchmarks/bench_json_serialization.py --deliveries 500 --stops 3
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import BoxyJSONProvider, encode_value, orjson
+
+
+class StdlibProvider(DefaultJSONProvider):
+    default = staticmethod(encode_value)
+
+
+def make_rows(count, stops, rng):
+    start = datetime(2024, 1, 1)
+    deliveries = []
+    for i in range(count):
+        created_at = start + timedelta(minutes=rng.randrange(500000))
+        deliveries.append({
+            'id': f'BOXY{i:012d}', 'sender_name': 'Sender Name', 'sender_address': '12 Ring Road, Surat',
+            'receiver_name': 'Receiver Name', 'receiver_address': '34 Station Road, Surat',
+            'receiver_phone': '9876543210', 'parcel_type': 'documents',
+            'weight': Decimal(f'{rng.uniform(0.5, 20):.2f}'), 'status': 'in_transit',
+            'partner_id': 'PARTNER1', 'total_stops': stops,
+            'created_at': created_at, 'accepted_at': created_at + timedelta(minutes=5),
+            'updated_at': created_at + timedelta(minutes=30), 'delivered_at': None,
+            'total_amount': Decimal(f'{rng.uniform(60, 900):.2f}'), 'payment_status': 'pending',
+            'payment_method': None,
+            'stops': [{
+                'stop_number': n, 'drop_address': f'{n} Drop Street, Surat', 'receiver_name': 'Receiver',
+                'receiver_phone': '9876543210', 'status': 'pending',
+                'delivered_at': created_at + timedelta(minutes=40) if n == 1 else None,
+            } for n in range(1, stops + 1)],
+        })
+    return deliveries
+
+
+def legacy_response(app, deliveries):
+    # Rows are converted in place by the old loops, so work on fresh copies
+    deliveries = [dict(d, stops=[dict(s) for s in d['stops']]) for d in deliveries]
+    for delivery in deliveries:
+        for stop in delivery['stops']:
+            for key, value in stop.items():
+                if isinstance(value, datetime):
+                    stop[key] = value.isoformat()
+    for delivery in deliveries:
+        for key, value in delivery.items():
+            if isinstance(value, datetime):
+                delivery[key] = value.isoformat()
+    return app.json.response({'success': True, 'my_deliveries': deliveries, 'available_deliveries': []})
+
+
+def copy_only(deliveries):
+    return [dict(d, stops=[dict(s) for s in d['stops']]) for d in deliveries]
+
+
+def provider_response(app, deliveries):
+    return app.json.response({'success': True, 'my_deliveries': deliveries, 'available_deliveries': []})
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deliveries', type=int, default=500)
+    parser.add_argument('--stops', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    deliveries = make_rows(args.deliveries, args.stops, random.Random(1))
+    variants = [('legacy', DefaultJSONProvider, legacy_response),
+                ('json', StdlibProvider, provider_response)]
+    if orjson is not None:
+        variants.append(('orjson', BoxyJSONProvider, provider_response))
+    else:
+        print("orjson not installed; skipping the orjson variant")
+
+    # The legacy variant copies rows before converting them; subtract that copy
+    copy_time = timed(lambda: copy_only(deliveries), args.repeat)
+    baseline = None
+    print(f"{args.deliveries} deliveries x {args.stops} stops, best of {args.repeat}")
+    for name, provider, build in variants:
+        app = Flask(__name__)
+        app.json = provider(app)
+        with app.app_context():
+            size = len(build(app, deliveries).get_data())
+            seconds = timed(lambda: build(app, deliveries), args.repeat)
+        if name == 'legacy':
+            seconds -= copy_time
+            baseline = seconds
+        print(f"  {name:7s} {seconds * 1000:8.2f} ms  {size / 1024:7.1f} KiB  "
+              f"{baseline / seconds:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: per-request logging cost of the partner dashboard's status poll
+
+The dashboard polls GET /api/partner/status. Compares, on an in-memory stand-in for
+that route served through the Flask test client:
+  print    - the old code: print(f"DEBUG: ...") on every call, straight to stdout
+  logging  - app_logging: level-gated logger.debug (off at INFO) plus one JSON
+             request line, formatted and written by the queue listener thread
+  debug    - the same with LOG_LEVEL=DEBUG, i.e. the debug line also emitted
+Output goes to a line-buffered file, as stdout usually is in a container/console;
+--write-latency-us adds a delay to every write, like a slow terminal or a log pipe
+whose reader falls behind (print blocks the request, the queue does not):
+    python benchmarks/bench_logging.py --requests 20000 --write-latency-us 200
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask, jsonify, session
+
+import app_logging
+
+logger = logging.getLogger('bench.partner_status')
+
+
+class SlowWriter:
+    """Text stream whose writes take at least latency seconds"""
+
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def make_app(use_logging):
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+    if use_logging:
+        app_logging.init_app(app)
+
+    @app.route('/api/partner/status')
+    def partner_status():
+        partner_id = session.get('partner_id')
+        status = 'online'  # stands in for SELECT status FROM partners
+        if use_logging:
+            logger.debug("Partner %s status from DB: %s", partner_id, status)
+        else:
+            print(f"DEBUG: Current status from DB: {status}")
+        return jsonify({'success': True, 'status': status})
+
+    return app
+
+
+def per_request(app, count):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['partner_id'] = 'PARTNER1'
+    for _ in range(200):
+        client.get('/api/partner/status')
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get('/api/partner/status')
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--write-latency-us', type=float, default=0, help='delay added to each write')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = open(os.path.join(tmp, 'stdout.log'), 'w', buffering=1, encoding='utf-8')
+        out = SlowWriter(file, args.write_latency_us / 1e6)
+        with redirect_stdout(out):
+            baseline = per_request(make_app(False), args.requests)
+            app_logging.setup_logging(stream=out)
+            logging.getLogger().setLevel(logging.INFO)
+            gated = per_request(make_app(True), args.requests)
+            logging.getLogger().setLevel(logging.DEBUG)
+            debug = per_request(make_app(True), args.requests)
+            logging.getLogger().setLevel(logging.INFO)
+            app_logging.stop_logging()
+        file.close()
+        size = os.path.getsize(os.path.join(tmp, 'stdout.log'))
+
+    print(f"{args.requests} status polls per variant (Flask test client), "
+          f"{args.write_latency_us:g} us/write, {size / 1024:.0f} KiB written")
+    print(f"  print   {baseline * 1e6:8.1f} us/request")
+    print(f"  logging {gated * 1e6:8.1f} us/request  (INFO: request line only)")
+    print(f"  debug   {debug * 1e6:8.1f} us/request  (DEBUG: request + debug line)")
+
+
+if __name__ == '__main__':
+    main()
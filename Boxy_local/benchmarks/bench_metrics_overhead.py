@@ -0,0 +1,97 @@
+"""
+Benchmark: cost of the request instrumentation (metrics.py)
+
+Serves a small route that runs --queries statements on a no-op cursor through the
+Flask test client, with and without metrics.init_app() and the timed cursor wrapper
+from database.py, and reports the added time per request and per statement. Also
+times rendering /metrics for every route of the real app. No database needed:
+    python benchmarks/bench_metrics_overhead.py --requests 20000 --queries 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask, jsonify
+
+import metrics
+from database import _TimedCursor
+
+
+class NullCursor:
+    def execute(self, operation, params=None):
+        return None
+
+    def fetchall(self):
+        return []
+
+
+def make_app(instrumented, queries):
+    app = Flask(__name__)
+    if instrumented:
+        metrics.init_app(app)
+
+    @app.route('/api/item/<item_id>')
+    def item(item_id):
+        cursor = _TimedCursor(NullCursor()) if instrumented else NullCursor()
+        for _ in range(queries):
+            cursor.execute("SELECT id FROM deliveries WHERE id = %s", (item_id,))
+            cursor.fetchall()
+        return jsonify({'success': True, 'id': item_id})
+
+    return app
+
+
+def per_request(app, count):
+    client = app.test_client()
+    for i in range(200):
+        client.get(f'/api/item/{i}')
+    start = time.perf_counter()
+    for i in range(count):
+        client.get(f'/api/item/{i}')
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=5, help='statements per request')
+    args = parser.parse_args()
+
+    plain = min(per_request(make_app(False, args.queries), args.requests) for _ in range(3))
+    timed = min(per_request(make_app(True, args.queries), args.requests) for _ in range(3))
+    print(f"{args.requests} requests x {args.queries} statements (Flask test client)")
+    print(f"  without metrics: {plain * 1e6:8.1f} us/request")
+    print(f"  with metrics:    {timed * 1e6:8.1f} us/request  "
+          f"(+{(timed - plain) * 1e6:.1f} us, {(timed - plain) / plain * 100:.1f}%)")
+
+    cursor, raw = _TimedCursor(NullCursor()), NullCursor()
+    loops = 200000
+    start = time.perf_counter()
+    for _ in range(loops):
+        raw.execute("SELECT 1", None)
+    raw_cost = (time.perf_counter() - start) / loops
+    start = time.perf_counter()
+    for _ in range(loops):
+        cursor.execute("SELECT 1", None)
+    print(f"  timed cursor:    +{((time.perf_counter() - start) / loops - raw_cost) * 1e6:.2f} us/statement")
+
+    # /metrics for the real app's routes, each with traffic recorded
+    from app import app
+    client = app.test_client()
+    metrics.reset()
+    routes = [(rule.rule, method) for rule in app.url_map.iter_rules() for method in rule.methods
+              if method not in ('HEAD', 'OPTIONS')]
+    for rule, method in routes:
+        metrics._routes[(rule, method)] = metrics._new_route()
+        metrics._responses[(rule, method, 200)] = 1
+    start = time.perf_counter()
+    body = client.get('/metrics').get_data()
+    print(f"  /metrics for {len(routes)} routes: {(time.perf_counter() - start) * 1000:.2f} ms, "
+          f"{len(body) / 1024:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
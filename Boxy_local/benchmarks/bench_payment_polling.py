@@ -0,0 +1,99 @@
+"""
+Benchmark: payment status polling vs long polling during checkout
+
+Seeds delivered BENCH* bookings awaiting payment and has --clients customers watch
+/api/payment/status/<id> while their checkout takes --checkout seconds, after which
+Cash on Delivery is selected (select_cod, which invalidates the cached status).
+Clients either poll every --interval seconds or long poll with ?since=&wait=.
+Reports requests served, database reads and how long each client took to see the
+change. Point it at a scratch database:
+    DB_NAME=Boxy_bench python benchmarks/bench_payment_polling.py --clients 50 --checkout 5
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as boxy
+from bench_db import cleanup, seed_bookings
+
+db_reads = 0
+db_reads_lock = threading.Lock()
+real_get_db_connection = boxy.get_db_connection
+
+
+def counting_connection(*args, **kwargs):
+    global db_reads
+    with db_reads_lock:
+        db_reads += 1
+    return real_get_db_connection(*args, **kwargs)
+
+
+def watch(delivery_id, long_poll, interval, changed_at):
+    """Watch one delivery until its payment status changes; returns (requests, seconds late)"""
+    client = boxy.app.test_client()
+    url = f'/api/payment/status/{delivery_id}'
+    first = client.get(url).get_json()
+    requests = 1
+    while True:
+        if long_poll:
+            data = client.get(url, query_string={'since': first['version'], 'wait': 25}).get_json()
+        else:
+            time.sleep(interval)
+            data = client.get(url).get_json()
+        requests += 1
+        if data['version'] != first['version']:
+            return requests, time.monotonic() - changed_at[delivery_id]
+
+
+def run(delivery_ids, long_poll, interval, checkout):
+    global db_reads
+    db_reads = 0
+    boxy.payment_status_cache.clear()
+    changed_at = {}
+
+    def checkout_then_pay(delivery_id):
+        time.sleep(checkout)
+        changed_at[delivery_id] = time.monotonic()
+        boxy.app.test_client().post(f'/api/payment/select-cod/{delivery_id}')
+
+    with ThreadPoolExecutor(max_workers=len(delivery_ids) * 2) as pool:
+        watchers = [pool.submit(watch, delivery_id, long_poll, interval, changed_at)
+                    for delivery_id in delivery_ids]
+        for delivery_id in delivery_ids:
+            pool.submit(checkout_then_pay, delivery_id)
+        results = [watcher.result() for watcher in watchers]
+
+    requests = sum(r for r, _ in results)
+    lag = sorted(l for _, l in results)
+    # select_cod itself opens one connection per delivery
+    reads = db_reads - len(delivery_ids)
+    print(f"{'long poll' if long_poll else f'poll every {interval}s':>18}: "
+          f"{requests:6d} requests, {reads:5d} status reads, "
+          f"change seen after p50 {lag[len(lag) // 2] * 1000:.0f} ms / max {lag[-1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--checkout', type=float, default=5, help='seconds before payment is made')
+    parser.add_argument('--interval', type=float, default=1, help='plain polling interval (s)')
+    args = parser.parse_args()
+
+    boxy.get_db_connection = counting_connection
+    cleanup()
+    try:
+        for long_poll in (False, True):
+            delivery_ids = seed_bookings(args.clients, status='delivered')
+            run(delivery_ids, long_poll, args.interval, args.checkout)
+            cleanup()
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: overhead of the sampling profiler (profiling.py) on a busy worker
+
+Serves a small CPU-bound route (price lookups over a JSON body) through the Flask
+test client while --threads idle threads wait, as a threaded server's worker threads
+do, and reports the time per request with the profiler off and sampling every
+--intervals milliseconds. Also prints how long one sample of all stacks takes.
+No database needed:
+    python benchmarks/bench_profiler.py --requests 5000 --threads 16 --intervals 10 5 1
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask, jsonify, request
+
+from pricing import calculate_price
+from profiling import SamplingProfiler
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/api/quote', methods=['POST'])
+    def quote():
+        data = request.get_json()
+        prices = [calculate_price(data['distance'] + i, data['weight'], data['stops'], data['vehicle'])
+                  for i in range(50)]
+        return jsonify({'success': True, 'prices': prices})
+
+    return app
+
+
+def per_request(client, count):
+    body = {'distance': 12.5, 'weight': 3, 'vehicle': 'bike', 'stops': 2}
+    start = time.perf_counter()
+    for _ in range(count):
+        client.post('/api/quote', json=body)
+    return (time.perf_counter() - start) / count
+
+
+def idle_worker(stop, depth):
+    if depth:
+        return idle_worker(stop, depth - 1)
+    stop.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=16, help='idle threads to sample alongside')
+    parser.add_argument('--intervals', type=float, nargs='+', default=[10, 5, 1], help='sampling intervals (ms)')
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    for _ in range(args.threads):
+        threading.Thread(target=idle_worker, args=(stop, 30), daemon=True).start()
+    client = make_app().test_client()
+    per_request(client, 200)
+
+    baseline = min(per_request(client, args.requests) for _ in range(3))
+    print(f"{args.requests} requests, {args.threads} idle threads (Flask test client)")
+    print(f"  profiler off:   {baseline * 1e6:8.1f} us/request")
+    for interval in args.intervals:
+        profiler = SamplingProfiler()
+        profiler.start(3600, interval / 1000)
+        sampled = min(per_request(client, args.requests) for _ in range(3))
+        profiler.stop()
+        print(f"  every {interval:g} ms:{'':<{6 - len(f'{interval:g}')}}{sampled * 1e6:8.1f} us/request  "
+              f"(+{(sampled - baseline) / baseline * 100:.1f}%, {profiler.samples} samples, "
+              f"{len(profiler.collapsed().splitlines())} distinct stacks)")
+
+    profiler = SamplingProfiler()
+    own = threading.get_ident()
+    loops = 1000
+    start = time.perf_counter()
+    for _ in range(loops):
+        profiler._sample(own)
+    print(f"  one sample of {threading.active_count()} threads: {(time.perf_counter() - start) / loops * 1e6:.1f} us")
+    stop.set()
+
+
+if __name__ == '__main__':
+    main()
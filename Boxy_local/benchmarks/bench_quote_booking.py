@@ -0,0 +1,106 @@
+"""
+Benchmark: booking latency with and without a quote token
+
+The send parcel form prices the route (/api/calculate-price) before booking it. For
+each booking this asks for the quote, then creates the delivery twice through the
+app's test client, interleaved: once plain, which prices the route again (one
+Distance Matrix call per leg), and once with the quote token, which books at the
+quoted price. Distances come from a local stand-in (fake_services.py) that waits
+--api-delay seconds per call, like the real API does. Reports latency per booking and
+Distance Matrix calls made, then removes the seeded rows. Point it at a scratch database:
+    DB_NAME=Boxy_bench python benchmarks/bench_quote_booking.py --bookings 100 --stops 3
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_db import cleanup, seed_customers
+from database import get_db_connection
+from fake_services import FakeDistanceMatrix
+
+STOP = {'drop_address': '{number}, SG Highway, Bodakdev, Ahmedabad', 'receiver_name': 'Bench Receiver',
+        'receiver_phone': '9000000001'}
+
+
+def make_stops(booking, count):
+    return [dict(STOP, drop_address=STOP['drop_address'].format(number=booking * 10 + number))
+            for number in range(1, count + 1)]
+
+
+def timed_booking(client, payload):
+    start = time.perf_counter()
+    response = client.post('/api/deliveries/create', json=payload)
+    elapsed = time.perf_counter() - start
+    if not response.get_json().get('success'):
+        sys.exit(f"booking failed: {response.get_json()}")
+    return elapsed, response.get_json()['delivery_id']
+
+
+def booked_amounts(delivery_ids):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, total_amount FROM deliveries WHERE id IN ({', '.join(['%s'] * len(delivery_ids))})",
+                       delivery_ids)
+        amounts = {delivery_id: float(amount) for delivery_id, amount in cursor.fetchall()}
+    return [amounts.get(delivery_id) for delivery_id in delivery_ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=100)
+    parser.add_argument('--stops', type=int, default=3)
+    parser.add_argument('--api-delay', type=float, default=0.05, help='seconds per Distance Matrix call')
+    args = parser.parse_args()
+
+    with FakeDistanceMatrix() as maps:
+        # Point pricing at the stand-in before the app reads its configuration
+        os.environ['DISTANCE_MATRIX_URL'] = f'{maps.url}/maps/api/distancematrix/json'
+        os.environ['GOOGLE_API_KEY'] = 'fake-key'
+        os.environ['SMTP_EMAIL'] = ''
+        maps.delay = args.api_delay
+        import app as boxy
+        logging.getLogger('email_service').setLevel(logging.ERROR)
+
+        seed_customers(1)
+        client = boxy.app.test_client()
+        with client.session_transaction() as sess:
+            sess['customer_id'] = 'BENCHC000001'
+        try:
+            times = {'plain': [], 'token': []}
+            calls = {'plain': 0, 'token': 0}
+            for booking in range(args.bookings):
+                stops = make_stops(booking, args.stops)
+                quote = client.post('/api/calculate-price', json={
+                    'pickup_address': 'Bench pickup address, Ahmedabad', 'stops': stops,
+                    'weight': 2.5, 'preferred_vehicle': 'bike'}).get_json()
+                payload = {'stops': stops, 'parcelType': 'documents', 'parcelWeight': '2.5',
+                           'parcelHeight': '20', 'parcelWidth': '15', 'preferredVehicle': 'bike'}
+                delivery_ids = []
+                for kind, extra in (('plain', {}), ('token', {'quoteToken': quote['quote_token']})):
+                    before = maps.requests
+                    elapsed, delivery_id = timed_booking(client, dict(payload, **extra))
+                    calls[kind] += maps.requests - before
+                    times[kind].append(elapsed)
+                    delivery_ids.append(delivery_id)
+                prices = booked_amounts(delivery_ids)
+                if prices[0] != prices[1] or prices[0] != quote['price_breakdown']['total']:
+                    sys.exit(f"booking {booking + 1}: priced {prices[0]}, booked with token at {prices[1]}, "
+                             f"quoted {quote['price_breakdown']['total']}")
+        finally:
+            cleanup()
+
+    print(f"{args.bookings} bookings, {args.stops} stops each, {args.api_delay * 1000:.0f} ms per Distance Matrix call")
+    for kind, label in (('plain', 'without token'), ('token', 'with token')):
+        ms = sorted(value * 1000 for value in times[kind])
+        print(f"  {label:<14} mean {statistics.mean(ms):7.1f} ms   p50 {ms[len(ms) // 2]:7.1f} ms   "
+              f"p95 {ms[int(len(ms) * 0.95) - 1]:7.1f} ms   {calls[kind] / args.bookings:.1f} API calls/booking")
+
+
+if __name__ == '__main__':
+    main()
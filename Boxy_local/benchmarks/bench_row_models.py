@@ -0,0 +1,177 @@
+"""
+Benchmark: dictionary rows vs slotted row models for the partner dashboard payload
+
+Compares, for a partner with --deliveries deliveries (each with --stops stops):
+  dict    - the old path: dictionary cursor, one stops query per delivery, dict rows
+  models  - rows.py: tuple cursor, Delivery/Stop models, one stops query per list
+Reports time per response and tracemalloc's peak and net allocation while building
+and encoding the response. With --no-db the cursor results are synthesized in memory
+(mysql-connector builds dictionary rows as dict(zip(columns, row))), isolating the
+row representation. Otherwise BENCH* rows are seeded for the benchmark partner:
+    python benchmarks/bench_row_models.py --no-db
+    DB_NAME=Boxy_bench python benchmarks/bench_row_models.py --deliveries 500
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask
+
+from json_provider import BoxyJSONProvider
+from rows import Delivery, Stop, attach_stops, fetch_all
+
+DELIVERY_SQL = """
+    SELECT id, sender_name, sender_address, receiver_name, receiver_address,
+           receiver_phone, parcel_type, weight, status, partner_id, total_stops,
+           created_at, accepted_at, updated_at, delivered_at,
+           total_amount, payment_status, payment_method, preferred_vehicle
+    FROM deliveries
+    WHERE partner_id = %s
+    ORDER BY created_at DESC
+"""
+
+
+class FakeCursor:
+    """Stands in for a mysql-connector cursor over pre-generated tuples"""
+
+    def __init__(self, deliveries, stops, dictionary=False):
+        self.deliveries = deliveries
+        self.stops_by_booking = {}
+        for stop in stops:
+            self.stops_by_booking.setdefault(stop[0], []).append(stop)
+        self.dictionary = dictionary
+        self.column_names = ()
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        if 'FROM deliveries' in sql:
+            self.column_names = Delivery.COLUMNS
+            self._rows = self.deliveries
+        elif 'IN (' in sql:
+            self.column_names = Stop.COLUMNS
+            self._rows = [stop for booking_id in params for stop in self.stops_by_booking.get(booking_id, ())]
+        else:
+            self.column_names = Stop.COLUMNS[1:]
+            self._rows = [stop[1:] for stop in self.stops_by_booking.get(params[0], ())]
+
+    def fetchall(self):
+        if self.dictionary:
+            return [dict(zip(self.column_names, row)) for row in self._rows]
+        return list(self._rows)
+
+
+def synthetic_rows(count, stops, rng):
+    start = datetime(2024, 1, 1)
+    deliveries, stop_rows = [], []
+    for i in range(count):
+        delivery_id = f'BENCH{i:09d}'
+        created_at = start + timedelta(minutes=rng.randrange(500000))
+        deliveries.append((
+            delivery_id, 'Sender', 'Sender address 1', 'Receiver', 'Receiver address 1', '9000000001',
+            'documents', Decimal('1.50'), 'in_transit', 'PARTNERBENCH', stops,
+            created_at, created_at + timedelta(minutes=5), created_at + timedelta(minutes=30), None,
+            Decimal(f'{rng.uniform(60, 900):.2f}'), 'pending', None, None,
+        ))
+        for n in range(1, stops + 1):
+            stop_rows.append((delivery_id, n, 'Receiver address 1', 'Receiver', '9000000001', 'pending', None))
+    return deliveries, stop_rows
+
+
+def dict_payload(cursor, partner_id):
+    cursor.execute(DELIVERY_SQL, (partner_id,))
+    deliveries = cursor.fetchall()
+    for delivery in deliveries:
+        cursor.execute("""
+            SELECT stop_number, drop_address, receiver_name, receiver_phone, status, delivered_at
+            FROM delivery_stops
+            WHERE booking_id = %s
+            ORDER BY stop_number
+        """, (delivery['id'],))
+        delivery['stops'] = cursor.fetchall()
+    return deliveries
+
+
+def model_payload(cursor, partner_id):
+    cursor.execute(DELIVERY_SQL, (partner_id,))
+    return attach_stops(cursor, fetch_all(Delivery, cursor))
+
+
+def measure(app, build, make_cursor, repeat):
+    """Best time over repeat runs, then (peak, net) bytes of one traced run"""
+    def respond():
+        deliveries = build(make_cursor(), 'PARTNERBENCH')
+        return app.json.response({'success': True, 'my_deliveries': deliveries, 'available_deliveries': []})
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        respond()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    deliveries = build(make_cursor(), 'PARTNERBENCH')
+    rows_net = tracemalloc.get_traced_memory()[0] - before
+    app.json.response({'success': True, 'my_deliveries': deliveries, 'available_deliveries': []})
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return best, peak, rows_net
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deliveries', type=int, default=500)
+    parser.add_argument('--stops', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--no-db', action='store_true', help='synthesize cursor results in memory')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.json = BoxyJSONProvider(app)
+
+    if args.no_db:
+        delivery_rows, stop_rows = synthetic_rows(args.deliveries, args.stops, random.Random(1))
+        cursors = {
+            'dict': lambda: FakeCursor(delivery_rows, stop_rows, dictionary=True),
+            'models': lambda: FakeCursor(delivery_rows, stop_rows),
+        }
+        run(app, cursors, args)
+        return
+
+    from bench_db import PARTNER_ID, cleanup, seed_bookings
+    from database import get_db_connection
+
+    cleanup()
+    seed_bookings(args.deliveries, stops_per_booking=args.stops, status='in_transit', partner_id=PARTNER_ID)
+    try:
+        with get_db_connection(readonly=True) as conn:
+            cursors = {
+                'dict': lambda: conn.cursor(dictionary=True),
+                'models': lambda: conn.cursor(),
+            }
+            run(app, cursors, args)
+    finally:
+        cleanup()
+
+
+def run(app, cursors, args):
+    print(f"Partner with {args.deliveries} deliveries x {args.stops} stops, best of {args.repeat}")
+    results = {}
+    for name, build in (('dict', dict_payload), ('models', model_payload)):
+        results[name] = measure(app, build, cursors[name], args.repeat)
+        seconds, peak, rows_net = results[name]
+        print(f"  {name:7s} {seconds * 1000:8.2f} ms/response  peak {peak / 1024:8.1f} KiB  "
+              f"rows {rows_net / 1024:8.1f} KiB")
+    old, new = results['dict'], results['models']
+    print(f"  models: {old[0] / new[0]:.1f}x faster, {old[2] / new[2]:.1f}x less memory held by rows")
+
+
+if __name__ == '__main__':
+    main()
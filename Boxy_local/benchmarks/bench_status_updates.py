@@ -0,0 +1,65 @@
+"""
+Benchmark: delivery status update throughput through delivery_state
+
+Seeds BENCH* deliveries and a benchmark partner, then drives every delivery through
+accepted -> picked -> on_the_way -> delivered -> completed, one transaction per
+transition (as the API handlers do), from several threads. Reports transitions/sec
+and removes the seeded rows afterwards. Point it at a scratch database:
+    DB_NAME=Boxy_bench python benchmarks/bench_status_updates.py --deliveries 2000 --threads 8
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import delivery_state
+from bench_db import PARTNER_ID, cleanup, seed_bookings
+from database import get_db_connection
+
+
+def run_lifecycle(delivery_ids):
+    """Drive a share of the deliveries through the whole state machine; returns transitions made"""
+    transitions = 0
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for delivery_id in delivery_ids:
+            steps = (
+                lambda: delivery_state.accept(cursor, delivery_id, PARTNER_ID),
+                lambda: delivery_state.advance(cursor, delivery_id, PARTNER_ID, 'picked'),
+                lambda: delivery_state.advance(cursor, delivery_id, PARTNER_ID, 'on_the_way'),
+                lambda: delivery_state.advance(cursor, delivery_id, PARTNER_ID, 'delivered'),
+                lambda: delivery_state.complete_payment(cursor, delivery_id, 'online'),
+            )
+            for step in steps:
+                if not step():
+                    raise RuntimeError(f"Transition refused for {delivery_id}")
+                conn.commit()
+                transitions += 1
+    return transitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deliveries', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    cleanup()
+    delivery_ids = seed_bookings(args.deliveries)
+    try:
+        shares = [delivery_ids[i::args.threads] for i in range(args.threads)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            transitions = sum(pool.map(run_lifecycle, shares))
+        elapsed = time.perf_counter() - start
+        print(f"{transitions} transitions on {len(delivery_ids)} deliveries with {args.threads} threads")
+        print(f"{transitions / elapsed:,.0f} status updates/sec ({elapsed:.2f}s)")
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Compiled schemas (schema.py) against the per-field functions of validation.py
+
+Each payload is validated both ways, collecting every error, and the time per payload
+is reported (best of --repeat interleaved rounds). The validation.py side calls the
+same checks the schema compiles, one function call per field, so the difference is
+what compiling buys: character sets built once and tested in one C call instead of a
+Python loop per character, and labels and messages formatted ahead of time. Payloads
+that fail early in most fields gain little, as there is little work to save.
+    python benchmarks/bench_validation_schema.py
+    python benchmarks/bench_validation_schema.py --repeat 25 --filter booking
+Both sides are checked to report the same errors before anything is timed.
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import schema
+import validation
+
+STOP = {'drop_address': '42, SG Highway, Bodakdev, Ahmedabad, Gujarat 380054',
+        'receiver_name': 'Ananya Krishnamurthy', 'receiver_phone': '98765 43210'}
+BAD_STOP = {'drop_address': '42 SG Highway; Bodakdev', 'receiver_name': 'Ananya  K', 'receiver_phone': '12345'}
+
+PAYLOADS = {
+    'booking[1 stop]': ('booking', {'stops': [STOP], 'parcelType': 'documents', 'parcelWeight': '2.5',
+                                    'preferredVehicle': 'bike', 'parcelHeight': '30', 'parcelWidth': '20'}),
+    'booking[5 stops]': ('booking', {'stops': [STOP] * 5, 'parcelType': 'electronics', 'parcelWeight': 12,
+                                     'preferredVehicle': 'car'}),
+    'booking[invalid]': ('booking', {'stops': [STOP, BAD_STOP], 'parcelType': 'other', 'parcelWeight': '0',
+                                     'preferredVehicle': 'scooter', 'parcelHeight': '75'}),
+    'customer registration': ('customer', {'firstName': 'Priya', 'lastName': 'Shah',
+                                           'email': 'priya.shah+orders@example-mail.co.in',
+                                           'phone': '(98765) 43210',
+                                           'address': '12, CG Road, Navrangpura, Ahmedabad, Gujarat 380009',
+                                           'password': 'parcel123', 'otp': '0421'}),
+    'partner registration': ('partner', {'firstName': 'Ravi', 'lastName': "D'Souza", 'phone': '9876543210',
+                                         'email': 'ravi.dsouza@example.com', 'vehicleType': 'Scooter',
+                                         'vehicleNumber': 'GJ 01 AB 1234', 'aadhar': '2345 6789 0123',
+                                         'password': 'rider2024'}),
+    'partner registration[invalid]': ('partner', {'firstName': 'R', 'lastName': 'D3', 'phone': '98765',
+                                                  'email': 'ravi@example', 'vehicleType': 'truck',
+                                                  'vehicleNumber': 'GJ01', 'aadhar': '1111 1111 1111',
+                                                  'password': '123456'}),
+}
+
+
+def collect(*results):
+    return [error for is_valid, error in results if not is_valid]
+
+
+def stops_errors(stops):
+    # validation.validate_stops_list stops at the first problem; this reports all of them
+    if not stops or not isinstance(stops, list):
+        return ["At least one delivery stop is required"]
+    if len(stops) > 5:
+        return ["Maximum 5 stops are allowed"]
+    errors = []
+    for i, stop in enumerate(stops, 1):
+        errors += collect(validation.validate_address(stop.get('drop_address'), f"Stop {i} drop address"),
+                          validation.validate_name(stop.get('receiver_name'), f"Stop {i} receiver name"))
+        is_valid, error = validation.validate_phone(stop.get('receiver_phone'))
+        if not is_valid:
+            errors.append(f"Stop {i} receiver phone: {error}")
+    return errors
+
+
+def legacy_booking(data):
+    errors = stops_errors(data.get('stops'))
+    errors += collect(validation.validate_parcel_type(data.get('parcelType')),
+                      validation.validate_parcel_weight(data.get('parcelWeight')))
+    preferred_vehicle = (data.get('preferredVehicle') or '').strip().lower()
+    if preferred_vehicle:
+        errors += collect(validation.validate_vehicle_type(preferred_vehicle))
+    if (data.get('parcelType') or '').strip() == 'other' and not (data.get('parcelOtherSpec') or '').strip():
+        errors.append('Please specify what you are sending when parcel type is Other')
+    if preferred_vehicle in schema.SMALL_VEHICLES:
+        height = float(data.get('parcelHeight') or 0)
+        width = float(data.get('parcelWidth') or 0)
+        if height > schema.SMALL_VEHICLE_MAX_HEIGHT or width > schema.SMALL_VEHICLE_MAX_WIDTH:
+            errors.append(f'For Bike/Scooter delivery, parcel size must not exceed {schema.SMALL_VEHICLE_MAX_HEIGHT} '
+                          f'cm height and {schema.SMALL_VEHICLE_MAX_WIDTH} cm width. '
+                          f'Please reduce dimensions or choose Car.')
+    return errors
+
+
+def legacy_customer(data):
+    errors = collect(validation.validate_name(data.get('firstName'), 'First name'),
+                     validation.validate_name(data.get('lastName'), 'Last name'),
+                     validation.validate_email(data.get('email')),
+                     validation.validate_phone(data.get('phone')),
+                     validation.validate_address(data.get('address')),
+                     validation.validate_password(data.get('password')))
+    otp = (data.get('otp') or '').strip()
+    if len(otp) != 4 or not otp.isdigit():
+        errors.append('Invalid OTP format')
+    return errors
+
+
+def legacy_partner(data):
+    return collect(validation.validate_name(data.get('firstName'), 'First name'),
+                   validation.validate_name(data.get('lastName'), 'Last name'),
+                   validation.validate_phone(data.get('phone')),
+                   validation.validate_email(data.get('email')),
+                   validation.validate_vehicle_type(data.get('vehicleType')),
+                   validation.validate_vehicle_number(data.get('vehicleNumber')),
+                   validation.validate_aadhar(data.get('aadhar')),
+                   validation.validate_password(data.get('password')))
+
+
+LEGACY = {'booking': legacy_booking, 'customer': legacy_customer, 'partner': legacy_partner}
+COMPILED = {'booking': schema.BOOKING, 'customer': schema.CUSTOMER_REGISTRATION,
+            'partner': schema.PARTNER_REGISTRATION}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=15, help='rounds over all cases')
+    parser.add_argument('--filter', default='', help='only payloads whose name contains this')
+    args = parser.parse_args()
+
+    timers = {}
+    for name, (kind, payload) in PAYLOADS.items():
+        if args.filter not in name:
+            continue
+        legacy, compiled = LEGACY[kind], COMPILED[kind].validate
+        expected, got = legacy(payload), compiled(payload)[1]
+        if expected != got:
+            sys.exit(f"{name}: validation.py reports {expected}, the schema {got}")
+        timers[name] = (timeit.Timer(lambda legacy=legacy, payload=payload: legacy(payload)),
+                        timeit.Timer(lambda compiled=compiled, payload=payload: compiled(payload)),
+                        len(got))
+    if not timers:
+        parser.error(f'no payload matches {args.filter!r}')
+
+    numbers = {name: max(1, legacy.autorange()[0] // 4) for name, (legacy, _, _) in timers.items()}
+    best = {name: [float('inf'), float('inf')] for name in timers}
+    for _ in range(args.repeat):
+        for name, (legacy, compiled, _) in timers.items():
+            number = numbers[name]
+            best[name][0] = min(best[name][0], legacy.timeit(number) / number * 1e9)
+            best[name][1] = min(best[name][1], compiled.timeit(number) / number * 1e9)
+
+    print(f"ns per payload, best of {args.repeat}")
+    print(f"  {'payload':<32}{'errors':>7}{'validation.py':>15}{'schema':>10}{'speedup':>9}")
+    for name, (legacy_ns, compiled_ns) in best.items():
+        print(f"  {name:<32}{timers[name][2]:>7}{legacy_ns:>15.0f}{compiled_ns:>10.0f}"
+              f"{legacy_ns / compiled_ns:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Check and benchmark the shared HTTP client against local stand-in servers
+
+Runs fake Razorpay and Distance Matrix servers (fake_services.py) and verifies that:
+  - sequential calls reuse one keep-alive connection (vs one per call with requests.get)
+  - idempotent GETs are retried through injected 503s, POSTs are not
+  - read timeouts are enforced
+  - pricing.calculate_distance() and the Razorpay order call go through the pool
+then prints the per-host latency stats. Exits non-zero on failure. No database needed.
+    python benchmarks/check_http_client.py --calls 500
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+
+from fake_services import FakeDistanceMatrix, FakeRazorpay
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=300)
+    args = parser.parse_args()
+
+    with FakeRazorpay() as razorpay, FakeDistanceMatrix() as maps:
+        # Point the app modules at the stand-ins before they read their configuration
+        os.environ['RAZORPAY_API_BASE'] = razorpay.url
+        os.environ['DISTANCE_MATRIX_URL'] = f'{maps.url}/maps/api/distancematrix/json'
+        os.environ.setdefault('GOOGLE_API_KEY', 'fake-key')
+        import http_client
+        import pricing
+        from config import RAZORPAY_API_BASE
+
+        problems = []
+        payment_url = f'{razorpay.url}/v1/payments/pay_check'
+
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            requests.get(payment_url, timeout=5).json()
+        plain_time = time.perf_counter() - start
+        plain_connections = len(razorpay.connections)
+
+        razorpay.connections.clear()
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            http_client.get(payment_url).json()
+        pooled_time = time.perf_counter() - start
+        pooled_connections = len(razorpay.connections)
+
+        print(f"{args.calls} sequential GETs")
+        print(f"  requests.get   {plain_time * 1000 / args.calls:6.2f} ms/call, {plain_connections} connections")
+        print(f"  http_client    {pooled_time * 1000 / args.calls:6.2f} ms/call, {pooled_connections} connections")
+        if pooled_connections != 1:
+            problems.append(f"pooled calls used {pooled_connections} connections")
+
+        before = razorpay.requests
+        injected = min(2, http_client.MAX_RETRIES)
+        razorpay.fail_next = injected
+        response = http_client.get(payment_url)
+        attempts = razorpay.requests - before
+        print(f"GET through {injected} injected 503s: {response.status_code} after {attempts} attempts")
+        if response.status_code != 200 or attempts != injected + 1:
+            problems.append("GET was not retried through 503s")
+
+        before = razorpay.requests
+        razorpay.fail_next = 1
+        response = http_client.post(f'{razorpay.url}/v1/orders', json={'amount': 100})
+        attempts = razorpay.requests - before
+        print(f"POST with one injected 503: {response.status_code} after {attempts} attempt(s)")
+        if response.status_code != 503 or attempts != 1:
+            problems.append("POST was retried")
+        razorpay.fail_next = 0
+
+        razorpay.delay = 0.3
+        start = time.perf_counter()
+        try:
+            http_client.get(payment_url, timeout=(1, 0.1))
+            problems.append("slow response did not time out")
+        except requests.Timeout:
+            print(f"Read timeout raised after {time.perf_counter() - start:.2f}s including retries")
+        razorpay.delay = 0
+
+        order = http_client.post(f'{RAZORPAY_API_BASE}/v1/orders',
+                                 json={'amount': 15000, 'currency': 'INR', 'receipt': 'QP000000001'}).json()
+        distance = pricing.calculate_distance('12 Bench Road', '34 Market Street', os.environ['GOOGLE_API_KEY'])
+        print(f"Razorpay order {order['id']}, distance {distance} km")
+        if distance is None:
+            problems.append("calculate_distance() got no answer from the stand-in")
+
+        print("Per-host stats:")
+        for host, stats in http_client.host_stats().items():
+            print(f"  {host}: {stats}")
+
+        if problems:
+            print("FAILED: " + "; ".join(problems))
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == '__main__':
+    main()
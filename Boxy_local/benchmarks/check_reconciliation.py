@@ -0,0 +1,90 @@
+"""
+Check and benchmark the payment reconciliation job against a fake Razorpay
+
+Seeds delivered BENCH* bookings awaiting online payment and registers a Razorpay
+order for each on a local fake (fake_services.FakeRazorpay): --captured of them get a
+captured payment, some a failed one, the rest none. Runs reconcile_payments.reconcile()
+and verifies that exactly the captured ones were completed (with one 'paid' event each),
+then runs it again to show it is idempotent. Reports throughput. Exits non-zero on
+failure. Point it at a scratch database:
+    DB_NAME=Boxy_bench python benchmarks/check_reconciliation.py --bookings 5000 --latency 0.02
+"""
+import argparse
+import os
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_services import FakeRazorpay
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=2000)
+    parser.add_argument('--captured', type=float, default=0.1, help='share with a captured payment')
+    parser.add_argument('--latency', type=float, default=0.01, help='fake Razorpay response delay (s)')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with FakeRazorpay() as razorpay:
+        os.environ['RAZORPAY_API_BASE'] = razorpay.url
+        from bench_db import cleanup, seed_bookings
+        from database import get_db_connection
+        from reconcile_payments import reconcile
+
+        cleanup()
+        delivery_ids = seed_bookings(args.bookings, status='delivered')
+        try:
+            rng = random.Random(args.seed)
+            captured = set()
+            for delivery_id in delivery_ids:
+                order_id = razorpay.add_order(delivery_id, 10000)
+                roll = rng.random()
+                if roll < args.captured:
+                    razorpay.add_payment(order_id, 'captured')
+                    captured.add(delivery_id)
+                elif roll < args.captured + 0.05:
+                    razorpay.add_payment(order_id, 'failed')
+            razorpay.delay = args.latency
+
+            report = reconcile(args.batch_size, args.concurrency)
+            print(f"First pass:  {report}")
+            second = reconcile(args.batch_size, args.concurrency)
+            print(f"Second pass: {second}")
+
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM deliveries WHERE id LIKE 'BENCH%' AND status = 'completed'")
+                completed = {row[0] for row in cursor.fetchall()}
+                cursor.execute("""
+                    SELECT COUNT(*) FROM delivery_events
+                    WHERE tracking_id LIKE 'BENCH%' AND event_type = 'paid'
+                """)
+                paid_events = cursor.fetchone()[0]
+
+            problems = []
+            if completed != captured:
+                problems.append(f"{len(completed - captured)} wrongly completed, "
+                                f"{len(captured - completed)} captured but not completed")
+            if paid_events != len(captured):
+                problems.append(f"{paid_events} paid events for {len(captured)} payments")
+            if report['completed'] != len(captured) or second['completed'] != 0:
+                problems.append("completion counts do not match")
+            if report['errors'] or second['errors']:
+                problems.append("lookup errors")
+
+            if problems:
+                print("FAILED: " + "; ".join(problems))
+                sys.exit(1)
+            print(f"OK: {len(captured)} of {len(delivery_ids)} pending deliveries corrected, "
+                  f"{report['per_second']} deliveries/sec checked")
+        finally:
+            cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Concurrency check: multi-stop completion flips each booking to delivered exactly once
+
+Seeds BENCH* bookings with several stops, assigned to the benchmark partner and on the
+way, then marks every stop delivered from many threads in random order through
+delivery_state.deliver_stop(). Verifies that exactly one call per booking reported the
+booking as delivered, that every booking ends up 'delivered' with a matching counter,
+and that one 'delivered' event was logged per booking. Exits non-zero on failure.
+    DB_NAME=Boxy_bench python benchmarks/check_stop_completion.py --bookings 500 --stops 5 --threads 16
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import delivery_state
+from bench_db import PARTNER_ID, cleanup, seed_bookings
+from database import get_db_connection
+
+
+def deliver_stops(stops):
+    """Deliver (booking, stop) pairs, one transaction each; returns the bookings this worker completed"""
+    completed = []
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for delivery_id, stop_number in stops:
+            stop_delivered, booking_delivered = delivery_state.deliver_stop(
+                cursor, delivery_id, stop_number, PARTNER_ID)
+            conn.commit()
+            if not stop_delivered:
+                raise RuntimeError(f"Stop {stop_number} of {delivery_id} was refused")
+            if booking_delivered:
+                completed.append(delivery_id)
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=200)
+    parser.add_argument('--stops', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    cleanup()
+    delivery_ids = seed_bookings(args.bookings, args.stops, status='on_the_way', partner_id=PARTNER_ID)
+    try:
+        stops = [(delivery_id, stop_number)
+                 for delivery_id in delivery_ids
+                 for stop_number in range(1, args.stops + 1)]
+        random.Random(args.seed).shuffle(stops)
+        shares = [stops[i::args.threads] for i in range(args.threads)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            flips = Counter(delivery_id for completed in pool.map(deliver_stops, shares)
+                            for delivery_id in completed)
+        elapsed = time.perf_counter() - start
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) FROM deliveries
+                WHERE id LIKE 'BENCH%' AND status = 'delivered' AND delivered_stops = total_stops
+            """)
+            delivered_rows = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT COUNT(*) FROM delivery_events
+                WHERE tracking_id LIKE 'BENCH%' AND event_type = 'delivered'
+            """)
+            delivered_events = cursor.fetchone()[0]
+
+        problems = []
+        if set(flips) != set(delivery_ids):
+            problems.append(f"{len(set(delivery_ids) - set(flips))} bookings never flipped")
+        if any(count != 1 for count in flips.values()):
+            problems.append(f"{sum(1 for c in flips.values() if c != 1)} bookings flipped more than once")
+        if delivered_rows != len(delivery_ids):
+            problems.append(f"only {delivered_rows}/{len(delivery_ids)} bookings are delivered in the database")
+        if delivered_events != len(delivery_ids):
+            problems.append(f"{delivered_events} delivered events for {len(delivery_ids)} bookings")
+
+        print(f"{len(stops)} stops of {len(delivery_ids)} bookings delivered by {args.threads} threads "
+              f"in {elapsed:.2f}s ({len(stops) / elapsed:,.0f} stops/sec)")
+        if problems:
+            print("FAILED: " + "; ".join(problems))
+            sys.exit(1)
+        print("OK: every booking flipped to delivered exactly once")
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
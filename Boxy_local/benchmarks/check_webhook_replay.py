@@ -0,0 +1,163 @@
+"""
+Replay check: flooding the Razorpay webhook with duplicates pays each booking once
+
+Seeds delivered BENCH* bookings awaiting online payment, then posts a signed
+order.paid event for each one --copies times, shuffled, from many threads
+through the Flask test client (plus a few checkout callbacks for the same payments).
+Waits for the background jobs, then verifies that every booking is completed, that
+exactly one 'paid' event and one applied payment_events row exist per booking, and
+that a badly signed event is refused. Reports webhook ack latency. Exits non-zero on
+failure. Point it at a scratch database:
+    DB_NAME=Boxy_bench python benchmarks/check_webhook_replay.py --bookings 200 --copies 20
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SECRET = 'bench-webhook-secret'
+os.environ['RAZORPAY_WEBHOOK_SECRET'] = SECRET
+
+from app import app
+from bench_db import cleanup, seed_bookings
+from config import RAZORPAY_KEY_SECRET
+from database import get_db_connection
+
+
+def payment_event(delivery_id, payment_id):
+    return {
+        'entity': 'event',
+        'event': 'order.paid',
+        # As Razorpay sends it: no notes on the payment, the tracking id is the order's receipt
+        'payload': {'payment': {'entity': {
+            'id': payment_id, 'entity': 'payment', 'amount': 10000, 'currency': 'INR',
+            'status': 'captured', 'order_id': f'order_{payment_id}', 'notes': [],
+        }}, 'order': {'entity': {
+            'id': f'order_{payment_id}', 'entity': 'order', 'amount': 10000, 'receipt': delivery_id,
+            'notes': {'tracking_id': delivery_id}, 'status': 'paid',
+        }}},
+    }
+
+
+def sign(body, secret=SECRET):
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def post_all(requests_share):
+    """Send (kind, payload) pairs; returns webhook ack latencies in seconds"""
+    client = app.test_client()
+    latencies = []
+    for kind, payload in requests_share:
+        if kind == 'webhook':
+            body = json.dumps(payload).encode('utf-8')
+            start = time.perf_counter()
+            response = client.post('/api/payment/razorpay-webhook', data=body,
+                                   content_type='application/json',
+                                   headers={'X-Razorpay-Signature': sign(body)})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"Webhook answered {response.status_code}: {response.get_json()}")
+        else:
+            client.post('/api/payment/razorpay-success', json=payload)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=100)
+    parser.add_argument('--copies', type=int, default=20, help='deliveries of each webhook event')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for background jobs')
+    args = parser.parse_args()
+
+    cleanup()
+    delivery_ids = seed_bookings(args.bookings, status='delivered')
+    try:
+        rng = random.Random(args.seed)
+        flood = []
+        for delivery_id in delivery_ids:
+            payment_id = f'pay_{delivery_id}'
+            flood += [('webhook', payment_event(delivery_id, payment_id))] * args.copies
+            if rng.random() < 0.2:
+                order_id = f'order_{payment_id}'
+                signature = hmac.new(RAZORPAY_KEY_SECRET.encode('utf-8'),
+                                     f'{order_id}|{payment_id}'.encode('utf-8'), hashlib.sha256).hexdigest()
+                flood.append(('checkout', {
+                    'tracking_id': delivery_id, 'razorpay_payment_id': payment_id,
+                    'razorpay_order_id': order_id, 'razorpay_signature': signature,
+                }))
+        rng.shuffle(flood)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            latencies = sorted(l for share in pool.map(post_all, [flood[i::args.threads] for i in range(args.threads)])
+                               for l in share)
+        elapsed = time.perf_counter() - start
+
+        problems = []
+        forged = json.dumps(payment_event(delivery_ids[0], 'pay_forged')).encode('utf-8')
+        response = app.test_client().post('/api/payment/razorpay-webhook', data=forged,
+                                          content_type='application/json',
+                                          headers={'X-Razorpay-Signature': sign(forged, 'wrong-secret')})
+        if response.status_code != 400:
+            problems.append(f"forged event answered {response.status_code}")
+
+        deadline = time.monotonic() + args.timeout
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            while True:
+                cursor.execute("""
+                    SELECT COUNT(*) FROM payment_events
+                    WHERE tracking_id LIKE 'BENCH%' AND status = 'received'
+                """)
+                pending = cursor.fetchone()[0]
+                conn.commit()
+                if not pending or time.monotonic() > deadline:
+                    break
+                time.sleep(0.2)
+
+            cursor.execute("SELECT COUNT(*) FROM deliveries WHERE id LIKE 'BENCH%' AND status = 'completed'")
+            completed = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT tracking_id) FROM delivery_events
+                WHERE tracking_id LIKE 'BENCH%' AND event_type = 'paid'
+            """)
+            paid_events, paid_bookings = cursor.fetchone()
+            cursor.execute("""
+                SELECT COUNT(*) FROM payment_events
+                WHERE tracking_id LIKE 'BENCH%' AND status = 'applied'
+            """)
+            applied = cursor.fetchone()[0]
+
+        total = len(delivery_ids)
+        if pending:
+            problems.append(f"{pending} payments still unapplied after {args.timeout}s")
+        if completed != total:
+            problems.append(f"only {completed}/{total} bookings completed")
+        if paid_events != total or paid_bookings != total:
+            problems.append(f"{paid_events} paid events over {paid_bookings} bookings (expected {total})")
+        if applied != total:
+            problems.append(f"{applied} applied payment rows (expected {total})")
+
+        print(f"{len(flood)} callbacks for {total} payments from {args.threads} threads in {elapsed:.2f}s")
+        print(f"Webhook ack latency: p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+        if problems:
+            print("FAILED: " + "; ".join(problems))
+            sys.exit(1)
+        print("OK: every payment applied exactly once")
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Local stand-ins for the external services, for checks and benchmarks
+    FakeRazorpay        - POST /v1/orders, GET /v1/orders?receipt=, GET /v1/orders/<id>/payments,
+                          GET /v1/payments/<id>
+    FakeDistanceMatrix  - GET /maps/api/distancematrix/json (deterministic distances)
+    FakeSMTP            - plain SMTP (no TLS; the app needs SMTP_NO_TLS=true), any login
+The HTTP fakes each run a keep-alive HTTP/1.1 server on 127.0.0.1 in a background thread and counts
+requests and client connections. Faults can be injected: fail_next answers that many
+requests with 503, delay sleeps before every answer.
+    with FakeRazorpay() as razorpay:
+        os.environ['RAZORPAY_API_BASE'] = razorpay.url
+"""
+import hashlib
+import itertools
+import json
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _dispatch(self, method):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        with fake.lock:
+            fake.requests += 1
+            fake.connections.add(self.client_address)
+            failing = fake.fail_next > 0
+            if failing:
+                fake.fail_next -= 1
+        if fake.delay:
+            time.sleep(fake.delay)
+        if failing:
+            if method == 'POST':
+                self.read_json()
+            self.send_json(503, {'error': {'code': 'SERVER_ERROR', 'description': 'injected failure'}})
+            return
+        fake.handle(self, method, url.path, parse_qs(url.query))
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out and hang up are expected in fault-injection runs
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeService:
+    """Base class: a threaded server whose requests go to handle()"""
+
+    def __init__(self, port=0):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = set()
+        self.fail_next = 0
+        self.delay = 0
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, handler, method, path, query):
+        handler.send_json(404, {'error': {'description': f'No route for {method} {path}'}})
+
+
+class FakeRazorpay(FakeService):
+    """Orders and payments. payment_status maps payment id -> status (default 'captured')."""
+
+    def __init__(self, port=0):
+        super().__init__(port)
+        self._ids = itertools.count(1)
+        self.orders = {}
+        self.payments = {}
+        self.payment_status = {}
+
+    def add_order(self, receipt, amount, notes=None):
+        """Register an order as if POST /v1/orders had been called; returns the order id"""
+        order_id = f'order_fake{next(self._ids):010d}'
+        with self.lock:
+            self.orders[order_id] = {
+                'id': order_id, 'entity': 'order', 'amount': amount, 'currency': 'INR',
+                'receipt': receipt, 'notes': notes or {'tracking_id': receipt}, 'status': 'created',
+            }
+        return order_id
+
+    def add_payment(self, order_id, status='captured'):
+        """Register a payment against an order; returns the payment id"""
+        payment_id = f'pay_fake{next(self._ids):010d}'
+        order = self.orders[order_id]
+        with self.lock:
+            self.payments[payment_id] = {
+                'id': payment_id, 'entity': 'payment', 'order_id': order_id,
+                'amount': order['amount'], 'currency': order['currency'],
+                'status': status, 'method': 'upi', 'notes': [],  # checkout adds no notes
+            }
+        return payment_id
+
+    def handle(self, handler, method, path, query):
+        parts = path.strip('/').split('/')
+        if method == 'POST' and parts == ['v1', 'orders']:
+            body = handler.read_json()
+            order_id = f'order_fake{next(self._ids):010d}'
+            order = {
+                'id': order_id, 'entity': 'order', 'amount': body.get('amount'),
+                'currency': body.get('currency', 'INR'), 'receipt': body.get('receipt'),
+                'notes': body.get('notes', {}), 'status': 'created',
+            }
+            with self.lock:
+                self.orders[order_id] = order
+            handler.send_json(200, order)
+        elif method == 'GET' and parts == ['v1', 'orders']:
+            receipt = query.get('receipt', [None])[0]
+            items = [order for order in self.orders.values() if receipt is None or order['receipt'] == receipt]
+            handler.send_json(200, {'entity': 'collection', 'count': len(items), 'items': items})
+        elif method == 'GET' and len(parts) == 3 and parts[:2] == ['v1', 'payments']:
+            payment = self.payments.get(parts[2], {'id': parts[2], 'entity': 'payment', 'amount': 100})
+            status = self.payment_status.get(parts[2], payment.get('status', 'captured'))
+            handler.send_json(200, dict(payment, status=status))
+        elif method == 'GET' and len(parts) == 4 and parts[:2] == ['v1', 'orders'] and parts[3] == 'payments':
+            items = [payment for payment in self.payments.values() if payment['order_id'] == parts[2]]
+            handler.send_json(200, {'entity': 'collection', 'count': len(items), 'items': items})
+        else:
+            super().handle(handler, method, path, query)
+
+
+class FakeDistanceMatrix(FakeService):
+    """Distance Matrix answers: 1-30 km derived from a hash of the two addresses"""
+
+    @staticmethod
+    def distance_m(origin, destination):
+        digest = hashlib.sha1(f'{origin}|{destination}'.encode('utf-8')).digest()
+        return 1000 + int.from_bytes(digest[:4], 'big') % 29000
+
+    def handle(self, handler, method, path, query):
+        if method != 'GET' or path != '/maps/api/distancematrix/json':
+            return super().handle(handler, method, path, query)
+        origin = query.get('origins', [''])[0]
+        destination = query.get('destinations', [''])[0]
+        meters = self.distance_m(origin, destination)
+        handler.send_json(200, {
+            'status': 'OK',
+            'rows': [{'elements': [{
+                'status': 'OK',
+                'distance': {'value': meters, 'text': f'{meters / 1000:.1f} km'},
+                'duration': {'value': meters // 8, 'text': f'{meters // 480} mins'},
+            }]}],
+        })
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        fake = self.server.fake
+        with fake.lock:
+            fake.connections += 1
+        self.reply('220 fake-smtp ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-fake-smtp')
+                self.reply('250-AUTH PLAIN LOGIN')
+                self.reply('250 SIZE 10485760')
+            elif verb == 'HELO':
+                self.reply('250 fake-smtp')
+            elif verb == 'AUTH':
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    size += len(data_line)
+                if fake.delay:
+                    time.sleep(fake.delay)
+                with fake.lock:
+                    fake.messages += 1
+                    fake.bytes += size
+                self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTP:
+    """Accepts every message and counts it; delay sleeps before each message is accepted"""
+
+    def __init__(self, port=0):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.bytes = 0
+        self.delay = 0
+        self._server = _SMTPServer(('127.0.0.1', port), _SMTPHandler)
+        self._server.fake = self
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
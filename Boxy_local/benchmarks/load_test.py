@@ -0,0 +1,326 @@
+"""
+Load test: the app in its own process, against local stand-ins for every external service
+
+Seeds BENCH* partners, customers and bookings into the configured MySQL database
+(DB_HOST, DB_NAME, ...), starts fake Razorpay, Distance Matrix and SMTP servers
+(fake_services.py), boots app.py on --port pointed at them, and runs these scenarios
+side by side for --duration seconds, one thread (with its own cookie session) per user:
+  partners   log in, then poll GET /api/partner/deliveries and /api/partner/status
+  customers  log in, book 1-3 stop parcels (POST /api/deliveries/create), check payment status
+  trackers   GET /api/deliveries/track/<id> for random seeded bookings
+  admins     log in, load the dashboard (stats, deliveries), then wait --admin-interval
+Reports requests, throughput, errors and latency percentiles per route. With
+--max-p95-ms / --max-error-rate the exit status is 1 when a route breaks the limit, so
+the run can gate a deploy; --json saves the report for comparing runs.
+    python benchmarks/load_test.py --duration 60 --partners 50 --customers 5 --trackers 20 --admins 2
+Use --url to load an app that is already running (it must be configured for the fakes
+itself), and --keep-data to leave the seeded rows in place.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import bench_db
+from fake_services import FakeDistanceMatrix, FakeRazorpay, FakeSMTP
+
+APP_DIR = Path(__file__).resolve().parent.parent
+ADMIN_LOGIN = {'email': 'admin@boxy.com', 'password': 'admin123'}
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Stats:
+    """Latencies and failures per route, shared by all users"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def reset(self):
+        with self.lock:
+            self.latencies = {}
+            self.errors = {}
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed):
+        rows = []
+        with self.lock:
+            items = [(name, sorted(values), self.errors.get(name, 0)) for name, values in self.latencies.items()]
+        for name, ordered, errors in sorted(items):
+            row = {'route': name, 'requests': len(ordered), 'rps': round(len(ordered) / elapsed, 2),
+                   'errors': errors, 'error_rate': round(errors / len(ordered), 4)}
+            for p in PERCENTILES:
+                row[f'p{p}_ms'] = round(ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000, 2)
+            row['max_ms'] = round(ordered[-1] * 1000, 2)
+            rows.append(row)
+        return rows
+
+
+class User(threading.Thread):
+    """One virtual user: setup() once, then step() and think() until stopped"""
+
+    def __init__(self, base_url, stats, stop, start_delay, rng):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.stats = stats
+        self.stop_event = stop
+        self.start_delay = start_delay
+        self.rng = rng
+        self.http = requests.Session()
+
+    def call(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.stats.record(name, time.perf_counter() - start, ok)
+        return response
+
+    def login(self, name, path, body):
+        response = self.call(name, 'POST', path, json=body)
+        if response is None or response.status_code != 200:
+            raise RuntimeError(f'{name} failed: {response.status_code if response is not None else "no response"}')
+
+    def run(self):
+        if self.stop_event.wait(self.start_delay):
+            return
+        try:
+            self.setup()
+        except RuntimeError as e:
+            print(f'  {type(self).__name__}: {e}', file=sys.stderr)
+            return
+        while not self.stop_event.is_set():
+            self.step()
+            self.stop_event.wait(self.think())
+
+    def setup(self):
+        pass
+
+    def think(self):
+        return 0
+
+
+class Partner(User):
+    def __init__(self, email, interval, *args):
+        super().__init__(*args)
+        self.email = email
+        self.interval = interval
+
+    def setup(self):
+        self.login('POST /api/partner/login', '/api/partner/login',
+                   {'email': self.email, 'password': bench_db.PASSWORD})
+
+    def step(self):
+        self.call('GET /api/partner/deliveries', 'GET', '/api/partner/deliveries')
+        self.call('GET /api/partner/status', 'GET', '/api/partner/status')
+
+    def think(self):
+        return self.interval
+
+
+class Customer(User):
+    def __init__(self, email, interval, *args):
+        super().__init__(*args)
+        self.email = email
+        self.interval = interval
+
+    def setup(self):
+        self.login('POST /api/customer/login', '/api/customer/login',
+                   {'emailOrPhone': self.email, 'password': bench_db.PASSWORD})
+
+    def step(self):
+        stops = [{'receiver_name': f'Receiver {n}', 'receiver_phone': f'9{self.rng.randrange(10 ** 9):09d}',
+                  'drop_address': f'{self.rng.randrange(1, 500)} Bench Road, Ahmedabad'}
+                 for n in range(self.rng.randint(1, 3))]
+        response = self.call('POST /api/deliveries/create', 'POST', '/api/deliveries/create', json={
+            'stops': stops, 'parcelType': 'documents', 'parcelWeight': round(self.rng.uniform(0.5, 8), 1),
+            'preferredVehicle': self.rng.choice(['bike', 'scooter', 'car']),
+        })
+        if response is not None and response.status_code == 200:
+            tracking_id = response.json()['delivery_id']
+            self.call('GET /api/payment/status/<id>', 'GET', f'/api/payment/status/{tracking_id}')
+
+    def think(self):
+        return self.rng.expovariate(1 / self.interval) if self.interval else 0
+
+
+class Tracker(User):
+    def __init__(self, tracking_ids, interval, *args):
+        super().__init__(*args)
+        self.tracking_ids = tracking_ids
+        self.interval = interval
+
+    def step(self):
+        tracking_id = self.rng.choice(self.tracking_ids)
+        self.call('GET /api/deliveries/track/<id>', 'GET', f'/api/deliveries/track/{tracking_id}')
+
+    def think(self):
+        return self.rng.expovariate(1 / self.interval) if self.interval else 0
+
+
+class Admin(User):
+    def __init__(self, interval, *args):
+        super().__init__(*args)
+        self.interval = interval
+
+    def setup(self):
+        self.login('POST /api/admin/login', '/api/admin/login', ADMIN_LOGIN)
+
+    def step(self):
+        self.call('GET /api/admin/stats', 'GET', '/api/admin/stats')
+        self.call('GET /api/admin/deliveries', 'GET', '/api/admin/deliveries')
+
+    def think(self):
+        return self.interval
+
+
+def boot_app(port, env, log):
+    """Start app.py in its own process and wait until it answers"""
+    code = f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)"
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=APP_DIR, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'app exited with status {process.returncode} (see --app-log)')
+        try:
+            requests.get(url + '/metrics', timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit('app did not start within 60 s')
+
+
+def print_report(rows, elapsed):
+    print(f"{'route':<36}{'requests':>9}{'req/s':>9}{'errors':>8}"
+          + ''.join(f"{f'p{p} ms':>9}" for p in PERCENTILES) + f"{'max ms':>9}")
+    for row in rows:
+        print(f"{row['route']:<36}{row['requests']:>9}{row['rps']:>9.1f}{row['errors']:>8}"
+              + ''.join(f"{row[f'p{p}_ms']:>9.1f}" for p in PERCENTILES) + f"{row['max_ms']:>9.1f}")
+    total = sum(row['requests'] for row in rows)
+    print(f"{'total':<36}{total:>9}{total / elapsed:>9.1f}{sum(row['errors'] for row in rows):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load after ramp-up')
+    parser.add_argument('--ramp', type=float, default=5, help='seconds over which users start')
+    parser.add_argument('--partners', type=int, default=50)
+    parser.add_argument('--customers', type=int, default=5)
+    parser.add_argument('--trackers', type=int, default=20)
+    parser.add_argument('--admins', type=int, default=2)
+    parser.add_argument('--partner-interval', type=float, default=5, help='seconds between partner polls')
+    parser.add_argument('--customer-interval', type=float, default=2, help='mean seconds between bookings')
+    parser.add_argument('--tracker-interval', type=float, default=0.5, help='mean seconds between lookups')
+    parser.add_argument('--admin-interval', type=float, default=30, help='seconds between dashboard loads')
+    parser.add_argument('--bookings', type=int, default=2000, help='available bookings to seed')
+    parser.add_argument('--stops', type=int, default=2, help='stops per seeded booking')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for user behaviour')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--url', help='load an already running app instead of booting one')
+    parser.add_argument('--app-log', help='file for the booted app\'s output (default: discarded)')
+    parser.add_argument('--smtp-delay', type=float, default=0, help='seconds the fake SMTP server takes per message')
+    parser.add_argument('--keep-data', action='store_true', help='leave the seeded rows in place')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--max-p95-ms', type=float, help='fail if any route\'s p95 is above this')
+    parser.add_argument('--max-error-rate', type=float, help='fail if any route\'s error rate is above this')
+    args = parser.parse_args()
+
+    print(f"Seeding {args.partners} partners, {args.customers} customers, {args.bookings} bookings...")
+    bench_db.cleanup()
+    partner_emails = bench_db.seed_partners(max(args.partners, 1))
+    customer_emails = bench_db.seed_customers(max(args.customers, 1))
+    tracking_ids = bench_db.seed_bookings(args.bookings, args.stops)
+
+    razorpay, distances, smtp = FakeRazorpay().start(), FakeDistanceMatrix().start(), FakeSMTP().start()
+    smtp.delay = args.smtp_delay
+    process = None
+    log = open(args.app_log, 'w') if args.app_log else subprocess.DEVNULL
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            env = dict(os.environ,
+                       RAZORPAY_API_BASE=razorpay.url,
+                       GOOGLE_API_KEY='fake-key',
+                       DISTANCE_MATRIX_URL=distances.url + '/maps/api/distancematrix/json',
+                       SMTP_SERVER=smtp.host, SMTP_PORT=str(smtp.port), SMTP_NO_TLS='true',
+                       SMTP_EMAIL=f'load@{bench_db.EMAIL_DOMAIN}', SMTP_PASSWORD='fake',
+                       LOG_REQUESTS='0')
+            process, base_url = boot_app(args.port, env, log)
+
+        stats, stop = Stats(), threading.Event()
+        rng = random.Random(args.seed)
+        users = []
+
+        def add(cls, *extra):
+            users.append(cls(*extra, base_url, stats, stop, rng.uniform(0, args.ramp), random.Random(rng.random())))
+
+        for i in range(args.partners):
+            add(Partner, partner_emails[i], args.partner_interval)
+        for i in range(args.customers):
+            add(Customer, customer_emails[i], args.customer_interval)
+        for _ in range(args.trackers):
+            add(Tracker, tracking_ids, args.tracker_interval)
+        for _ in range(args.admins):
+            add(Admin, args.admin_interval)
+
+        print(f"{len(users)} users against {base_url}: {args.ramp:g} s ramp-up, {args.duration:g} s measured")
+        for user in users:
+            user.start()
+        time.sleep(args.ramp)
+        stats.reset()  # measure the steady state only
+        start = time.perf_counter()
+        time.sleep(args.duration)
+        elapsed = time.perf_counter() - start
+        rows = stats.report(elapsed)
+        stop.set()
+        for user in users:
+            user.join(timeout=35)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        for fake in (razorpay, distances, smtp):
+            fake.stop()
+        if args.app_log:
+            log.close()
+        if not args.keep_data:
+            bench_db.cleanup()
+
+    print_report(rows, elapsed)
+    print(f"fakes: {razorpay.requests} Razorpay, {distances.requests} Distance Matrix requests, "
+          f"{smtp.messages} emails")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'elapsed': elapsed, 'routes': rows}, f, indent=2)
+
+    failures = [row['route'] for row in rows
+                if (args.max_p95_ms is not None and row['p95_ms'] > args.max_p95_ms)
+                or (args.max_error_rate is not None and row['error_rate'] > args.max_error_rate)]
+    if failures:
+        print(f"FAILED limits: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
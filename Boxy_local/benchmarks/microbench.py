@@ -0,0 +1,161 @@
+"""
+Micro-benchmarks for the pricing and validation functions run on every quote and booking
+
+Times each case with timeit (best of --repeat interleaved rounds) and reports
+nanoseconds per call. Distances come from the fake Distance Matrix formula, so nothing
+touches the network.
+    python benchmarks/microbench.py run                     # just print the timings
+    python benchmarks/microbench.py save                    # store them as the baseline
+    python benchmarks/microbench.py compare --threshold 15  # exit 1 if a case got slower
+compare first divides out the median change over all cases, so a machine that is
+uniformly faster or slower than when the baseline was saved (CPU frequency, a noisy
+VM) does not show up as a regression; a case is flagged when it moved more than
+--threshold percent beyond the rest. On dedicated hardware, --absolute compares the
+raw times instead, which also catches slowdowns of the whole suite. The baseline
+(benchmarks/baselines/microbench.json) records the machine and Python it was taken on.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import validation
+from fake_services import FakeDistanceMatrix
+from pricing import calculate_price, calculate_total_distance, route_legs
+
+BASELINE = Path(__file__).resolve().parent / 'baselines' / 'microbench.json'
+
+PICKUP = '12, CG Road, Navrangpura, Ahmedabad, Gujarat 380009'
+
+
+RECEIVERS = ('Ananya Shah', 'Ravi Patel', 'Meera Iyer', 'Vikram Rao', 'Priya Nair')
+
+
+def make_stops(count):
+    """Valid stops, so validate_stops_list walks all of them"""
+    stops = [{'drop_address': f'{40 + n}, SG Highway, Bodakdev, Ahmedabad, Gujarat 380054',
+              'receiver_name': RECEIVERS[n - 1], 'receiver_phone': f'98765432{n:02d}'}
+             for n in range(1, count + 1)]
+    assert validation.validate_stops_list(stops) == (True, ''), validation.validate_stops_list(stops)
+    return stops
+
+
+def fake_distances(pickup, stops):
+    """{(origin, destination): km} as lookup_distances() would return from the fake service"""
+    return {leg: FakeDistanceMatrix.distance_m(*leg) / 1000 for leg in route_legs(pickup, stops)}
+
+
+def cases():
+    """name -> zero-argument callable"""
+    stops_1, stops_3, stops_5 = make_stops(1), make_stops(3), make_stops(5)
+    distances_3, distances_5 = fake_distances(PICKUP, stops_3), fake_distances(PICKUP, stops_5)
+    return {
+        'calculate_price[bike, 1 stop]': lambda: calculate_price(7.4, 1.5, 1, 'bike'),
+        'calculate_price[car, 5 stops]': lambda: calculate_price(38.2, 12.0, 5, 'car'),
+        'calculate_total_distance[3 stops]': lambda: calculate_total_distance(PICKUP, stops_3, distances_3),
+        'calculate_total_distance[5 stops]': lambda: calculate_total_distance(PICKUP, stops_5, distances_5),
+        'validate_email[valid]': lambda: validation.validate_email('priya.shah+orders@example-mail.co.in'),
+        'validate_email[bad domain char]': lambda: validation.validate_email('priya.shah@example_mail.com'),
+        'validate_phone[valid]': lambda: validation.validate_phone('98765 43210'),
+        'validate_phone[letters]': lambda: validation.validate_phone('98765abc10'),
+        'validate_name[valid]': lambda: validation.validate_name('Ananya Krishnamurthy', 'Receiver name'),
+        'validate_address[valid]': lambda: validation.validate_address(PICKUP, 'Pickup address'),
+        'validate_parcel_weight[valid]': lambda: validation.validate_parcel_weight('4.5'),
+        'validate_tracking_id[valid]': lambda: validation.validate_tracking_id('QP000012345'),
+        'validate_stops_list[1 stop]': lambda: validation.validate_stops_list(stops_1),
+        'validate_stops_list[5 stops]': lambda: validation.validate_stops_list(stops_5),
+    }
+
+
+def run(selected, repeat):
+    """
+    ns per call for each case. The cases are timed in repeat interleaved rounds and
+    each keeps its best round, so a slow spell on the machine spoils a few samples of
+    every case rather than all samples of one.
+    """
+    timers = {name: timeit.Timer(func) for name, func in selected.items()}
+    # Loop counts for about 50 ms per sample
+    numbers = {name: max(1, timer.autorange()[0] // 4) for name, timer in timers.items()}
+    best = dict.fromkeys(timers, float('inf'))
+    for _ in range(repeat):
+        for name, timer in timers.items():
+            best[name] = min(best[name], timer.timeit(numbers[name]) / numbers[name] * 1e9)
+    results = {name: round(ns, 1) for name, ns in best.items()}
+    for name, ns in results.items():
+        print(f"  {name:<40}{ns:>10.1f} ns")
+    return results
+
+
+def environment():
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'machine': platform.machine(), 'processor': platform.processor() or platform.node()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('run', 'save', 'compare'))
+    parser.add_argument('--filter', default='', help='only cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=15, help='rounds over all cases')
+    parser.add_argument('--threshold', type=float, default=15, help='percent slower that counts as a regression')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--absolute', action='store_true', help='compare raw times, without the drift correction')
+    args = parser.parse_args()
+
+    selected = {name: func for name, func in cases().items() if args.filter in name}
+    if not selected:
+        parser.error(f'no case matches {args.filter!r}')
+    print(f"{len(selected)} cases, best of {args.repeat} (ns per call)")
+    results = run(selected, args.repeat)
+
+    if args.command == 'save':
+        saved = {}
+        if args.baseline.exists():
+            saved = json.loads(args.baseline.read_text()).get('results', {})
+        saved.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'saved': datetime.now().isoformat(timespec='seconds'),
+            'environment': environment(),
+            'results': dict(sorted(saved.items())),
+        }, indent=2) + '\n')
+        print(f"Baseline written to {args.baseline}")
+
+    elif args.command == 'compare':
+        if not args.baseline.exists():
+            sys.exit(f"No baseline at {args.baseline}; run 'save' first")
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get('environment') != environment():
+            print(f"Note: baseline taken on {baseline.get('environment')}, now on {environment()}")
+        common = [name for name in results if name in baseline['results']]
+        drift = 1.0
+        if not args.absolute and len(common) >= 3:
+            drift = statistics.median(results[name] / baseline['results'][name] for name in common)
+            print(f"\nAll cases moved by a median {(drift - 1) * 100:+.1f}% since the baseline; "
+                  f"changes below are relative to that")
+        regressions = []
+        print(f"  {'case':<40}{'baseline':>10}{'now':>10}{'change':>9}")
+        for name, now in results.items():
+            before = baseline['results'].get(name)
+            if before is None:
+                print(f"  {name:<40}{'-':>10}{now:>10.1f}      new")
+                continue
+            before *= drift
+            change = (now - before) / before * 100
+            flag = '  REGRESSION' if change > args.threshold else ''
+            print(f"  {name:<40}{before:>10.1f}{now:>10.1f}{change:>+8.1f}%{flag}")
+            if flag:
+                regressions.append(name)
+        if regressions:
+            print(f"{len(regressions)} case(s) more than {args.threshold:g}% slower than the baseline")
+            sys.exit(1)
+        print(f"No case more than {args.threshold:g}% slower than the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+"""
+Deterministic bulk data for benchmarking queries at scale
+
+Loads partners, customers and deliveries (with their stops and delivery events) into
+the configured MySQL database (DB_HOST, DB_NAME, ...). Each block of CHUNK deliveries
+is generated from its own random stream seeded by (--seed, block number), so the same
+--seed, counts, distributions and --end give the same rows whatever --workers is, and
+workers load blocks in parallel, each on its own connection with unique and foreign
+key checks off. Rows go in with batched executemany (default) or, with
+--method load-data, LOAD DATA LOCAL INFILE from temporary tab-separated files
+(the server needs local_infile=ON).
+
+Distributions are "value=weight" lists:
+    --status-mix available=10,accepted=3,picked=2,on_the_way=3,delivered=30,completed=52
+    --stops-mix 1=70,2=20,3=8,4=2
+    --vehicle-mix bike=50,scooter=30,car=20          (partners)
+    --preferred-mix none=60,bike=15,scooter=10,car=15 (bookings)
+    --parcel-mix document=45,electronics=25,bulk=20,other=10
+created_at is spread evenly over the --days before --end (default: today); work is
+assigned to partners with a skew (--partner-skew 1 is even, higher favours a few busy
+partners). Seeded ids are QP8 + 11 digits (tracking ids stay valid and never meet the
+app's QP + 9 digit ids); partners are SP*, customers SC*, emails @seed.boxy.local.
+    python benchmarks/seed_data.py --deliveries 2000000 --partners 5000 --customers 200000 --workers 4
+    python benchmarks/seed_data.py --dry-run --deliveries 100000    (generation speed only)
+    python benchmarks/seed_data.py --clean
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mysql.connector
+
+from database import DB_CONFIG
+from pricing import calculate_price
+
+CHUNK = 10000
+DELIVERY_PREFIX = 'QP8'
+PARTNER_PREFIX = 'SP'
+CUSTOMER_PREFIX = 'SC'
+EMAIL_DOMAIN = 'seed.boxy.local'
+PASSWORD = 'seed'
+
+STATUSES = ('available', 'accepted', 'picked', 'on_the_way', 'delivered', 'completed')
+VEHICLES = ('bike', 'scooter', 'car')
+
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan',
+               'Ananya', 'Diya', 'Priya', 'Kavya', 'Meera', 'Riya', 'Sneha', 'Pooja', 'Neha', 'Isha', 'Tara')
+LAST_NAMES = ('Patel', 'Shah', 'Mehta', 'Desai', 'Joshi', 'Sharma', 'Verma', 'Iyer', 'Nair', 'Reddy',
+              'Rao', 'Gupta', 'Singh', 'Kumar', 'Trivedi', 'Pandya', 'Bhatt', 'Parikh', 'Modi', 'Dave')
+STREETS = ('CG Road', 'SG Highway', 'Ashram Road', 'Relief Road', 'Law Garden', 'Satellite Road',
+           'Prahlad Nagar', 'Navrangpura', 'Vastrapur', 'Bodakdev', 'Maninagar', 'Paldi')
+CITIES = ('Ahmedabad', 'Gandhinagar', 'Vadodara', 'Surat', 'Rajkot')
+
+DELIVERY_COLUMNS = (
+    'id', 'sender_name', 'sender_address', 'sender_email', 'receiver_name', 'receiver_address',
+    'receiver_phone', 'parcel_type', 'weight', 'preferred_vehicle', 'status', 'partner_id',
+    'total_stops', 'delivered_stops', 'created_at', 'accepted_at', 'updated_at', 'delivered_at',
+    'total_amount', 'payment_status', 'payment_method',
+)
+STOP_COLUMNS = ('booking_id', 'stop_number', 'drop_address', 'receiver_name', 'receiver_phone',
+                'status', 'delivered_at')
+EVENT_COLUMNS = ('tracking_id', 'event_type', 'status', 'payment_status', 'partner_id', 'created_at')
+PARTNER_COLUMNS = ('id', 'first_name', 'last_name', 'phone', 'email', 'vehicle_type', 'vehicle_number',
+                   'aadhar', 'password', 'status', 'approved')
+CUSTOMER_COLUMNS = ('id', 'first_name', 'last_name', 'email', 'phone', 'address', 'password')
+
+
+def parse_mix(text, allowed=None, number=False):
+    """'a=3,b=1' -> ((a, b), (3, 4)): values and cumulative weights for random.choices"""
+    values, cumulative, total = [], [], 0.0
+    for part in text.split(','):
+        value, _, weight = part.partition('=')
+        value = value.strip()
+        if number:
+            value = int(value)
+        elif allowed is not None and value not in allowed:
+            raise argparse.ArgumentTypeError(f"{value!r} is not one of {', '.join(allowed)}")
+        total += float(weight)
+        values.append(value)
+        cumulative.append(total)
+    if total <= 0:
+        raise argparse.ArgumentTypeError(f'weights in {text!r} must add up to more than 0')
+    return tuple(values), tuple(cumulative)
+
+
+@dataclass(frozen=True)
+class Plan:
+    seed: int
+    deliveries: int
+    partners: int
+    customers: int
+    end: float  # timestamp the date range ends at
+    days: int
+    status_mix: tuple
+    stops_mix: tuple
+    vehicle_mix: tuple
+    preferred_mix: tuple
+    parcel_mix: tuple
+    partner_skew: float
+    events: str
+
+
+def person(index):
+    """First and last name for a customer/partner/receiver number (no randomness needed)"""
+    return FIRST_NAMES[index % len(FIRST_NAMES)], LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+
+
+def address(index):
+    return (f"{index % 450 + 1}, {STREETS[(index // 450) % len(STREETS)]}, "
+            f"{CITIES[(index // (450 * len(STREETS))) % len(CITIES)]}")
+
+
+def customer_row(index):
+    first, last = person(index)
+    return (f"{CUSTOMER_PREFIX}{index:08d}", first, last, f"customer{index}@{EMAIL_DOMAIN}",
+            f"6{index:09d}", address(index), PASSWORD)
+
+
+def partner_row(index, vehicle, online):
+    first, last = person(index + 7)
+    return (f"{PARTNER_PREFIX}{index:08d}", first, last, f"9{index:09d}", f"partner{index}@{EMAIL_DOMAIN}",
+            vehicle, f"GJ{index % 38 + 1:02d}AB{index % 10000:04d}", f"{index:012d}", PASSWORD,
+            'online' if online else 'offline', True)
+
+
+def partner_rows(plan):
+    rng = random.Random(f'{plan.seed}:partners')
+    vehicles, cumulative = plan.vehicle_mix
+    kinds = rng.choices(vehicles, cum_weights=cumulative, k=plan.partners)
+    return [partner_row(i, kinds[i - 1], rng.random() < 0.3) for i in range(1, plan.partners + 1)]
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(int(seconds))
+
+
+def delivery_chunk(plan, chunk):
+    """Rows (deliveries, stops, events) for deliveries chunk*CHUNK+1 .. (chunk+1)*CHUNK"""
+    rng = random.Random(f'{plan.seed}:deliveries:{chunk}')
+    first = chunk * CHUNK + 1
+    count = min(CHUNK, plan.deliveries - first + 1)
+    statuses = rng.choices(plan.status_mix[0], cum_weights=plan.status_mix[1], k=count)
+    stop_counts = rng.choices(plan.stops_mix[0], cum_weights=plan.stops_mix[1], k=count)
+    preferred = rng.choices(plan.preferred_mix[0], cum_weights=plan.preferred_mix[1], k=count)
+    parcels = rng.choices(plan.parcel_mix[0], cum_weights=plan.parcel_mix[1], k=count)
+    span = plan.days * 86400
+    start = plan.end - span
+    random_ = rng.random
+    deliveries, stops, events = [], [], []
+
+    for n in range(count):
+        number = first + n
+        delivery_id = f"{DELIVERY_PREFIX}{number:011d}"
+        status = statuses[n]
+        total_stops = stop_counts[n]
+        vehicle = preferred[n] if preferred[n] != 'none' else None
+        weight = round(0.2 + random_() * 24.8, 2)
+        customer = int(random_() * plan.customers) + 1
+        first_name, last_name = person(customer)
+
+        created = start + random_() * span
+        accepted = delivered = None
+        partner_id = None
+        delivered_stops = 0
+        if status != 'available':
+            partner_id = f"{PARTNER_PREFIX}{int(random_() ** plan.partner_skew * plan.partners) + 1:08d}"
+            accepted = min(created + 120 + random_() * 3600, plan.end)
+            if status in ('delivered', 'completed'):
+                delivered = min(accepted + 1200 + random_() * 14400, plan.end)
+                delivered_stops = total_stops
+            elif status == 'on_the_way':
+                delivered_stops = int(random_() * total_stops)
+        updated = delivered or accepted
+
+        payment_status, payment_method = 'pending', None
+        if delivered is not None:
+            roll = random_()
+            if roll < 0.85:
+                payment_status, payment_method = 'paid', 'online' if random_() < 0.7 else 'cash'
+            elif roll < 0.9:
+                payment_status, payment_method = 'pending_cash', 'cash'
+
+        distance = total_stops * (2 + random_() * 10)
+        amount = calculate_price(distance, weight, total_stops, vehicle)['total']
+        receiver = int(random_() * 1_000_000)
+        receiver_first, receiver_last = person(receiver)
+        created_at = _timestamp(created)
+        accepted_at = _timestamp(accepted) if accepted else None
+        delivered_at = _timestamp(delivered) if delivered else None
+
+        for stop_number in range(1, total_stops + 1):
+            done = stop_number <= delivered_stops
+            stop_receiver = person(receiver + stop_number - 1)
+            stops.append((delivery_id, stop_number, address(receiver + stop_number * 7919),
+                          f"{stop_receiver[0]} {stop_receiver[1]}", f"9{(receiver + stop_number) % 10 ** 9:09d}",
+                          'delivered' if done else 'pending',
+                          (delivered_at or _timestamp(updated)) if done else None))
+
+        deliveries.append((
+            delivery_id, f"{first_name} {last_name}", address(customer), f"customer{customer}@{EMAIL_DOMAIN}",
+            f"{receiver_first} {receiver_last}", stops[-total_stops][2], stops[-total_stops][4],
+            parcels[n], weight, vehicle, status, partner_id, total_stops, delivered_stops,
+            created_at, accepted_at, _timestamp(updated) if updated else None, delivered_at,
+            amount, payment_status, payment_method,
+        ))
+
+        if plan.events != 'none':
+            events.append((delivery_id, 'created', 'available', 'pending', None, created_at))
+            if plan.events == 'full' and status != 'available':
+                # Same event types as delivery_state: one per status reached, then 'paid'
+                reached = [name for name in STATUSES[1:STATUSES.index(status) + 1] if name != 'completed']
+                step = ((delivered or accepted) - accepted) / max(len(reached) - 1, 1)
+                for i, reached_status in enumerate(reached):
+                    events.append((delivery_id, reached_status, reached_status, None, partner_id,
+                                   _timestamp(accepted + i * step)))
+                if payment_status == 'paid':
+                    events.append((delivery_id, 'paid', status, 'paid', partner_id, delivered_at))
+    return deliveries, stops, events
+
+
+def _insert_sql(table, columns, ignore=False):
+    return (f"INSERT {'IGNORE ' if ignore else ''}INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+
+def _tsv_value(value):
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return '1' if value else '0'
+    return str(value).replace('\\', '\\\\').replace('\t', ' ').replace('\n', ' ')
+
+
+def _load_data(cursor, table, columns, rows):
+    """LOAD DATA LOCAL INFILE rows into table via a temporary tab-separated file"""
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8', newline='') as f:
+        f.writelines('\t'.join([_tsv_value(value) for value in row]) + '\n' for row in rows)
+        path = f.name
+    try:
+        cursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                       f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)})", (path,))
+    finally:
+        os.unlink(path)
+
+
+def connect(method):
+    conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=(method == 'load-data'))
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+    return conn, cursor
+
+
+def write(cursor, method, table, columns, rows, ignore=False):
+    if not rows:
+        return
+    if method == 'load-data':
+        _load_data(cursor, table, columns, rows)
+    else:
+        cursor.executemany(_insert_sql(table, columns, ignore), rows)
+
+
+_worker = {}
+
+
+def _init_worker(plan, method, dry_run):
+    _worker.update(plan=plan, method=method, dry_run=dry_run)
+    if not dry_run:
+        _worker['conn'], _worker['cursor'] = connect(method)
+
+
+def _load_chunk(chunk):
+    deliveries, stops, events = delivery_chunk(_worker['plan'], chunk)
+    if not _worker['dry_run']:
+        cursor, method = _worker['cursor'], _worker['method']
+        write(cursor, method, 'deliveries', DELIVERY_COLUMNS, deliveries)
+        write(cursor, method, 'delivery_stops', STOP_COLUMNS, stops)
+        write(cursor, method, 'delivery_events', EVENT_COLUMNS, events)
+        _worker['conn'].commit()
+    return len(deliveries), len(stops), len(events)
+
+
+def clean():
+    """Delete every seeded row, a batch at a time"""
+    conn, cursor = connect('executemany')
+    for table, condition, pattern in (
+        ('delivery_events', 'tracking_id LIKE %s', DELIVERY_PREFIX + '%'),
+        ('delivery_stops', 'booking_id LIKE %s', DELIVERY_PREFIX + '%'),
+        ('deliveries', 'id LIKE %s', DELIVERY_PREFIX + '%'),
+        ('partners', 'id LIKE %s', PARTNER_PREFIX + '%'),
+        ('customers', 'id LIKE %s', CUSTOMER_PREFIX + '%'),
+    ):
+        total = 0
+        while True:
+            cursor.execute(f"DELETE FROM {table} WHERE {condition} LIMIT 50000", (pattern,))
+            conn.commit()
+            total += cursor.rowcount
+            if cursor.rowcount < 50000:
+                break
+        print(f"  {table}: {total} rows deleted")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deliveries', type=int, default=1_000_000)
+    parser.add_argument('--partners', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=int, default=365, help='created_at spans this many days')
+    parser.add_argument('--end', type=date.fromisoformat, default=date.today(),
+                        help='last day of the range (YYYY-MM-DD, default today)')
+    parser.add_argument('--status-mix', default='available=10,accepted=3,picked=2,on_the_way=3,delivered=30,completed=52',
+                        type=lambda text: parse_mix(text, STATUSES))
+    parser.add_argument('--stops-mix', default='1=70,2=20,3=8,4=2', type=lambda text: parse_mix(text, number=True))
+    parser.add_argument('--vehicle-mix', default='bike=50,scooter=30,car=20',
+                        type=lambda text: parse_mix(text, VEHICLES))
+    parser.add_argument('--preferred-mix', default='none=60,bike=15,scooter=10,car=15',
+                        type=lambda text: parse_mix(text, ('none',) + VEHICLES))
+    parser.add_argument('--parcel-mix', default='document=45,electronics=25,bulk=20,other=10', type=parse_mix)
+    parser.add_argument('--partner-skew', type=float, default=2.0, help='1 = work spread evenly over partners')
+    parser.add_argument('--events', choices=('none', 'created', 'full'), default='created',
+                        help="delivery_events per booking: none, 'created' only, or every status reached")
+    parser.add_argument('--method', choices=('executemany', 'load-data'), default='executemany')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--dry-run', action='store_true', help='generate rows without a database')
+    parser.add_argument('--clean', action='store_true', help='delete all seeded rows and exit')
+    args = parser.parse_args()
+
+    if args.clean:
+        clean()
+        return
+    if min(args.stops_mix[0]) < 1:
+        parser.error('--stops-mix values must be at least 1')
+    if args.partners < 1 or args.customers < 1:
+        parser.error('--partners and --customers must be at least 1')
+
+    end = datetime.combine(args.end, datetime.max.time()).replace(microsecond=0).timestamp()
+    plan = Plan(args.seed, args.deliveries, args.partners, args.customers, end, args.days,
+                args.status_mix, args.stops_mix, args.vehicle_mix, args.preferred_mix, args.parcel_mix,
+                args.partner_skew, args.events)
+    started = time.perf_counter()
+
+    if not args.dry_run:
+        conn, cursor = connect(args.method)
+        rows = partner_rows(plan)
+        for start in range(0, len(rows), CHUNK):
+            cursor.executemany(_insert_sql('partners', PARTNER_COLUMNS, ignore=True), rows[start:start + CHUNK])
+        for start in range(1, args.customers + 1, CHUNK):
+            cursor.executemany(_insert_sql('customers', CUSTOMER_COLUMNS, ignore=True),
+                               [customer_row(i) for i in range(start, min(start + CHUNK, args.customers + 1))])
+        conn.commit()
+        conn.close()
+    print(f"{args.partners} partners, {args.customers} customers ({time.perf_counter() - started:.1f} s)")
+
+    chunks = range((args.deliveries + CHUNK - 1) // CHUNK)
+    totals = [0, 0, 0]
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(plan, args.method, args.dry_run)) as pool:
+        for done, counts in enumerate(pool.map(_load_chunk, chunks), 1):
+            totals = [total + count for total, count in zip(totals, counts)]
+            if done % 20 == 0 or done == len(chunks):
+                elapsed = time.perf_counter() - started
+                print(f"  {totals[0]:>11,} deliveries {totals[1]:>11,} stops {totals[2]:>11,} events  "
+                      f"{sum(totals) / elapsed:>9,.0f} rows/s")
+    elapsed = time.perf_counter() - started
+    print(f"{sum(totals) + args.partners + args.customers:,} rows in {elapsed:.1f} s "
+          f"({'generated only' if args.dry_run else args.method}, {args.workers} workers, seed {args.seed})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Booking persistence
+A booking is written with one INSERT for its delivery row (all columns at once), one
+multi-row INSERT for its stops and one for its 'created' event, and the API response
+is built from the same in-memory values instead of reading the row back.
+"""
+from delivery_events import event_row, record_events
+
+DELIVERY_COLUMNS = (
+    'id', 'sender_name', 'sender_address', 'sender_email', 'receiver_name', 'receiver_address',
+    'receiver_phone', 'parcel_type', 'parcel_type_specification', 'weight', 'parcel_height',
+    'parcel_width', 'preferred_vehicle', 'status', 'total_stops', 'total_amount', 'created_at',
+)
+
+INSERT_DELIVERY_SQL = f"""
+    INSERT INTO deliveries ({', '.join(DELIVERY_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(DELIVERY_COLUMNS))})
+"""
+
+INSERT_STOP_SQL = """
+    INSERT INTO delivery_stops (booking_id, stop_number, drop_address, receiver_name, receiver_phone, status)
+    VALUES (%s, %s, %s, %s, %s, 'pending')
+"""
+
+# Fields returned to the client after a booking is created
+RESPONSE_FIELDS = (
+    'id', 'sender_name', 'sender_address', 'receiver_name', 'receiver_address', 'receiver_phone',
+    'parcel_type', 'weight', 'status', 'partner_id', 'total_stops',
+    'created_at', 'accepted_at', 'updated_at', 'delivered_at',
+)
+
+
+def create_id_counters_table(cursor):
+    """
+    Create the id_counters table (called from init_database); the delivery counter
+    starts after the highest QP tracking id already used
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS id_counters (
+            name VARCHAR(30) PRIMARY KEY,
+            value BIGINT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO id_counters (name, value)
+        SELECT 'delivery', COALESCE(MAX(CAST(SUBSTRING(id, 3) AS UNSIGNED)), 0)
+        FROM deliveries WHERE id REGEXP '^QP[0-9]+$'
+    """)
+
+
+def next_delivery_ids(cursor, count):
+    """
+    The next count tracking ids (QP + 9 digits), reserved from the delivery counter.
+    Concurrent callers get disjoint ranges: the counter row stays locked until the
+    caller's transaction ends, and a rollback hands the range back. So reserve right
+    before inserting, with nothing slow (pricing, HTTP calls) left before the commit.
+    """
+    cursor.execute("UPDATE id_counters SET value = LAST_INSERT_ID(value + %s) WHERE name = 'delivery'", (count,))
+    cursor.execute("SELECT LAST_INSERT_ID()")
+    last = cursor.fetchone()[0]
+    return [f"QP{n:09d}" for n in range(last - count + 1, last + 1)]
+
+
+def parse_dimension(value):
+    """Parcel height/width in cm, or None when missing or not a number"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_booking(delivery_id, sender_name, sender_address, sender_email, values, data,
+                  total_amount, created_at):
+    """
+    Booking dict for insert_bookings(). values are the cleaned fields from
+    schema.BOOKING.validate(data) (stops, parcelType, parcelWeight, preferredVehicle);
+    parcelOtherSpec, parcelHeight and parcelWidth come from data. The first stop is the
+    primary receiver.
+    """
+    stops = values['stops']
+    first_stop = stops[0]
+    spec = data.get('parcelOtherSpec')
+    return {
+        'id': delivery_id,
+        'sender_name': sender_name,
+        'sender_address': sender_address,
+        'sender_email': sender_email or None,
+        'receiver_name': first_stop.get('receiver_name'),
+        'receiver_address': first_stop.get('drop_address'),
+        'receiver_phone': first_stop.get('receiver_phone'),
+        'parcel_type': values['parcelType'],
+        'parcel_type_specification': (spec.strip() if isinstance(spec, str) else None) or None,
+        'weight': values['parcelWeight'],
+        'parcel_height': parse_dimension(data.get('parcelHeight')),
+        'parcel_width': parse_dimension(data.get('parcelWidth')),
+        'preferred_vehicle': values.get('preferredVehicle'),
+        'status': 'available',
+        'total_stops': len(stops),
+        'total_amount': total_amount,
+        'created_at': created_at,
+        'partner_id': None,
+        'accepted_at': None,
+        'updated_at': None,
+        'delivered_at': None,
+        'stops': stops,
+    }
+
+
+def insert_bookings(cursor, bookings):
+    """Insert bookings from build_booking() with one statement per table (the caller commits)"""
+    cursor.executemany(INSERT_DELIVERY_SQL, [
+        tuple(booking[column] for column in DELIVERY_COLUMNS) for booking in bookings
+    ])
+    cursor.executemany(INSERT_STOP_SQL, [
+        (booking['id'], stop.get('stop_number') or number, stop.get('drop_address'),
+         stop.get('receiver_name'), stop.get('receiver_phone'))
+        for booking in bookings
+        for number, stop in enumerate(booking['stops'], 1)
+    ])
+    record_events(cursor, [
+        event_row(booking['id'], 'created', status='available', payment_status='pending')
+        for booking in bookings
+    ])
+
+
+def booking_response(booking):
+    """The created delivery as returned by /api/deliveries/create"""
+    return {field: booking[field] for field in RESPONSE_FIELDS}
@@ -0,0 +1,164 @@
+"""
+Bulk booking import (POST /api/deliveries/bulk)
+Merchants upload many bookings at once as a CSV file or a JSON array. Every row is
+validated up front against the booking schema (batch_validation.py), all routes are priced
+with one distance lookup per unique leg, and valid rows are inserted in chunks, one
+transaction and one INSERT per table per chunk. The result lists every row with its
+tracking id or its errors.
+
+CSV columns (one booking per line, stops 2-5 optional):
+    receiver_name, drop_address, receiver_phone,
+    stop2_receiver_name, stop2_drop_address, stop2_receiver_phone, ... stop5_*,
+    parcel_type, parcel_weight, parcel_other_spec, parcel_height, parcel_width, preferred_vehicle
+JSON rows use the /api/deliveries/create payload: stops, parcelType, parcelWeight, ...
+"""
+import csv
+import io
+import os
+from datetime import datetime
+
+from mysql.connector import Error
+
+from bookings import build_booking, insert_bookings, next_delivery_ids
+from pricing import calculate_price, calculate_total_distance, lookup_distances, route_legs
+from batch_validation import validate_bookings
+from schema import MAX_STOPS
+
+MAX_BULK_ROWS = int(os.getenv('MAX_BULK_ROWS', '10000'))
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+
+# CSV column -> create_delivery payload key
+CSV_FIELDS = {
+    'parcel_type': 'parcelType',
+    'parcel_weight': 'parcelWeight',
+    'parcel_other_spec': 'parcelOtherSpec',
+    'parcel_height': 'parcelHeight',
+    'parcel_width': 'parcelWidth',
+    'preferred_vehicle': 'preferredVehicle',
+}
+
+
+def _stop_value(stop, key, camel_key):
+    """
+    A stripped stop field; numbers (a phone sent as 9876543210) become text, and other
+    non-string values are left for validation to reject
+    """
+    value = stop.get(key) or stop.get(camel_key) or ''
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def normalize_stop(stop):
+    """A stop dict with snake_case keys (the JSON API also accepts camelCase)"""
+    return {
+        'drop_address': _stop_value(stop, 'drop_address', 'dropAddress'),
+        'receiver_name': _stop_value(stop, 'receiver_name', 'receiverName'),
+        'receiver_phone': _stop_value(stop, 'receiver_phone', 'receiverPhone'),
+    }
+
+
+def row_from_csv(record):
+    """Turn one csv.DictReader record into a create_delivery style row"""
+    record = {(key or '').strip(): (value or '').strip() for key, value in record.items()}
+    stops = []
+    for number in range(1, MAX_STOPS + 1):
+        prefix = '' if number == 1 else f'stop{number}_'
+        stop = {field: record.get(prefix + field, '')
+                for field in ('drop_address', 'receiver_name', 'receiver_phone')}
+        if number == 1 or any(stop.values()):
+            stops.append(stop)
+    row = {key: record.get(column, '') for column, key in CSV_FIELDS.items()}
+    row['stops'] = stops
+    return row
+
+
+def row_from_json(item):
+    """Normalize one element of a JSON upload; anything but an object becomes an empty row"""
+    if not isinstance(item, dict):
+        return {'stops': []}
+    row = dict(item)
+    stops = item.get('stops')
+    row['stops'] = [normalize_stop(stop) if isinstance(stop, dict) else stop
+                    for stop in stops] if isinstance(stops, list) else []
+    return row
+
+
+def rows_from_csv(text):
+    return [row_from_csv(record) for record in csv.DictReader(io.StringIO(text))]
+
+
+def rows_from_json(payload):
+    """Rows of a JSON upload: a bare array, or {"deliveries": [...]}"""
+    if isinstance(payload, dict):
+        payload = payload.get('deliveries')
+    if not isinstance(payload, list):
+        return None
+    return [row_from_json(item) for item in payload]
+
+
+def validate_rows(rows):
+    """
+    The booking schema over every row (batch_validation), with the same errors per row
+    as create_delivery. Returns (results with failures filled in, {row index: cleaned
+    values} for the valid rows).
+    """
+    results = [None] * len(rows)
+    valid, errors = validate_bookings(rows)
+    for index, found in errors.items():
+        results[index] = {'row': index + 1, 'success': False, 'errors': found}
+    return results, valid
+
+
+def price_rows(pickup_address, valid):
+    """{row index: price breakdown}, looking up each distinct leg once for the whole upload"""
+    distances = lookup_distances([leg for values in valid.values()
+                                  for leg in route_legs(pickup_address, values['stops'])])
+    prices = {}
+    for index, values in valid.items():
+        total_distance = calculate_total_distance(pickup_address, values['stops'], distances)
+        prices[index] = calculate_price(total_distance, values['parcelWeight'], len(values['stops']),
+                                        values.get('preferredVehicle'))
+    return prices
+
+
+def insert_rows(conn, sender, rows, valid, prices, results, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert the valid rows ({row index: cleaned values}), chunk_size bookings per transaction. A chunk that fails is
+    rolled back and its rows reported as not saved; the other chunks still go in.
+    """
+    cursor = conn.cursor()
+    indexes = list(valid)
+    for start in range(0, len(indexes), chunk_size):
+        chunk = indexes[start:start + chunk_size]
+        try:
+            created_at = datetime.now().replace(microsecond=0)
+            bookings = [
+                build_booking(delivery_id, sender['name'], sender['address'], sender.get('email'),
+                              valid[index], rows[index], prices[index]['total'], created_at)
+                for index, delivery_id in zip(chunk, next_delivery_ids(cursor, len(chunk)))
+            ]
+            insert_bookings(cursor, bookings)
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            for index in chunk:
+                results[index] = {'row': index + 1, 'success': False, 'errors': [f'Not saved: {e}']}
+            continue
+        for index, booking in zip(chunk, bookings):
+            results[index] = {'row': index + 1, 'success': True, 'delivery_id': booking['id'],
+                              'total_amount': booking['total_amount']}
+    cursor.close()
+
+
+def import_bookings(conn, sender, rows, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Validate, price and insert an upload for sender ({'name', 'address', 'email'}).
+    Returns one result per row, in upload order.
+    """
+    results, valid = validate_rows(rows)
+    prices = price_rows(sender['address'], valid)
+    insert_rows(conn, sender, rows, valid, prices, results, chunk_size)
+    return results
@@ -0,0 +1,127 @@
+"""
+Small in-process caches used by the API handlers
+Each worker process keeps its own copy, so entries also expire on a TTL
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after ttl seconds.
+    delete() leaves a marker for ttl seconds, so a reader that loaded a value before the
+    delete can be kept from caching it afterwards: take generation(key) before loading
+    and pass it to set(), which then skips the write if the key was deleted meanwhile.
+    A non-zero generation also means the key changed within the last ttl seconds.
+    """
+
+    def __init__(self, max_entries=1000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._deleted = OrderedDict()  # key -> (expires_at, generation)
+        self._generations = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Store value; with generation (from generation()), only if key was not deleted since"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and self._generation(key) != generation:
+                return False
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._deleted[key] = (time.monotonic() + self.ttl, next(self._generations))
+            self._deleted.move_to_end(key)
+            while len(self._deleted) > self.max_entries:
+                self._deleted.popitem(last=False)
+
+    def _generation(self, key):
+        entry = self._deleted.get(key)
+        if entry is None:
+            return 0
+        if entry[0] < time.monotonic():
+            del self._deleted[key]
+            return 0
+        return entry[1]
+
+    def generation(self, key):
+        """0, or a number that changes every time key is deleted (for set(generation=...))"""
+        with self._lock:
+            return self._generation(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ChangeNotifier:
+    """
+    Lets request threads wait for a key to change (long polling). Writers call
+    notify(key) after committing; waiters wake at once instead of on their next poll.
+    Only covers this process, so waiters should still recheck at an interval.
+    To not miss a change made while reading, watch the key before reading it:
+        with notifier.watch(key) as changed:
+            value = read(key)
+            if value is unchanged:
+                changed.wait(timeout)  # returns at once if notify(key) came after watch()
+    """
+
+    def __init__(self):
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def wait(self, key, timeout):
+        """Block until notify(key) or timeout; True if notified"""
+        with self.watch(key) as changed:
+            return changed.wait(timeout)
+
+    @contextmanager
+    def watch(self, key):
+        """Register for the next notify(key); yields a threading.Event set by it"""
+        with self._lock:
+            event, waiters = self._events.get(key, (None, 0))
+            if event is None:
+                event = threading.Event()
+            self._events[key] = (event, waiters + 1)
+        try:
+            yield event
+        finally:
+            with self._lock:
+                current, waiters = self._events.get(key, (None, 0))
+                if current is event:
+                    if waiters > 1:
+                        self._events[key] = (event, waiters - 1)
+                    else:
+                        del self._events[key]
+
+    def notify(self, key):
+        with self._lock:
+            event, _ = self._events.pop(key, (None, 0))
+        if event is not None:
+            event.set()
@@ -1,8 +1,6 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-import sys
-sys.stdout.reconfigure(encoding='utf-8')
 
 
 # Get the project root directory (parent of Boxy_local folder)
@@ -28,6 +26,12 @@ else:
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', 'rzp_test_RxIJSv9GAwVvv7')  # Your Razorpay Test Key ID
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', 'bp4ldU7xwM3WLdJL4m7VfYLx')    # Your Razorpay Test Key Secret
 
+# Webhook secret set for the /api/payment/razorpay-webhook endpoint in the Razorpay dashboard
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+
+# Razorpay API base URL (point at a local stand-in for load tests)
+RAZORPAY_API_BASE = os.getenv('RAZORPAY_API_BASE', 'https://api.razorpay.com').rstrip('/')
+
 # Note: Never commit real keys to version control
 # For production, use environment variables in Render dashboard
 
@@ -42,3 +46,5 @@ SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
 SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
 SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'True').lower() == 'true'
+# No encryption at all: only for a local stand-in SMTP server (load tests)
+SMTP_NO_TLS = os.getenv('SMTP_NO_TLS', 'False').lower() == 'true'
@@ -1,5 +1,6 @@
-import sys
-sys.stdout.reconfigure(encoding='utf-8')
+import logging
+
+logger = logging.getLogger(__name__)
 
 try:
     import mysql.connector
@@ -7,31 +8,248 @@ try:
     MYSQL_AVAILABLE = True
 except ImportError:
     MYSQL_AVAILABLE = False
-    print("WARNING: mysql-connector-python not installed. Please run: pip install mysql-connector-python")
+    logger.warning("mysql-connector-python not installed. Please run: pip install mysql-connector-python")
     # Create dummy Error class for type hints
     class Error(Exception):
         pass
 
+import os
+import time
+import itertools
+import threading
 from contextlib import contextmanager
+from flask import has_request_context, session
+import metrics
+import query_stats
+from background import run_in_background
+from delivery_events import create_events_table
+from payments import create_payment_events_table
+from bookings import create_id_counters_table
 
 # Database configuration
 DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'Boxy',
-    'user': 'root',
-    'password': '',  # Default XAMPP MySQL password is empty
-    'port': 3306
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'database': os.getenv('DB_NAME', 'Boxy'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),  # Default XAMPP MySQL password is empty
+    'port': int(os.getenv('DB_PORT', '3306'))
 }
 
-@contextmanager
-def get_db_connection():
-    """Context manager for database connections"""
+def _parse_replicas(spec):
+    """Build replica configs from 'host:port,host:port' (credentials are shared with the primary)"""
+    replicas = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(':')
+        replicas.append(dict(DB_CONFIG, host=host, port=int(port) if port else DB_CONFIG['port']))
+    return replicas
+
+# Read replicas (optional) - e.g. DB_REPLICAS="10.0.0.2:3306,10.0.0.3:3306"
+DB_REPLICAS = _parse_replicas(os.getenv('DB_REPLICAS', ''))
+REPLICA_MAX_LAG_SECONDS = int(os.getenv('DB_REPLICA_MAX_LAG', '5'))
+REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '2'))
+# After a session writes, its reads stay on the primary for this long
+READ_YOUR_WRITES_SECONDS = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '10'))
+LAST_WRITE_SESSION_KEY = 'db_last_write'
+
+_replica_lock = threading.Lock()
+_replica_cycle = itertools.cycle(range(len(DB_REPLICAS))) if DB_REPLICAS else None
+# Per replica: when lag was last checked, and until when it is skipped
+_replica_state = [{'checked_at': 0.0, 'skip_until': 0.0} for _ in DB_REPLICAS]
+
+
+class _TimedCursor:
+    """
+    Cursor wrapper that times each statement (and fetching its rows) for metrics and
+    query_stats, which keeps per-statement timings and logs slow queries
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._last = None
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.record('db', seconds)
+            self._last = query_stats.record(operation, seconds, params, explain=_explain_in_background)
+
+    def executemany(self, operation, seq_params):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params)
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.record('db', seconds)
+            self._last = query_stats.record(operation, seconds, seq_params, many=True)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.record('db', seconds, calls=0)
+            if self._last is not None:
+                query_stats.add_time(self._last, seconds)
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _explain(operation, params):
+    """Log the EXPLAIN plan of a slow statement (own connection, not timed)"""
     conn = None
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
-        yield conn
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"EXPLAIN {operation}", params)
+        query_stats.log_plan(operation, cursor.fetchall())
+    except Error as e:
+        logger.warning("Could not EXPLAIN slow query: %s", e)
+    finally:
+        if conn and conn.is_connected():
+            conn.close()
+
+
+def _explain_in_background(operation, params):
+    run_in_background(_explain, operation, params)
+
+
+class _Connection:
+    """Connection wrapper whose cursors are timed (see metrics.py)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            self._conn.commit()
+        finally:
+            metrics.record('db', time.perf_counter() - start)
+
+    def rollback(self):
+        start = time.perf_counter()
+        try:
+            self._conn.rollback()
+        finally:
+            metrics.record('db', time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _PrimaryConnection(_Connection):
+    """Primary connection wrapper that remembers when the current session committed a write"""
+
+    def commit(self):
+        super().commit()
+        if DB_REPLICAS and has_request_context():
+            session[LAST_WRITE_SESSION_KEY] = time.time()
+
+
+def _session_wrote_recently():
+    """True when this session committed a write that replicas may not have applied yet"""
+    if not has_request_context():
+        return False
+    last_write = session.get(LAST_WRITE_SESSION_KEY)
+    return bool(last_write) and time.time() - last_write < READ_YOUR_WRITES_SECONDS
+
+
+def _replica_lag(conn):
+    """
+    Seconds the replica is behind its source.
+    Returns 0 for a standalone server (no replication configured) and None if replication is broken.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except Error:
+            # MySQL < 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+        row = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    if not row:
+        return 0
+    if 'Seconds_Behind_Source' in row:
+        return row['Seconds_Behind_Source']
+    return row.get('Seconds_Behind_Master')
+
+
+def _connect_replica():
+    """Open a connection to the next healthy replica, or return None to fall back to the primary"""
+    for _ in range(len(DB_REPLICAS)):
+        with _replica_lock:
+            index = next(_replica_cycle)
+        state = _replica_state[index]
+        now = time.monotonic()
+        if state['skip_until'] > now:
+            continue
+        conn = None
+        try:
+            conn = mysql.connector.connect(**DB_REPLICAS[index])
+            if now - state['checked_at'] >= REPLICA_CHECK_INTERVAL:
+                lag = _replica_lag(conn)
+                state['checked_at'] = now
+                if lag is None or lag > REPLICA_MAX_LAG_SECONDS:
+                    logger.warning("Replica %s lagging (%ss), using primary", DB_REPLICAS[index]['host'], lag)
+                    state['skip_until'] = now + REPLICA_CHECK_INTERVAL
+                    conn.close()
+                    continue
+            return conn
+        except Error as e:
+            logger.warning("Replica connection error (%s): %s", DB_REPLICAS[index]['host'], e)
+            state['skip_until'] = now + REPLICA_CHECK_INTERVAL
+            if conn and conn.is_connected():
+                conn.close()
+    return None
+
+
+@contextmanager
+def get_db_connection(readonly=False):
+    """
+    Context manager for database connections.
+    readonly=True routes the connection to a read replica when one is configured, healthy and
+    not lagging, unless the current session wrote recently; otherwise it uses the primary.
+    """
+    conn = None
+    try:
+        start = time.perf_counter()
+        try:
+            if readonly and DB_REPLICAS and not _session_wrote_recently():
+                conn = _connect_replica()
+            primary = conn is None
+            if primary:
+                conn = mysql.connector.connect(**DB_CONFIG)
+        finally:
+            metrics.record('db_connect', time.perf_counter() - start)
+        yield _PrimaryConnection(conn) if primary else _Connection(conn)
     except Error as e:
-        print(f"Database connection error: {e}")
+        logger.warning("Database connection error: %s", e)
         raise
     finally:
         if conn and conn.is_connected():
@@ -69,6 +287,7 @@ def init_database():
                     id VARCHAR(20) PRIMARY KEY,
                     sender_name VARCHAR(100) NOT NULL,
                     sender_address TEXT NOT NULL,
+                    sender_email VARCHAR(100) NULL,
                     receiver_name VARCHAR(100) NOT NULL,
                     receiver_address TEXT NOT NULL,
                     receiver_phone VARCHAR(20) NOT NULL,
@@ -77,6 +296,7 @@ def init_database():
                     status ENUM('available', 'accepted', 'picked', 'on_the_way', 'delivered', 'completed') DEFAULT 'available',
                     partner_id VARCHAR(20) NULL,
                     total_stops INT DEFAULT 1,
+                    delivered_stops INT DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     accepted_at TIMESTAMP NULL,
                     updated_at TIMESTAMP NULL,
@@ -84,10 +304,13 @@ def init_database():
                     total_amount DECIMAL(10,2) DEFAULT 0.00,
                     payment_status ENUM('pending', 'paid', 'pending_cash') DEFAULT 'pending',
                     payment_method ENUM('online', 'cash') NULL,
+                    razorpay_order_id VARCHAR(50) NULL,
                     FOREIGN KEY (partner_id) REFERENCES partners(id) ON DELETE SET NULL,
                     INDEX idx_status (status),
                     INDEX idx_partner (partner_id),
-                    INDEX idx_payment_status (payment_status)
+                    INDEX idx_payment_status (payment_status),
+                    INDEX idx_status_payment (status, payment_status),
+                    INDEX idx_razorpay_order (razorpay_order_id)
                 )
             """)
             
@@ -110,6 +333,16 @@ def init_database():
                 )
             """)
             
+            # Create delivery_events table (append-only status/payment history)
+            create_events_table(cursor)
+            
+            # Create payment_events table (one row per Razorpay payment, for idempotent ingestion)
+            create_payment_events_table(cursor)
+            
+            # Create id_counters table (tracking ids reserved without collisions)
+            create_id_counters_table(cursor)
+            conn.commit()
+            
             # Check and add missing columns to existing tables (migrations)
             # Add total_stops column if it doesn't exist
             try:
@@ -117,13 +350,31 @@ def init_database():
                 if not cursor.fetchone():
                     cursor.execute("ALTER TABLE deliveries ADD COLUMN total_stops INT DEFAULT 1 AFTER partner_id")
                     conn.commit()
-                    print(" Added 'total_stops' column to deliveries table")
+                    logger.info("Added 'total_stops' column to deliveries table")
                 else:
-                    print(" Column 'total_stops' already exists in deliveries table")
+                    logger.info("Column 'total_stops' already exists in deliveries table")
             except Error as e:
                 # If table doesn't exist yet, that's okay - it will be created above
                 if "doesn't exist" not in str(e).lower():
-                    print(f"Note: Could not check/add total_stops column: {e}")
+                    logger.warning("Note: Could not check/add total_stops column: %s", e)
+            
+            # Add delivered_stops counter (maintained by delivery_state.deliver_stop) and backfill it
+            try:
+                cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'delivered_stops'")
+                if not cursor.fetchone():
+                    cursor.execute("ALTER TABLE deliveries ADD COLUMN delivered_stops INT DEFAULT 0 AFTER total_stops")
+                    cursor.execute("""
+                        UPDATE deliveries d
+                        SET d.delivered_stops = (
+                            SELECT COUNT(*) FROM delivery_stops s
+                            WHERE s.booking_id = d.id AND s.status = 'delivered'
+                        )
+                    """)
+                    conn.commit()
+                    logger.info("Added 'delivered_stops' column to deliveries table")
+            except Error as e:
+                if "doesn't exist" not in str(e).lower():
+                    logger.warning("Note: Could not check/add delivered_stops column: %s", e)
             
             # Add payment columns if they don't exist
             try:
@@ -133,33 +384,75 @@ def init_database():
                     try:
                         cursor.execute("ALTER TABLE deliveries ADD COLUMN total_amount DECIMAL(10,2) DEFAULT 0.00 AFTER delivered_at")
                         conn.commit()
-                        print("✓ Added 'total_amount' column")
+                        logger.info("Added 'total_amount' column")
                     except Error as e:
                         if "Duplicate column name" not in str(e):
-                            print(f"Note adding total_amount: {e}")
+                            logger.warning("Note adding total_amount: %s", e)
                     
                     try:
                         cursor.execute("ALTER TABLE deliveries ADD COLUMN payment_status ENUM('pending', 'paid', 'pending_cash') DEFAULT 'pending' AFTER total_amount")
                         conn.commit()
-                        print("✓ Added 'payment_status' column")
+                        logger.info("Added 'payment_status' column")
                     except Error as e:
                         if "Duplicate column name" not in str(e):
-                            print(f"Note adding payment_status: {e}")
+                            logger.warning("Note adding payment_status: %s", e)
                     
                     try:
                         cursor.execute("ALTER TABLE deliveries ADD COLUMN payment_method ENUM('online', 'cash') NULL DEFAULT NULL AFTER payment_status")
                         conn.commit()
-                        print("✓ Added 'payment_method' column")
+                        logger.info("Added 'payment_method' column")
                     except Error as e:
                         if "Duplicate column name" not in str(e):
-                            print(f"Note adding payment_method: {e}")
+                            logger.warning("Note adding payment_method: %s", e)
                     
-                    print("✓ Added payment columns to deliveries table")
+                    logger.info("Added payment columns to deliveries table")
                 else:
-                    print("✓ Payment columns already exist in deliveries table")
+                    logger.info("Payment columns already exist in deliveries table")
             except Error as e:
                 if "doesn't exist" not in str(e).lower():
-                    print(f"Note: Could not check/add payment columns: {e}")
+                    logger.warning("Note: Could not check/add payment columns: %s", e)
+            
+            # Add sender_email column (booking confirmation emails) if it doesn't exist
+            try:
+                cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'sender_email'")
+                if not cursor.fetchone():
+                    cursor.execute("ALTER TABLE deliveries ADD COLUMN sender_email VARCHAR(100) NULL AFTER sender_address")
+                    conn.commit()
+                    logger.info("Added 'sender_email' to deliveries table")
+            except Error as e:
+                if "Duplicate column name" not in str(e):
+                    logger.warning("Note adding sender_email: %s", e)
+            
+            # Add razorpay_order_id (order created in the background when the delivery is delivered)
+            try:
+                cursor.execute("SHOW COLUMNS FROM deliveries LIKE 'razorpay_order_id'")
+                if not cursor.fetchone():
+                    cursor.execute("ALTER TABLE deliveries ADD COLUMN razorpay_order_id VARCHAR(50) NULL AFTER payment_method")
+                    conn.commit()
+                    logger.info("Added 'razorpay_order_id' to deliveries table")
+            except Error as e:
+                if "Duplicate column name" not in str(e):
+                    logger.warning("Note adding razorpay_order_id: %s", e)
+            
+            # Index for the payment reconciliation scan (delivered + pending, walked by id)
+            try:
+                cursor.execute("SHOW INDEX FROM deliveries WHERE Key_name = 'idx_status_payment'")
+                if not cursor.fetchall():
+                    cursor.execute("CREATE INDEX idx_status_payment ON deliveries (status, payment_status)")
+                    conn.commit()
+                    logger.info("Added 'idx_status_payment' index to deliveries table")
+            except Error as e:
+                logger.warning("Note adding idx_status_payment: %s", e)
+            
+            # Index for webhooks that name only the order (delivery found by its order id)
+            try:
+                cursor.execute("SHOW INDEX FROM deliveries WHERE Key_name = 'idx_razorpay_order'")
+                if not cursor.fetchall():
+                    cursor.execute("CREATE INDEX idx_razorpay_order ON deliveries (razorpay_order_id)")
+                    conn.commit()
+                    logger.info("Added 'idx_razorpay_order' index to deliveries table")
+            except Error as e:
+                logger.warning("Note adding idx_razorpay_order: %s", e)
             
             # Add parcel details columns (specification, dimensions, preferred vehicle) if they don't exist
             for col_name, col_def in [
@@ -173,10 +466,10 @@ def init_database():
                     if not cursor.fetchone():
                         cursor.execute(f"ALTER TABLE deliveries ADD COLUMN {col_name} {col_def} AFTER weight")
                         conn.commit()
-                        print(f" Added '{col_name}' to deliveries table")
+                        logger.info("Added '%s' to deliveries table", col_name)
                 except Error as e:
                     if "Duplicate column name" not in str(e):
-                        print(f"Note adding {col_name}: {e}")
+                        logger.warning("Note adding %s: %s", col_name, e)
             
             # Check and update status ENUM to include 'completed' if it doesn't
             try:
@@ -199,12 +492,12 @@ def init_database():
                             DEFAULT 'available'
                         """)
                         conn.commit()
-                        print("✓ Updated status ENUM to include 'completed'")
+                        logger.info("Updated status ENUM to include 'completed'")
                     else:
-                        print("✓ Status ENUM already includes 'completed'")
+                        logger.info("Status ENUM already includes 'completed'")
             except Error as e:
                 if "doesn't exist" not in str(e).lower():
-                    print(f"Note: Could not check/update status ENUM: {e}")
+                    logger.warning("Note: Could not check/update status ENUM: %s", e)
             
             # Create customers table
             cursor.execute("""
@@ -235,7 +528,7 @@ def init_database():
                 if result:
                     data_type = result[0] if isinstance(result, tuple) else result.get('DATA_TYPE', '')
                     if data_type in ['int', 'bigint', 'integer']:
-                        print("⚠️ Found customers.id as integer type, migrating to VARCHAR...")
+                        logger.warning("Found customers.id as integer type, migrating to VARCHAR...")
                         
                         # Check if table has any data
                         cursor.execute("SELECT COUNT(*) as count FROM customers")
@@ -243,7 +536,7 @@ def init_database():
                         row_count = count_result[0] if isinstance(count_result, tuple) else count_result.get('count', 0)
                         
                         if row_count > 0:
-                            print(f"⚠️ Table has {row_count} rows. Converting integer IDs to VARCHAR format...")
+                            logger.warning("Table has %s rows. Converting integer IDs to VARCHAR format...", row_count)
                             # Get all rows and update IDs
                             cursor.execute("SELECT * FROM customers")
                             rows = cursor.fetchall()
@@ -284,25 +577,25 @@ def init_database():
                             # Drop old table and rename new one
                             cursor.execute("DROP TABLE customers")
                             cursor.execute("RENAME TABLE customers_temp TO customers")
-                            print(f"✓ Successfully migrated {row_count} customer records to VARCHAR IDs")
+                            logger.info("Successfully migrated %s customer records to VARCHAR IDs", row_count)
                         else:
                             # No data, just alter the column
                             try:
                                 cursor.execute("ALTER TABLE customers DROP PRIMARY KEY")
                             except Error as e:
                                 if "doesn't exist" not in str(e).lower():
-                                    print(f"Note: Could not drop primary key: {e}")
+                                    logger.warning("Note: Could not drop primary key: %s", e)
                             
                             cursor.execute("ALTER TABLE customers MODIFY COLUMN id VARCHAR(20) NOT NULL")
                             cursor.execute("ALTER TABLE customers ADD PRIMARY KEY (id)")
-                            print("✓ Successfully migrated customers.id to VARCHAR(20)")
+                            logger.info("Successfully migrated customers.id to VARCHAR(20)")
                         
                         conn.commit()
                     else:
-                        print("✓ customers.id column type is correct (VARCHAR)")
+                        logger.info("customers.id column type is correct (VARCHAR)")
             except Error as e:
                 if "doesn't exist" not in str(e).lower():
-                    print(f"Note: Could not check/fix customers.id column type: {e}")
+                    logger.warning("Note: Could not check/fix customers.id column type: %s", e)
             
             # Create password_reset_tokens table (stores OTP)
             cursor.execute("""
@@ -342,14 +635,14 @@ def init_database():
                 if not cursor.fetchone():
                     cursor.execute("ALTER TABLE password_reset_tokens ADD COLUMN otp VARCHAR(4) NULL AFTER token")
                     conn.commit()
-                    print("✓ Added 'otp' column to password_reset_tokens table")
+                    logger.info("Added 'otp' column to password_reset_tokens table")
             except Error as e:
                 if "doesn't exist" not in str(e).lower():
-                    print(f"Note: Could not check/add otp column: {e}")
+                    logger.warning("Note: Could not check/add otp column: %s", e)
             
             conn.commit()
-            print("✓ Database tables initialized successfully!")
+            logger.info("Database tables initialized successfully!")
             
     except Error as e:
-        print(f"Error initializing database: {e}")
+        logger.error("Error initializing database: %s", e)
 
@@ -28,14 +28,20 @@ CREATE TABLE IF NOT EXISTS deliveries (
     id VARCHAR(20) PRIMARY KEY,
     sender_name VARCHAR(100) NOT NULL,
     sender_address TEXT NOT NULL,
+    sender_email VARCHAR(100) NULL,
     receiver_name VARCHAR(100) NOT NULL,
     receiver_address TEXT NOT NULL,
     receiver_phone VARCHAR(20) NOT NULL,
     parcel_type VARCHAR(50) NOT NULL,
     weight DECIMAL(5,2) NOT NULL,
+    parcel_type_specification TEXT NULL,
+    parcel_height DECIMAL(5,2) NULL,
+    parcel_width DECIMAL(5,2) NULL,
+    preferred_vehicle VARCHAR(20) NULL,
     status ENUM('available', 'accepted', 'picked', 'on_the_way', 'delivered', 'completed') DEFAULT 'available',
     partner_id VARCHAR(20) NULL,
     total_stops INT DEFAULT 1,
+    delivered_stops INT DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     accepted_at TIMESTAMP NULL,
     updated_at TIMESTAMP NULL ON UPDATE CURRENT_TIMESTAMP,
@@ -43,10 +49,13 @@ CREATE TABLE IF NOT EXISTS deliveries (
     total_amount DECIMAL(10,2) DEFAULT 0.00,
     payment_status ENUM('pending', 'paid', 'pending_cash') DEFAULT 'pending',
     payment_method ENUM('online', 'cash') NULL,
+    razorpay_order_id VARCHAR(50) NULL,
     FOREIGN KEY (partner_id) REFERENCES partners(id) ON DELETE SET NULL,
     INDEX idx_status (status),
     INDEX idx_partner (partner_id),
-    INDEX idx_payment_status (payment_status)
+    INDEX idx_payment_status (payment_status),
+    INDEX idx_status_payment (status, payment_status),
+    INDEX idx_razorpay_order (razorpay_order_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Delivery Stops Table (Multi-Stop Feature)
@@ -66,3 +75,39 @@ CREATE TABLE IF NOT EXISTS delivery_stops (
     UNIQUE KEY unique_stop (booking_id, stop_number)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Delivery Events Table (append-only status and payment history)
+CREATE TABLE IF NOT EXISTS delivery_events (
+    seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tracking_id VARCHAR(20) NOT NULL,
+    event_type VARCHAR(30) NOT NULL,
+    status VARCHAR(20) NULL,
+    payment_status VARCHAR(20) NULL,
+    partner_id VARCHAR(20) NULL,
+    stop_number INT NULL,
+    details VARCHAR(255) NULL,
+    created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_tracking_seq (tracking_id, seq),
+    INDEX idx_type_created (event_type, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Payment Events Table (one row per Razorpay payment; makes webhook/callback ingestion idempotent)
+CREATE TABLE IF NOT EXISTS payment_events (
+    payment_id VARCHAR(50) PRIMARY KEY,
+    tracking_id VARCHAR(20) NOT NULL,
+    order_id VARCHAR(50) NULL,
+    event_id VARCHAR(50) NULL,
+    source VARCHAR(20) NOT NULL,
+    amount INT NULL,
+    status ENUM('received', 'applied', 'ignored') DEFAULT 'received',
+    received_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+    applied_at TIMESTAMP(3) NULL,
+    INDEX idx_tracking (tracking_id),
+    INDEX idx_status_received (status, received_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Id Counters Table (next tracking id; reserved with LAST_INSERT_ID(value + n))
+CREATE TABLE IF NOT EXISTS id_counters (
+    name VARCHAR(30) PRIMARY KEY,
+    value BIGINT NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+INSERT IGNORE INTO id_counters (name, value) VALUES ('delivery', 0);
@@ -0,0 +1,101 @@
+"""
+Append-only delivery event log
+Every status or payment change inserts a row into delivery_events using the same
+cursor (and therefore the same transaction) as the change itself. Rows are never
+updated or deleted; seq is a global, ever-increasing sequence number.
+
+seq is taken at INSERT but transactions commit in their own order, so a lower seq can
+become visible after a higher one. Delta sync (get_events_since) therefore only serves
+events older than EVENT_SYNC_SETTLE_SECONDS: by then the transactions that wrote them
+have committed, and no lower seq can still appear behind a client's cursor.
+"""
+import os
+
+# Longer than any transaction that records an event is expected to stay open
+EVENT_SYNC_SETTLE_SECONDS = int(os.getenv('EVENT_SYNC_SETTLE_SECONDS', '5'))
+
+INSERT_EVENT_SQL = """
+    INSERT INTO delivery_events (tracking_id, event_type, status, payment_status,
+                                 partner_id, stop_number, details)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def create_events_table(cursor):
+    """Create the delivery_events table (called from init_database)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_events (
+            seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+            tracking_id VARCHAR(20) NOT NULL,
+            event_type VARCHAR(30) NOT NULL,
+            status VARCHAR(20) NULL,
+            payment_status VARCHAR(20) NULL,
+            partner_id VARCHAR(20) NULL,
+            stop_number INT NULL,
+            details VARCHAR(255) NULL,
+            created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+            INDEX idx_tracking_seq (tracking_id, seq),
+            INDEX idx_type_created (event_type, created_at)
+        )
+    """)
+
+
+def event_row(tracking_id, event_type, status=None, payment_status=None,
+              partner_id=None, stop_number=None, details=None):
+    """Build the parameter tuple for one event"""
+    return (tracking_id, event_type, status, payment_status, partner_id, stop_number, details)
+
+
+def record_event(cursor, tracking_id, event_type, **fields):
+    """
+    Append one event. Must be called before the surrounding transaction commits.
+    Example: record_event(cursor, delivery_id, 'accepted', status='accepted', partner_id=partner_id)
+    """
+    cursor.execute(INSERT_EVENT_SQL, event_row(tracking_id, event_type, **fields))
+
+
+def record_events(cursor, rows):
+    """Append many events (tuples from event_row) with a single executemany"""
+    if rows:
+        cursor.executemany(INSERT_EVENT_SQL, rows)
+
+
+def get_timeline(cursor, tracking_id):
+    """All events of one delivery in order (uses idx_tracking_seq). Needs a dictionary cursor."""
+    cursor.execute("""
+        SELECT seq, event_type, status, payment_status, partner_id, stop_number, details, created_at
+        FROM delivery_events
+        WHERE tracking_id = %s
+        ORDER BY seq
+    """, (tracking_id,))
+    return cursor.fetchall()
+
+
+def get_events_since(cursor, since_seq, limit=500, settle_seconds=EVENT_SYNC_SETTLE_SECONDS):
+    """
+    Events after a sequence number, for clients that sync changes incrementally. Only
+    events at least settle_seconds old are returned (see the module docstring), so newer
+    ones arrive on a later call instead of being skipped. Read from the primary: a
+    replica's own lag would add to the time a late commit takes to show up.
+    """
+    cursor.execute("""
+        SELECT seq, tracking_id, event_type, status, payment_status, partner_id,
+               stop_number, details, created_at
+        FROM delivery_events
+        WHERE seq > %s AND created_at <= NOW(3) - INTERVAL %s SECOND
+        ORDER BY seq
+        LIMIT %s
+    """, (since_seq, settle_seconds, limit))
+    return cursor.fetchall()
+
+
+def get_event_counts(cursor, since):
+    """Number of events per type and day since a datetime (uses idx_type_created)"""
+    cursor.execute("""
+        SELECT event_type, DATE(created_at) AS day, COUNT(*) AS events
+        FROM delivery_events
+        WHERE created_at >= %s
+        GROUP BY event_type, DATE(created_at)
+        ORDER BY day, event_type
+    """, (since,))
+    return cursor.fetchall()
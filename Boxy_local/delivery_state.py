@@ -0,0 +1,249 @@
+"""
+Delivery state machine
+    available -> accepted -> picked -> on_the_way -> delivered -> completed
+
+Every status change goes through this module. A transition is a single conditional
+UPDATE whose WHERE clause carries all of its rules (current status, owner, stops,
+payment state), so the success path needs no reads: rowcount 1 means the transition
+happened, 0 means it was not allowed. Only then does explain_rejection() read the
+row to tell the caller why. Each transition also appends its delivery event.
+"""
+from delivery_events import record_event
+
+STATUSES = ('available', 'accepted', 'picked', 'on_the_way', 'delivered', 'completed')
+
+# Target status -> statuses it can be reached from
+TRANSITIONS = {
+    'accepted': ('available',),
+    'picked': ('accepted',),
+    'on_the_way': ('picked',),
+    'delivered': ('on_the_way',),
+    'completed': ('delivered',),
+}
+
+# Statuses a partner may set through /api/partner/update-status
+PARTNER_STATUSES = ('picked', 'on_the_way', 'delivered')
+
+# A multi-stop booking becomes delivered when its last stop is, on whichever leg that happens
+STOP_COMPLETION_FROM = ('accepted', 'picked', 'on_the_way')
+
+# Payment method -> payment_status the delivery must be in to be paid that way
+PAYABLE_FROM = {
+    'online': 'pending',
+    'cash': 'pending_cash',
+}
+
+
+def can_transition(current_status, new_status):
+    """True if the state machine allows current_status -> new_status"""
+    return current_status in TRANSITIONS.get(new_status, ())
+
+
+def _in_list(values):
+    return ', '.join(f"'{value}'" for value in values)
+
+
+_ACCEPT_SQL = f"""
+    UPDATE deliveries d
+    JOIN partners p ON p.id = %s
+    SET d.partner_id = p.id, d.status = 'accepted', d.accepted_at = NOW()
+    WHERE d.id = %s
+      AND d.status IN ({_in_list(TRANSITIONS['accepted'])})
+      AND p.status = 'online'
+      AND (COALESCE(d.preferred_vehicle, '') = ''
+           OR LOWER(TRIM(d.preferred_vehicle)) = LOWER(TRIM(p.vehicle_type)))
+"""
+
+# Multi-stop bookings can only be marked delivered once every stop is. delivered_stops is
+# kept in step with delivery_stops by deliver_stop(), so this needs no aggregate over stops.
+_ALL_STOPS_DELIVERED = "(total_stops <= 1 OR delivered_stops >= total_stops)"
+
+_PARTNER_UPDATE_SQL = {
+    'picked': f"""
+        UPDATE deliveries SET status = 'picked', updated_at = NOW()
+        WHERE id = %s AND partner_id = %s AND status IN ({_in_list(TRANSITIONS['picked'])})
+    """,
+    'on_the_way': f"""
+        UPDATE deliveries SET status = 'on_the_way', updated_at = NOW()
+        WHERE id = %s AND partner_id = %s AND status IN ({_in_list(TRANSITIONS['on_the_way'])})
+    """,
+    'delivered': f"""
+        UPDATE deliveries
+        SET status = 'delivered', updated_at = NOW(), delivered_at = NOW(), payment_status = 'pending'
+        WHERE id = %s AND partner_id = %s AND status IN ({_in_list(TRANSITIONS['delivered'])})
+          AND {_ALL_STOPS_DELIVERED}
+    """,
+}
+
+_STOP_COMPLETION_SQL = f"""
+    UPDATE deliveries
+    SET status = 'delivered', updated_at = NOW(), delivered_at = NOW(), payment_status = 'pending'
+    WHERE id = %s AND status IN ({_in_list(STOP_COMPLETION_FROM)})
+      AND {_ALL_STOPS_DELIVERED}
+"""
+
+_PAYMENT_SQL = {
+    'online': f"""
+        UPDATE deliveries
+        SET status = 'completed', payment_status = 'paid', payment_method = 'online'
+        WHERE id = %s AND status IN ({_in_list(TRANSITIONS['completed'])})
+          AND payment_status = '{PAYABLE_FROM['online']}'
+    """,
+    'cash': f"""
+        UPDATE deliveries
+        SET status = 'completed', payment_status = 'paid'
+        WHERE id = %s AND partner_id = %s AND status IN ({_in_list(TRANSITIONS['completed'])})
+          AND payment_method = 'cash' AND payment_status = '{PAYABLE_FROM['cash']}'
+    """,
+}
+
+
+def accept(cursor, delivery_id, partner_id):
+    """available -> accepted. The partner must be online and drive the preferred vehicle, if any."""
+    cursor.execute(_ACCEPT_SQL, (partner_id, delivery_id))
+    if cursor.rowcount != 1:
+        return False
+    record_event(cursor, delivery_id, 'accepted', status='accepted', partner_id=partner_id)
+    return True
+
+
+def advance(cursor, delivery_id, partner_id, new_status):
+    """Move a partner's delivery one step forward (picked, on_the_way or delivered)"""
+    if new_status not in _PARTNER_UPDATE_SQL:
+        raise ValueError(f"Partners cannot set status '{new_status}'")
+    cursor.execute(_PARTNER_UPDATE_SQL[new_status], (delivery_id, partner_id))
+    if cursor.rowcount != 1:
+        return False
+    record_event(cursor, delivery_id, new_status, status=new_status, partner_id=partner_id,
+                 payment_status='pending' if new_status == 'delivered' else None)
+    return True
+
+
+def complete_stops(cursor, delivery_id, partner_id=None):
+    """
+    Mark a multi-stop booking delivered once all its stops are. The row lock taken by
+    deliver_stop() serializes concurrent stop completions, so exactly one caller sees
+    delivered_stops reach total_stops and gets rowcount 1 here.
+    """
+    cursor.execute(_STOP_COMPLETION_SQL, (delivery_id,))
+    if cursor.rowcount != 1:
+        return False
+    record_event(cursor, delivery_id, 'delivered', status='delivered',
+                 payment_status='pending', partner_id=partner_id)
+    return True
+
+
+def deliver_stop(cursor, delivery_id, stop_number, partner_id):
+    """
+    Mark one pending stop of the partner's booking delivered.
+    Returns (stop_delivered, booking_delivered); booking_delivered is True only for the call
+    that delivered the last pending stop.
+    """
+    # Stop and counter change in one statement, which also locks the booking row
+    cursor.execute("""
+        UPDATE delivery_stops s
+        JOIN deliveries d ON d.id = s.booking_id
+        SET s.status = 'delivered', s.delivered_at = NOW(),
+            d.delivered_stops = d.delivered_stops + 1
+        WHERE s.booking_id = %s AND s.stop_number = %s AND s.status = 'pending' AND d.partner_id = %s
+    """, (delivery_id, stop_number, partner_id))
+    if cursor.rowcount == 0:
+        return False, False
+    record_event(cursor, delivery_id, 'stop_delivered', partner_id=partner_id, stop_number=stop_number)
+    return True, complete_stops(cursor, delivery_id, partner_id)
+
+
+def explain_stop_rejection(cursor, delivery_id, stop_number, partner_id):
+    """Why deliver_stop() refused. Needs a dictionary cursor. Returns (message, http_status)."""
+    cursor.execute("""
+        SELECT d.partner_id, s.status
+        FROM deliveries d
+        LEFT JOIN delivery_stops s ON s.booking_id = d.id AND s.stop_number = %s
+        WHERE d.id = %s
+    """, (stop_number, delivery_id))
+    row = cursor.fetchone()
+    if not row or row['partner_id'] != partner_id:
+        return 'Unauthorized', 403
+    if row['status'] is None:
+        return 'Stop not found', 404
+    return 'Stop already delivered', 400
+
+
+def select_cash(cursor, delivery_id):
+    """Customer picks Cash on Delivery for a delivered, unpaid booking (payment_status -> pending_cash)"""
+    cursor.execute(f"""
+        UPDATE deliveries
+        SET payment_method = 'cash', payment_status = '{PAYABLE_FROM['cash']}'
+        WHERE id = %s AND status = 'delivered' AND payment_status = '{PAYABLE_FROM['online']}'
+    """, (delivery_id,))
+    if cursor.rowcount != 1:
+        return False
+    record_event(cursor, delivery_id, 'cod_selected', payment_status='pending_cash', details='cash')
+    return True
+
+
+def complete_payment(cursor, delivery_id, payment_method, partner_id=None, details=None):
+    """
+    delivered -> completed once paid. Online payments need payment_status 'pending';
+    cash needs the COD selection ('pending_cash') and the delivery's own partner.
+    """
+    if payment_method == 'cash':
+        cursor.execute(_PAYMENT_SQL['cash'], (delivery_id, partner_id))
+    else:
+        cursor.execute(_PAYMENT_SQL['online'], (delivery_id,))
+    if cursor.rowcount != 1:
+        return False
+    record_event(cursor, delivery_id, 'paid', status='completed', payment_status='paid',
+                 partner_id=partner_id, details=details or payment_method)
+    return True
+
+
+def explain_rejection(cursor, delivery_id, new_status, partner_id=None, payment_method=None):
+    """
+    Called only after a transition was refused; reads the row to explain why.
+    Needs a dictionary cursor. Returns (message, http_status).
+    """
+    cursor.execute("""
+        SELECT status, partner_id, total_stops, preferred_vehicle, payment_status, payment_method
+        FROM deliveries WHERE id = %s
+    """, (delivery_id,))
+    delivery = cursor.fetchone()
+
+    if not delivery:
+        return 'Delivery not found', 404
+
+    if new_status == 'accepted':
+        if delivery['status'] != 'available':
+            return 'Delivery is no longer available', 400
+        cursor.execute("SELECT status, vehicle_type FROM partners WHERE id = %s", (partner_id,))
+        partner = cursor.fetchone()
+        if not partner or partner['status'] != 'online':
+            return 'You must be online to accept deliveries', 400
+        pref_vehicle = (delivery['preferred_vehicle'] or '').strip().lower()
+        if pref_vehicle and pref_vehicle != (partner['vehicle_type'] or '').strip().lower():
+            return f'This delivery is for {pref_vehicle} only. Your vehicle type does not match.', 400
+        # Nothing wrong with this partner: another one took it first
+        return 'Delivery is no longer available', 400
+
+    if new_status == 'completed':
+        if payment_method == 'cash':
+            if delivery['partner_id'] != partner_id:
+                return 'Unauthorized', 403
+            if delivery['payment_method'] != 'cash':
+                return 'Not a cash payment', 400
+        if delivery['payment_status'] == 'paid':
+            return 'Payment already processed', 400
+        if delivery['status'] != 'delivered':
+            return 'Delivery not yet completed', 400
+        return 'Payment is not pending for this delivery', 400
+
+    if partner_id and delivery['partner_id'] != partner_id:
+        return 'Unauthorized', 403
+
+    if not can_transition(delivery['status'], new_status):
+        return f"Cannot change status from '{delivery['status']}' to '{new_status}'", 400
+
+    if new_status == 'delivered':
+        return 'All stops must be delivered first', 400
+
+    return 'Status could not be updated', 409
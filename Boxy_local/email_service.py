@@ -2,11 +2,13 @@
 Email service module for sending automated emails via SMTP
 """
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from flask import render_template_string
-from config import SMTP_EMAIL, SMTP_PASSWORD, SMTP_SERVER, SMTP_PORT, SMTP_USE_TLS
+from config import SMTP_EMAIL, SMTP_PASSWORD, SMTP_SERVER, SMTP_PORT, SMTP_USE_TLS, SMTP_NO_TLS
 import logging
+import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -25,15 +27,13 @@ def send_email(to_email, subject, html_body, text_body=None):
     """
     # Skip if SMTP not configured
     if not SMTP_EMAIL or not SMTP_PASSWORD:
-        print("⚠️ WARNING: SMTP not configured. Email not sent.")
-        print(f"   SMTP_EMAIL: {'SET' if SMTP_EMAIL else 'NOT SET'}")
-        print(f"   SMTP_PASSWORD: {'SET' if SMTP_PASSWORD else 'NOT SET'}")
-        logger.warning("SMTP not configured. Email not sent.")
+        logger.warning("SMTP not configured. Email not sent. SMTP_EMAIL: %s, SMTP_PASSWORD: %s",
+                       'SET' if SMTP_EMAIL else 'NOT SET', 'SET' if SMTP_PASSWORD else 'NOT SET')
         return False
     
     # Skip if recipient email is empty
     if not to_email or not to_email.strip():
-        logger.warning(f"Recipient email is empty. Email not sent.")
+        logger.warning("Recipient email is empty. Email not sent.")
         return False
     
     try:
@@ -52,21 +52,27 @@ def send_email(to_email, subject, html_body, text_body=None):
         msg.attach(html_part)
         
         # Connect to SMTP server and send
-        if SMTP_USE_TLS:
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            server.starttls()
-        else:
-            server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
+        start = time.perf_counter()
+        try:
+            if SMTP_NO_TLS:
+                server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+            elif SMTP_USE_TLS:
+                server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+                server.starttls()
+            else:
+                server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
+            
+            server.login(SMTP_EMAIL, SMTP_PASSWORD)
+            server.send_message(msg)
+            server.quit()
+        finally:
+            metrics.record('smtp', time.perf_counter() - start)
         
-        server.login(SMTP_EMAIL, SMTP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        
-        logger.info(f"Email sent successfully to {to_email}")
+        logger.info("Email sent successfully to %s", to_email)
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {str(e)}")
+        logger.error("Failed to send email to %s: %s", to_email, e)
         return False
 
 def send_confirmation_email(to_email, tracking_id, sender_name, receiver_name, 
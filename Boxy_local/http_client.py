@@ -0,0 +1,145 @@
+"""
+Shared outbound HTTP client (Razorpay, Google Distance Matrix)
+One requests.Session for the whole process: urllib3 keeps a keep-alive connection
+pool per host, so repeated calls skip the TCP and TLS handshakes. Every call has
+explicit connect/read timeouts. Idempotent calls are retried on connection errors,
+timeouts and 429/5xx answers, with exponential backoff and full jitter; other calls
+only when the connection could not be opened (nothing was sent). Latency is recorded
+per host for host_stats() and reported to metrics.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', '10'))
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.2'))
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Latency samples kept per host for percentiles
+LATENCY_SAMPLES = 1000
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = _make_session()
+_stats_lock = threading.Lock()
+_host_stats = {}
+
+
+def _record(host, seconds, status=None, error=None):
+    metrics.record('http', seconds)
+    with _stats_lock:
+        stats = _host_stats.get(host)
+        if stats is None:
+            stats = _host_stats[host] = {
+                'requests': 0, 'errors': 0, 'retries': 0, 'total_seconds': 0.0,
+                'max_seconds': 0.0, 'samples': deque(maxlen=LATENCY_SAMPLES),
+            }
+        stats['requests'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['samples'].append(seconds)
+        if error or (status is not None and status >= 500):
+            stats['errors'] += 1
+
+
+def _count_retry(host):
+    with _stats_lock:
+        _host_stats[host]['retries'] += 1
+
+
+def backoff_delay(attempt):
+    """Full jitter: a random wait up to RETRY_BACKOFF * 2^attempt seconds"""
+    return random.uniform(0, RETRY_BACKOFF * (2 ** attempt))
+
+
+def request(method, url, idempotent=None, timeout=None, **kwargs):
+    """
+    requests.request() through the shared session. idempotent defaults to the method's
+    HTTP semantics; pass True for POSTs that are safe to repeat.
+    Raises requests.RequestException once the retries are used up.
+    """
+    method = method.upper()
+    host = urlsplit(url).netloc
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            response = _session.request(method, url, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            _record(host, time.perf_counter() - start, error=True)
+            unsent = isinstance(e, requests.ConnectTimeout)
+            retryable = isinstance(e, (requests.ConnectionError, requests.Timeout)) and (idempotent or unsent)
+            if not retryable or attempt >= MAX_RETRIES:
+                raise
+        else:
+            _record(host, time.perf_counter() - start, status=response.status_code)
+            if not idempotent or response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                return response
+            response.close()
+        _count_retry(host)
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def host_stats():
+    """{host: request/error/retry counts and latency in ms (mean, p50, p95, p99, max)}"""
+    with _stats_lock:
+        snapshot = {host: dict(stats, samples=sorted(stats['samples'])) for host, stats in _host_stats.items()}
+    report = {}
+    for host, stats in snapshot.items():
+        ordered = stats['samples']
+        report[host] = {
+            'requests': stats['requests'],
+            'errors': stats['errors'],
+            'retries': stats['retries'],
+            'total_seconds': round(stats['total_seconds'], 3),
+            'mean_ms': round(stats['total_seconds'] / stats['requests'] * 1000, 2),
+            'p50_ms': round(_percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(_percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(_percentile(ordered, 0.99) * 1000, 2),
+            'max_ms': round(stats['max_seconds'] * 1000, 2),
+        }
+    return report
+
+
+def reset_stats():
+    with _stats_lock:
+        _host_stats.clear()
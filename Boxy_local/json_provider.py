@@ -0,0 +1,49 @@
+"""
+JSON encoding for API responses
+Rows come back from mysql-connector with datetime/date and Decimal values; the app's
+JSON provider encodes them directly (ISO 8601 strings and numbers), so handlers can
+return rows as they are, including the row models in rows.py. Uses orjson when it is installed, else the standard library.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def encode_value(value):
+    """Encode the values json cannot: dates as ISO 8601, Decimals as numbers"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, '__dataclass_fields__'):
+        # Row models (rows.py); a shallow dict, unlike dataclasses.asdict()
+        return {name: getattr(value, name) for name in value.__dataclass_fields__}
+    return DefaultJSONProvider.default(value)
+
+
+class BoxyJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider for database rows; orjson and json give equivalent documents"""
+
+    default = staticmethod(encode_value)
+
+    if orjson is not None:
+        OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+        def dumps(self, obj, **kwargs):
+            if kwargs.keys() - {'separators'}:
+                return super().dumps(obj, **kwargs)
+            return orjson.dumps(obj, default=encode_value, option=self.OPTIONS).decode('utf-8')
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            option = self.OPTIONS | orjson.OPT_APPEND_NEWLINE
+            if (self.compact is None and self._app.debug) or self.compact is False:
+                option |= orjson.OPT_INDENT_2
+            return self._app.response_class(orjson.dumps(obj, default=encode_value, option=option),
+                                            mimetype=self.mimetype)
@@ -0,0 +1,164 @@
+"""
+Request-level performance metrics, exposed in Prometheus text format on /metrics
+init_app() adds before/after-request hooks that time every request per route. While a
+request runs, the database wrapper (database.py), http_client and email_service report
+their time here with record(); it is added to the request's totals and to the
+process-wide totals (background jobs only count in the latter). Each request takes the
+metrics lock once, when it finishes.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import request
+
+# Request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Kinds of work timed inside a request
+KINDS = ('db', 'db_connect', 'http', 'smtp')
+# If set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+_current = ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+_routes = {}     # (route, method) -> histogram and per-kind totals
+_responses = {}  # (route, method, status) -> count
+_totals = {kind: [0, 0.0] for kind in KINDS}  # kind -> [calls, seconds], all threads
+
+
+def record(kind, seconds, calls=1):
+    """Report time spent on a database/HTTP/SMTP call (from any thread)"""
+    current = _current.get()
+    if current is not None:
+        entry = current[kind]
+        entry[0] += calls
+        entry[1] += seconds
+        return
+    with _lock:
+        entry = _totals[kind]
+        entry[0] += calls
+        entry[1] += seconds
+
+
+def _new_route():
+    return {
+        'buckets': [0] * len(LATENCY_BUCKETS),
+        'count': 0,
+        'sum': 0.0,
+        'kinds': {kind: [0, 0.0] for kind in KINDS},
+    }
+
+
+def _start_request():
+    _current.set({kind: [0, 0.0] for kind in KINDS})
+    request.environ['boxy.metrics_start'] = time.perf_counter()
+
+
+def _finish_request(response):
+    # after_request also runs for the 500 response of an unhandled error
+    start = request.environ.pop('boxy.metrics_start', None)
+    current = _current.get()
+    if start is None or current is None:
+        return response
+    seconds = time.perf_counter() - start
+    _current.set(None)
+    rule = request.url_rule
+    key = (rule.rule if rule is not None else 'unmatched', request.method)
+    response_key = key + (response.status_code,)
+    bucket = bisect_left(LATENCY_BUCKETS, seconds)
+
+    with _lock:
+        route = _routes.get(key)
+        if route is None:
+            route = _routes[key] = _new_route()
+        route['count'] += 1
+        route['sum'] += seconds
+        if bucket < len(LATENCY_BUCKETS):
+            route['buckets'][bucket] += 1
+        for kind, (calls, kind_seconds) in current.items():
+            if calls:
+                totals = route['kinds'][kind]
+                totals[0] += calls
+                totals[1] += kind_seconds
+                process_totals = _totals[kind]
+                process_totals[0] += calls
+                process_totals[1] += kind_seconds
+        _responses[response_key] = _responses.get(response_key, 0) + 1
+    return response
+
+
+def init_app(app):
+    """Time every request of app and serve /metrics"""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        routes = {key: dict(route, buckets=list(route['buckets']),
+                            kinds={kind: list(v) for kind, v in route['kinds'].items()})
+                  for key, route in _routes.items()}
+        responses = dict(_responses)
+        totals = {kind: list(v) for kind, v in _totals.items()}
+
+    lines = [
+        '# HELP boxy_request_duration_seconds Request latency by route',
+        '# TYPE boxy_request_duration_seconds histogram',
+    ]
+    for (rule, method), route in sorted(routes.items()):
+        labels = f'route="{_label(rule)}",method="{method}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, route['buckets']):
+            cumulative += count
+            lines.append(f'boxy_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'boxy_request_duration_seconds_bucket{{{labels},le="+Inf"}} {route["count"]}')
+        lines.append(f'boxy_request_duration_seconds_sum{{{labels}}} {route["sum"]:.6f}')
+        lines.append(f'boxy_request_duration_seconds_count{{{labels}}} {route["count"]}')
+
+    lines += ['# HELP boxy_requests_total Responses by route and status',
+              '# TYPE boxy_requests_total counter']
+    for (rule, method, status), count in sorted(responses.items()):
+        lines.append(f'boxy_requests_total{{route="{_label(rule)}",method="{method}",status="{status}"}} {count}')
+
+    for kind in KINDS:
+        lines += [f'# HELP boxy_request_{kind}_calls_total {kind} calls made while serving each route',
+                  f'# TYPE boxy_request_{kind}_calls_total counter']
+        lines += [f'boxy_request_{kind}_calls_total{{route="{_label(rule)}",method="{method}"}} {route["kinds"][kind][0]}'
+                  for (rule, method), route in sorted(routes.items())]
+        lines += [f'# HELP boxy_request_{kind}_seconds_total Time in {kind} calls while serving each route',
+                  f'# TYPE boxy_request_{kind}_seconds_total counter']
+        lines += [f'boxy_request_{kind}_seconds_total{{route="{_label(rule)}",method="{method}"}} '
+                  f'{route["kinds"][kind][1]:.6f}'
+                  for (rule, method), route in sorted(routes.items())]
+
+    lines += ['# HELP boxy_calls_total Database, HTTP and SMTP calls, including background jobs',
+              '# TYPE boxy_calls_total counter']
+    lines += [f'boxy_calls_total{{kind="{kind}"}} {totals[kind][0]}' for kind in KINDS]
+    lines += ['# HELP boxy_call_seconds_total Time in database, HTTP and SMTP calls, including background jobs',
+              '# TYPE boxy_call_seconds_total counter']
+    lines += [f'boxy_call_seconds_total{{kind="{kind}"}} {totals[kind][1]:.6f}' for kind in KINDS]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_endpoint():
+    """GET /metrics (Prometheus scrape target)"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return 'Unauthorized\n', 401, {'Content-Type': 'text/plain'}
+    return render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def reset():
+    """Forget everything recorded (benchmarks)"""
+    with _lock:
+        _routes.clear()
+        _responses.clear()
+        for kind in KINDS:
+            _totals[kind] = [0, 0.0]
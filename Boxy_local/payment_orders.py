@@ -0,0 +1,97 @@
+"""
+Razorpay order preparation
+When a delivery becomes delivered, prepare_payment() runs in the background: it fixes
+the final amount (repricing only if total_amount was never set) and creates the
+Razorpay order, storing its id on the delivery. The payment page and
+/api/payment/create-order then use the stored order instead of calling out while the
+customer waits; they fall back to create_order() only if the stage has not run yet.
+"""
+import http_client
+from config import RAZORPAY_API_BASE, RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET
+from database import get_db_connection
+from pricing import calculate_price, calculate_total_distance
+
+
+class OrderError(Exception):
+    """Razorpay refused or failed to create the order"""
+
+
+def create_order(tracking_id, amount):
+    """Create a Razorpay order for amount (rupees); returns the order dict"""
+    order_data = {
+        'amount': int(round(amount * 100)),  # Convert to paise
+        'currency': 'INR',
+        'receipt': tracking_id,
+        'notes': {
+            'tracking_id': tracking_id,
+            'description': f'Payment for Delivery {tracking_id}'
+        }
+    }
+    response = http_client.post(
+        f'{RAZORPAY_API_BASE}/v1/orders',
+        json=order_data,
+        auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET),
+        headers={'Content-Type': 'application/json'}
+    )
+    if response.status_code != 200:
+        raise OrderError(f'Failed to create order: {response.text}')
+    return response.json()
+
+
+def final_amount(cursor, delivery):
+    """
+    The amount to charge. Needs a dictionary cursor and a delivery row with total_amount,
+    sender_address, weight, total_stops and preferred_vehicle. Reprices (Distance Matrix
+    calls) only for old bookings stored without an amount.
+    """
+    if delivery['total_amount'] and float(delivery['total_amount']) > 0:
+        return float(delivery['total_amount'])
+
+    cursor.execute("""
+        SELECT drop_address FROM delivery_stops
+        WHERE booking_id = %s
+        ORDER BY stop_number
+    """, (delivery['id'],))
+    stops = cursor.fetchall()
+    weight = float(delivery.get('weight', 0) or 0)
+    total_stops = delivery.get('total_stops', 1) or len(stops) or 1
+    total_distance = calculate_total_distance(delivery.get('sender_address', ''), stops)
+    price_breakdown = calculate_price(total_distance, weight, total_stops, delivery.get('preferred_vehicle'))
+    return price_breakdown['total']
+
+
+def prepare_payment(tracking_id):
+    """
+    Background stage for the delivered transition: store the final amount and a Razorpay
+    order id on the delivery. Safe to run more than once. Returns the order id or None.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, total_amount, sender_address, weight, total_stops, preferred_vehicle,
+                   status, payment_status, razorpay_order_id
+            FROM deliveries WHERE id = %s
+        """, (tracking_id,))
+        delivery = cursor.fetchone()
+        if not delivery or delivery['status'] != 'delivered' or delivery['payment_status'] != 'pending':
+            return None
+        if delivery['razorpay_order_id']:
+            return delivery['razorpay_order_id']
+
+        amount = final_amount(cursor, delivery)
+        if amount < 1:
+            # Razorpay minimum amount is 1 rupee (100 paise)
+            return None
+        order = create_order(tracking_id, amount)
+
+        # Keep the first order if another run got there meanwhile
+        cursor.execute("""
+            UPDATE deliveries SET total_amount = %s, razorpay_order_id = %s
+            WHERE id = %s AND razorpay_order_id IS NULL
+        """, (amount, order['id'], tracking_id))
+        stored = cursor.rowcount == 1
+        conn.commit()
+        if not stored:
+            cursor.execute("SELECT razorpay_order_id FROM deliveries WHERE id = %s", (tracking_id,))
+            return cursor.fetchone()['razorpay_order_id']
+        return order['id']
@@ -0,0 +1,147 @@
+"""
+Online payment ingestion
+Razorpay reports a payment twice: the checkout callback (/api/payment/razorpay-success)
+and the signed webhook (/api/payment/razorpay-webhook), and the webhook itself is
+retried and may be replayed. Every report is first recorded in payment_events, whose
+primary key is the Razorpay payment id, so only the first report of a payment gets a
+row. apply_payment() then moves the delivery to completed exactly once.
+
+payment_events.status: received -> applied (delivery paid) or ignored (not payable).
+"""
+import hashlib
+import hmac
+
+import delivery_state
+
+# Webhook events that mean the money was taken
+PAID_EVENTS = ('payment.captured', 'payment.authorized', 'order.paid')
+PAID_STATUSES = ('captured', 'authorized')
+
+
+def create_payment_events_table(cursor):
+    """Create the payment_events table (called from init_database)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payment_events (
+            payment_id VARCHAR(50) PRIMARY KEY,
+            tracking_id VARCHAR(20) NOT NULL,
+            order_id VARCHAR(50) NULL,
+            event_id VARCHAR(50) NULL,
+            source VARCHAR(20) NOT NULL,
+            amount INT NULL,
+            status ENUM('received', 'applied', 'ignored') DEFAULT 'received',
+            received_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+            applied_at TIMESTAMP(3) NULL,
+            INDEX idx_tracking (tracking_id),
+            INDEX idx_status_received (status, received_at)
+        )
+    """)
+
+
+def verify_webhook_signature(body, signature, secret):
+    """X-Razorpay-Signature is the hex HMAC-SHA256 of the raw request body"""
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def verify_checkout_signature(order_id, payment_id, signature, secret):
+    """Checkout callback signature: HMAC-SHA256 of 'order_id|payment_id' with the key secret"""
+    expected = hmac.new(secret.encode('utf-8'), f"{order_id}|{payment_id}".encode('utf-8'),
+                        hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+def _notes(entity):
+    notes = entity.get('notes') or {}
+    return notes if isinstance(notes, dict) else {}  # Razorpay sends [] when there are no notes
+
+
+def parse_webhook(event):
+    """
+    The payment a webhook event reports as paid, as a dict with payment_id, order_id,
+    tracking_id and amount; None for events that do not complete a payment.
+    Checkout does not put notes on the payment, so the tracking id usually comes from
+    the order (order.paid events carry it, with its receipt and notes). When the event
+    has neither, tracking_id is None and the caller finds the delivery by order_id
+    (tracking_id_for_order).
+    """
+    if event.get('event') not in PAID_EVENTS:
+        return None
+    payload = event.get('payload') or {}
+    payment = (payload.get('payment') or {}).get('entity') or {}
+    if payment.get('status') not in PAID_STATUSES or not payment.get('id'):
+        return None
+    order = (payload.get('order') or {}).get('entity') or {}
+    tracking_id = (_notes(payment).get('tracking_id') or _notes(order).get('tracking_id')
+                   or order.get('receipt') or None)
+    if not tracking_id and not payment.get('order_id'):
+        return None
+    return {
+        'payment_id': payment['id'],
+        'order_id': payment.get('order_id'),
+        'tracking_id': tracking_id,
+        'amount': payment.get('amount'),
+    }
+
+
+def tracking_id_for_order(cursor, order_id):
+    """The delivery a Razorpay order was created for (deliveries.razorpay_order_id), or None"""
+    cursor.execute("SELECT id FROM deliveries WHERE razorpay_order_id = %s", (order_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row['id'] if isinstance(row, dict) else row[0]
+
+
+def record_payment(cursor, payment_id, tracking_id, source, order_id=None, event_id=None, amount=None):
+    """Record a payment report; True if it is the first for this payment id"""
+    cursor.execute("""
+        INSERT IGNORE INTO payment_events (payment_id, tracking_id, order_id, event_id, source, amount)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (payment_id, tracking_id, order_id, event_id, source, amount))
+    return cursor.rowcount == 1
+
+
+def record_payments(cursor, payments, source):
+    """Record many payment reports (dicts as returned by parse_webhook) with one statement"""
+    if payments:
+        cursor.executemany("""
+            INSERT IGNORE INTO payment_events (payment_id, tracking_id, order_id, source, amount)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(payment['payment_id'], payment['tracking_id'], payment.get('order_id'), source,
+               payment.get('amount')) for payment in payments])
+
+
+def apply_payment(cursor, payment_id):
+    """
+    Complete the delivery for a recorded payment, once. Locks the payment_events row, so
+    concurrent calls for the same payment serialize and only the first finds it 'received'.
+    Returns (status, changed): status is 'applied' or 'ignored' (delivery not payable) and
+    changed is True only for the call that decided it. (None, False) if never recorded.
+    """
+    cursor.execute("SELECT tracking_id, status FROM payment_events WHERE payment_id = %s FOR UPDATE",
+                   (payment_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None, False
+    tracking_id, status = (row['tracking_id'], row['status']) if isinstance(row, dict) else row
+    if status != 'received':
+        return status, False
+
+    paid = delivery_state.complete_payment(cursor, tracking_id, 'online', details=f'online {payment_id}')
+    status = 'applied' if paid else 'ignored'
+    cursor.execute("UPDATE payment_events SET status = %s, applied_at = NOW(3) WHERE payment_id = %s",
+                   (status, payment_id))
+    return status, True
+
+
+def received_payment_ids(cursor, limit=500):
+    """Recorded payments not yet applied (e.g. the process stopped before the background job ran)"""
+    cursor.execute("""
+        SELECT payment_id FROM payment_events
+        WHERE status = 'received'
+        ORDER BY received_at
+        LIMIT %s
+    """, (limit,))
+    return [row['payment_id'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
@@ -0,0 +1,136 @@
+"""
+Delivery pricing
+Route distance (Google Distance Matrix) and the fare built from it.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+# Pricing Configuration
+BASE_FARE = 30
+PRICE_PER_KM = 8
+PRICE_PER_KG = 5
+EXTRA_STOP_CHARGE = 15
+CAR_EXTRA_CHARGE = 80
+
+# Distance assumed for a leg when the API is not configured or has no answer
+FALLBACK_LEG_KM = 5
+
+# Google Distance Matrix API Key (set in environment variable or config)
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')
+DISTANCE_MATRIX_URL = os.getenv('DISTANCE_MATRIX_URL', 'https://maps.googleapis.com/maps/api/distancematrix/json')
+
+# Parallel Distance Matrix calls made by lookup_distances()
+DISTANCE_LOOKUP_WORKERS = int(os.getenv('DISTANCE_LOOKUP_WORKERS', '8'))
+
+
+def calculate_distance(origin, destination, api_key=None):
+    """
+    Calculate distance between two addresses using Google Distance Matrix API
+    Returns distance in kilometers, or None if API call fails
+    """
+    if not api_key:
+        # Fallback: Return estimated distance (for demo purposes)
+        # In production, you should always use the API
+        return None
+
+    try:
+        url = DISTANCE_MATRIX_URL
+        params = {
+            'origins': origin,
+            'destinations': destination,
+            'key': api_key,
+            'units': 'metric'
+        }
+
+        response = http_client.get(url, params=params, timeout=(http_client.CONNECT_TIMEOUT, 5))
+        data = response.json()
+
+        if data['status'] == 'OK' and data['rows'][0]['elements'][0]['status'] == 'OK':
+            distance_value = data['rows'][0]['elements'][0]['distance']['value'] / 1000  # Convert to km
+            return round(distance_value, 2)
+        else:
+            return None
+    except Exception as e:
+        logger.warning("Distance calculation error: %s", e)
+        return None
+
+
+def route_legs(pickup_address, stops):
+    """(origin, destination) pairs of a route: pickup -> stop 1 -> stop 2 ..."""
+    addresses = [pickup_address] + [stop['drop_address'] for stop in stops]
+    return list(zip(addresses, addresses[1:]))
+
+
+def leg_distance(origin, destination):
+    """Distance of one leg in km, falling back to FALLBACK_LEG_KM"""
+    if GOOGLE_API_KEY:
+        distance = calculate_distance(origin, destination, GOOGLE_API_KEY)
+        if distance:
+            return distance
+    return FALLBACK_LEG_KM
+
+
+def lookup_distances(legs):
+    """
+    Distance for every unique leg, each looked up once (in parallel when the API is configured).
+    Returns {(origin, destination): km} for calculate_total_distance(distances=...).
+    """
+    unique_legs = list(dict.fromkeys(legs))
+    if not GOOGLE_API_KEY or not unique_legs:
+        return dict.fromkeys(unique_legs, FALLBACK_LEG_KM)
+    with ThreadPoolExecutor(max_workers=min(DISTANCE_LOOKUP_WORKERS, len(unique_legs))) as pool:
+        return dict(zip(unique_legs, pool.map(lambda leg: leg_distance(*leg), unique_legs)))
+
+
+def calculate_total_distance(pickup_address, stops, distances=None):
+    """
+    Calculate total distance for multi-stop delivery
+    Returns total distance in kilometers. distances (from lookup_distances) avoids API calls.
+    """
+    if not stops or len(stops) == 0:
+        return 0
+
+    legs = route_legs(pickup_address, stops)
+    if distances is None:
+        total_distance = sum(leg_distance(*leg) for leg in legs)
+    else:
+        total_distance = sum(distances[leg] for leg in legs)
+
+    return round(total_distance, 2)
+
+
+def calculate_price(distance, weight, num_stops, preferred_vehicle=None):
+    """
+    Calculate delivery price based on:
+    - Base Fare: ₹30
+    - Price per km: ₹8
+    - Price per kg: ₹5
+    - Extra stop charge: ₹15 per stop (after first stop)
+    - Car delivery: +₹80 when preferred_vehicle is 'car'
+    """
+    base_fare = BASE_FARE
+    distance_cost = distance * PRICE_PER_KM
+    weight_cost = weight * PRICE_PER_KG
+    extra_stops = max(0, num_stops - 1)  # First stop is free
+    extra_stop_cost = extra_stops * EXTRA_STOP_CHARGE
+    car_fee = CAR_EXTRA_CHARGE if (preferred_vehicle or '').lower() == 'car' else 0
+
+    total = base_fare + distance_cost + weight_cost + extra_stop_cost + car_fee
+
+    return {
+        'base_fare': base_fare,
+        'distance': round(distance, 2),
+        'distance_cost': round(distance_cost, 2),
+        'weight': round(weight, 2),
+        'weight_cost': round(weight_cost, 2),
+        'num_stops': num_stops,
+        'extra_stops': extra_stops,
+        'extra_stop_cost': round(extra_stop_cost, 2),
+        'car_fee': car_fee,
+        'total': round(total, 2)
+    }
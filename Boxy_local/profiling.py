@@ -0,0 +1,157 @@
+"""
+Profiling a live worker
+SamplingProfiler: a background thread that, for a time window, snapshots the stack of
+every other thread (sys._current_frames) every few milliseconds and counts identical
+stacks. The result is in the collapsed format ("frame;frame;frame count" per line)
+read by flamegraph.pl, speedscope and similar tools. Admins start it with
+POST /api/admin/profiler and read it with GET /api/admin/profiler?format=collapsed.
+init_app() also lets a logged-in admin add ?profile=1 to any request to get a cProfile
+summary of that request instead of its response.
+"""
+import cProfile
+import io
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import request, session
+
+# Longest sampling window and shortest interval an admin can ask for
+PROFILE_MAX_SECONDS = 120
+PROFILE_MIN_INTERVAL = 0.001
+# Lines of the ?profile=1 summary (functions by cumulative time)
+PROFILE_SUMMARY_LINES = 40
+
+
+def _frame_name(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """One sampling session at a time; start() returns False while one is running"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.finished = None
+        self.seconds = 0
+        self.interval = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, interval):
+        """Sample all threads every interval seconds for the next seconds seconds"""
+        # Event.wait() raises OverflowError for an infinite timeout, in the sampler thread
+        if not (math.isfinite(seconds) and seconds > 0 and 0 < interval <= seconds):
+            raise ValueError(f'Invalid sampling window: {seconds} s every {interval} s')
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.seconds = seconds
+            self.interval = interval
+            self.started = time.time()
+            self.finished = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """End the current window early"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.perf_counter() + self.seconds
+        while not self._stop.is_set() and time.perf_counter() < deadline:
+            self._sample(own)
+            self._stop.wait(self.interval)
+        self.finished = time.time()
+
+    def _sample(self, own):
+        # Stacks are counted as tuples of code objects (leaf first); names are built on export
+        stacks = self._stacks
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        """Stacks seen so far, one "root;...;leaf count" line each"""
+        names = {}
+        lines = []
+        for stack, count in self._stacks.copy().most_common():
+            for code in stack:
+                if code not in names:
+                    names[code] = _frame_name(code)
+            lines.append(f"{';'.join(names[code] for code in reversed(stack))} {count}\n")
+        return ''.join(lines)
+
+    def status(self):
+        return {
+            'running': self.running,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': self.seconds,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'stacks': len(self._stacks),
+        }
+
+
+sampler = SamplingProfiler()
+
+
+def _start_request_profile():
+    if request.args.get('profile') != '1' or not session.get('admin_logged_in'):
+        return
+    profiler = cProfile.Profile()
+    request.environ['boxy.profiler'] = profiler
+    profiler.enable()
+
+
+def _finish_request_profile(response):
+    profiler = request.environ.pop('boxy.profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    out = io.StringIO()
+    out.write(f'{request.method} {request.full_path} -> {response.status_code}\n')
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    response.set_data(out.getvalue())
+    response.mimetype = 'text/plain'
+    return response
+
+
+def _teardown_request_profile(exc):
+    # Only still set if the response was never finished (e.g. an error in after_request)
+    profiler = request.environ.pop('boxy.profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+
+def init_app(app):
+    """?profile=1 (admins only) on every route of app; register after other hooks"""
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+    app.teardown_request(_teardown_request_profile)
@@ -0,0 +1,153 @@
+"""
+Per-statement database timing and the slow-query log
+database.py's cursor wrapper reports every statement here. Statements are grouped by
+fingerprint (literals, placeholders and IN lists normalized, whitespace collapsed)
+with count, total/max time and recent samples for percentiles. Statements slower than
+DB_SLOW_QUERY_MS are logged with the shape of their bind parameters (never the values)
+and, with DB_SLOW_QUERY_EXPLAIN=1, their EXPLAIN plan. GET /api/admin/db-stats shows
+the top fingerprints.
+"""
+import logging
+import os
+import re
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', '').lower() in ('1', 'true', 'yes')
+# Samples kept per fingerprint for percentiles
+QUERY_SAMPLES = 500
+# Statements whose plan MySQL can EXPLAIN
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s')
+_IN_LISTS = re.compile(r'\bIN \(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_VALUES_LISTS = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\1)+')
+_SPACES = re.compile(r'\s+')
+
+_fingerprints = {}  # statement text -> fingerprint (statements are mostly constants)
+_FINGERPRINT_CACHE_SIZE = 5000
+_lock = threading.Lock()
+_stats = {}
+
+
+def fingerprint(operation):
+    """Normalized form of a statement, shared by all its executions"""
+    cached = _fingerprints.get(operation)
+    if cached is not None:
+        return cached
+    text = operation.decode('utf-8', 'replace') if isinstance(operation, bytes) else operation
+    text = _COMMENTS.sub(' ', text)
+    text = _STRINGS.sub('?', text)
+    text = _PLACEHOLDERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _SPACES.sub(' ', text).strip()
+    text = _VALUES_LISTS.sub(r'\1, ...', text)
+    text = _IN_LISTS.sub('IN (...)', text)
+    if len(_fingerprints) >= _FINGERPRINT_CACHE_SIZE:
+        _fingerprints.clear()
+    _fingerprints[operation] = text
+    return text
+
+
+def param_shape(params):
+    """Types (and lengths) of bind parameters, e.g. (str[12], int, NoneType)"""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{key}: {_value_shape(value)}' for key, value in params.items()) + '}'
+    return '(' + ', '.join(_value_shape(value) for value in params) + ')'
+
+
+def _value_shape(value):
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+
+def record(operation, seconds, params=None, many=False, explain=None):
+    """
+    Add one execution to its fingerprint's stats; log it if slow. explain(operation,
+    params) is called for slow single statements when DB_SLOW_QUERY_EXPLAIN is on.
+    Returns the stats entry, so fetch time can be added to it (add_time).
+    """
+    key = fingerprint(operation)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = {'count': 0, 'total': 0.0, 'max': 0.0, 'slow': 0,
+                                   'samples': deque(maxlen=QUERY_SAMPLES)}
+        entry['count'] += 1
+        entry['total'] += seconds
+        entry['samples'].append(seconds)
+        if seconds > entry['max']:
+            entry['max'] = seconds
+        slow = seconds * 1000 >= SLOW_QUERY_MS
+        if slow:
+            entry['slow'] += 1
+
+    if slow:
+        if many:
+            params = list(params or ())
+            shape = f"{len(params)} rows of {param_shape(params[0]) if params else '()'}"
+        else:
+            shape = param_shape(params)
+        logger.warning("Slow query (%.1f ms): %s params=%s", seconds * 1000, key, shape)
+        if explain is not None and SLOW_QUERY_EXPLAIN and not many \
+                and key.split(' ', 1)[0].upper() in EXPLAINABLE:
+            explain(operation, params)
+    return entry
+
+
+def add_time(entry, seconds):
+    """Add row fetching time to the statement that produced the rows"""
+    with _lock:
+        entry['total'] += seconds
+        if entry['samples']:
+            entry['samples'][-1] += seconds
+            entry['max'] = max(entry['max'], entry['samples'][-1])
+
+
+def log_plan(operation, plan):
+    """Log an EXPLAIN result (list of row dicts) for a slow statement"""
+    rows = '; '.join(', '.join(f'{k}={v}' for k, v in row.items() if v is not None) for row in plan)
+    logger.warning("Plan for %s: %s", fingerprint(operation), rows)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+SORT_KEYS = ('total_ms', 'count', 'mean_ms', 'p95_ms', 'max_ms', 'slow')
+
+
+def top_statements(limit=20, sort='total_ms'):
+    """The limit heaviest fingerprints by sort (one of SORT_KEYS), with timings in ms"""
+    with _lock:
+        snapshot = [(key, dict(entry, samples=sorted(entry['samples']))) for key, entry in _stats.items()]
+    report = []
+    for key, entry in snapshot:
+        ordered = entry['samples']
+        report.append({
+            'statement': key,
+            'count': entry['count'],
+            'slow': entry['slow'],
+            'total_ms': round(entry['total'] * 1000, 2),
+            'mean_ms': round(entry['total'] / entry['count'] * 1000, 3),
+            'p50_ms': round(_percentile(ordered, 0.50) * 1000, 3),
+            'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+            'p99_ms': round(_percentile(ordered, 0.99) * 1000, 3),
+            'max_ms': round(entry['max'] * 1000, 3),
+        })
+    report.sort(key=lambda row: row[sort], reverse=True)
+    return report[:limit]
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
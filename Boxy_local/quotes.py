@@ -0,0 +1,61 @@
+"""
+Price quotes
+/api/calculate-price answers with a quote token: the route (a hash of the pickup and
+drop addresses), weight, vehicle and price, HMAC-signed and valid for QUOTE_TTL
+seconds. create_delivery books at the quoted price when the token matches what is
+being booked, instead of looking up the distances and pricing the route again; a
+missing, altered, expired or mismatched token just means the route is priced as before.
+    token = issue_quote(pickup_address, stops, weight, vehicle, price_breakdown['total'])
+    price = redeem_quote(token, pickup_address, stops, weight, vehicle)  # None: reprice
+Every worker must share QUOTE_SECRET for tokens to be accepted on any of them; when
+it is not set each process picks its own, and tokens from other workers are repriced.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+QUOTE_TTL = int(os.getenv('QUOTE_TTL', '900'))
+QUOTE_SECRET = (os.getenv('QUOTE_SECRET') or secrets.token_hex(32)).encode('utf-8')
+
+
+def route_hash(pickup_address, stops):
+    """Hash of the addresses a price depends on: pickup, then each stop's drop address"""
+    addresses = [pickup_address or ''] + [(stop.get('drop_address') or '').strip() for stop in stops]
+    return hashlib.sha256('\n'.join(addresses).encode('utf-8')).hexdigest()[:32]
+
+
+def quote_key(pickup_address, stops, weight, vehicle):
+    """What a quote is for: (route hash, weight, vehicle), also the quote cache key"""
+    return route_hash(pickup_address, stops), float(weight), (vehicle or '').strip().lower()
+
+
+def _sign(payload):
+    return hmac.new(QUOTE_SECRET, payload, hashlib.sha256).hexdigest()
+
+
+def issue_quote(pickup_address, stops, weight, vehicle, price, ttl=None):
+    """Signed token for booking this route, weight and vehicle at price"""
+    route, weight, vehicle = quote_key(pickup_address, stops, weight, vehicle)
+    expires = int(time.time()) + (QUOTE_TTL if ttl is None else ttl)
+    payload = base64.urlsafe_b64encode(json.dumps([route, weight, vehicle, price, expires],
+                                                  separators=(',', ':')).encode('utf-8'))
+    return f"{payload.decode('ascii')}.{_sign(payload)}"
+
+
+def redeem_quote(token, pickup_address, stops, weight, vehicle):
+    """The quoted price, or None unless token is genuine, unexpired and for this booking"""
+    if not token or not isinstance(token, str) or token.count('.') != 1:
+        return None
+    payload, signature = token.encode('utf-8', 'replace').split(b'.')
+    if not hmac.compare_digest(_sign(payload).encode('ascii'), signature):
+        return None
+    route, quoted_weight, quoted_vehicle, price, expires = json.loads(base64.urlsafe_b64decode(payload))
+    if expires < time.time():
+        return None
+    if (route, quoted_weight, quoted_vehicle) != quote_key(pickup_address, stops, weight, vehicle):
+        return None
+    return price
@@ -0,0 +1,150 @@
+"""
+Nightly payment reconciliation
+Finds delivered bookings still waiting for an online payment (payment_status 'pending')
+and asks Razorpay whether a payment was taken for them anyway, e.g. when both the
+checkout callback and the webhook were lost. Those are completed through the same
+payment_events path as the webhook, so a late webhook is still a no-op.
+
+Pending deliveries are read in keyset batches (by id), each batch is looked up on
+Razorpay with bounded concurrency, and each batch's corrections go in one transaction.
+    python reconcile_payments.py
+    python reconcile_payments.py --batch-size 1000 --concurrency 16 --dry-run
+Cron: 0 2 * * * cd /srv/boxy/Boxy_local && python reconcile_payments.py
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+from app_logging import setup_logging
+from config import RAZORPAY_API_BASE, RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET
+from database import get_db_connection
+from payments import PAID_STATUSES, apply_payment, record_payments
+
+BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', '500'))
+CONCURRENCY = int(os.getenv('RECONCILE_CONCURRENCY', '8'))
+
+logger = logging.getLogger(__name__)
+
+
+def pending_batches(batch_size=BATCH_SIZE):
+    """
+    Yield lists of (delivery id, razorpay_order_id) for delivered, unpaid deliveries,
+    in id order, batch_size at a time
+    """
+    last_id = ''
+    while True:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, razorpay_order_id FROM deliveries
+                WHERE status = 'delivered' AND payment_status = 'pending' AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            batch = cursor.fetchall()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1][0]
+
+
+def find_payment(tracking_id, order_id=None):
+    """
+    The captured or authorized Razorpay payment for a delivery, or None. Uses the order
+    prepared at delivery time when known, else finds orders by receipt (the tracking id).
+    """
+    auth = (RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+    if order_id:
+        order_ids = [order_id]
+    else:
+        response = http_client.get(f'{RAZORPAY_API_BASE}/v1/orders', params={'receipt': tracking_id}, auth=auth)
+        response.raise_for_status()
+        order_ids = [order['id'] for order in response.json().get('items', [])]
+    for order_id in order_ids:
+        response = http_client.get(f"{RAZORPAY_API_BASE}/v1/orders/{order_id}/payments", auth=auth)
+        response.raise_for_status()
+        for payment in response.json().get('items', []):
+            if payment.get('status') in PAID_STATUSES:
+                return {
+                    'payment_id': payment['id'],
+                    'order_id': order_id,
+                    'tracking_id': tracking_id,
+                    'amount': payment.get('amount'),
+                }
+    return None
+
+
+def lookup_batch(pool, batch):
+    """Look the batch up on Razorpay in parallel. Returns (payments found, ids that failed)."""
+    def lookup(row):
+        tracking_id, order_id = row
+        try:
+            return find_payment(tracking_id, order_id), None
+        except Exception as e:
+            logger.warning("Could not check %s: %s", tracking_id, e)
+            return None, tracking_id
+
+    found, failed = [], []
+    for payment, error in pool.map(lookup, batch):
+        if payment:
+            found.append(payment)
+        if error:
+            failed.append(error)
+    return found, failed
+
+
+def apply_corrections(payments):
+    """Record and apply the found payments in one transaction; returns how many were completed"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        record_payments(cursor, payments, 'reconcile')
+        completed = 0
+        for payment in payments:
+            status, changed = apply_payment(cursor, payment['payment_id'])
+            if changed and status == 'applied':
+                completed += 1
+        conn.commit()
+    return completed
+
+
+def reconcile(batch_size=BATCH_SIZE, concurrency=CONCURRENCY, dry_run=False):
+    """Run one reconciliation pass and return its counters"""
+    report = {'batches': 0, 'checked': 0, 'found': 0, 'completed': 0, 'errors': 0}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in pending_batches(batch_size):
+            found, failed = lookup_batch(pool, batch)
+            report['batches'] += 1
+            report['checked'] += len(batch)
+            report['found'] += len(found)
+            report['errors'] += len(failed)
+            if found and not dry_run:
+                report['completed'] += apply_corrections(found)
+    report['seconds'] = round(time.perf_counter() - start, 2)
+    report['per_second'] = round(report['checked'] / report['seconds'], 1) if report['seconds'] else 0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='parallel Razorpay lookups')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be corrected')
+    args = parser.parse_args()
+
+    setup_logging(sys.stderr)  # stdout is for the report
+    report = reconcile(args.batch_size, args.concurrency, args.dry_run)
+    print(f"Checked {report['checked']} pending deliveries in {report['batches']} batches "
+          f"({report['per_second']}/sec, {report['seconds']}s)")
+    print(f"Payments found on Razorpay: {report['found']}, completed: {report['completed']}, "
+          f"lookup errors: {report['errors']}" + (" (dry run)" if args.dry_run else ""))
+    for host, stats in http_client.host_stats().items():
+        print(f"  {host}: {stats['requests']} calls, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Compact row models for delivery list payloads
+Endpoints returning many deliveries (partner dashboard, admin list) read them with
+plain tuple cursors into these slotted dataclasses instead of dictionary rows: no
+dict per row, and the column positions are resolved once per query from
+cursor.column_names rather than per row. json_provider encodes them directly.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from operator import itemgetter
+from typing import Optional
+
+
+def reader(cls, cursor):
+    """
+    Function turning the executed query's tuple rows into cls instances. The query
+    must select every column in cls.COLUMNS (in any order, extra columns are ignored).
+    """
+    columns = cursor.column_names
+    missing = [name for name in cls.COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"{cls.__name__} query is missing columns: {', '.join(missing)}")
+    pick = itemgetter(*[columns.index(name) for name in cls.COLUMNS])
+    return lambda row: cls(*pick(row))
+
+
+def fetch_all(cls, cursor):
+    """All rows of the executed query as cls instances"""
+    make = reader(cls, cursor)
+    return [make(row) for row in cursor.fetchall()]
+
+
+@dataclass(slots=True)
+class Stop:
+    booking_id: str
+    stop_number: int
+    drop_address: str
+    receiver_name: Optional[str]
+    receiver_phone: Optional[str]
+    status: str
+    delivered_at: Optional[datetime]
+
+
+Stop.COLUMNS = tuple(Stop.__slots__)
+
+
+@dataclass(slots=True)
+class Delivery:
+    id: str
+    sender_name: str
+    sender_address: str
+    receiver_name: str
+    receiver_address: str
+    receiver_phone: str
+    parcel_type: str
+    weight: Optional[Decimal]
+    status: str
+    partner_id: Optional[str]
+    total_stops: int
+    created_at: datetime
+    accepted_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    delivered_at: Optional[datetime]
+    total_amount: Optional[Decimal]
+    payment_status: Optional[str]
+    payment_method: Optional[str]
+    preferred_vehicle: Optional[str]
+    stops: list = field(default_factory=list)
+
+
+Delivery.COLUMNS = tuple(name for name in Delivery.__slots__ if name != 'stops')
+
+
+@dataclass(slots=True)
+class DeliverySummary:
+    """A row of the admin dashboard's recent deliveries list"""
+    id: str
+    sender_name: str
+    receiver_name: str
+    status: str
+    created_at: Optional[date]
+    delivered_at: Optional[date]
+    total_stops: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    partner_name: str = 'Unassigned'
+
+    def __post_init__(self):
+        if self.first_name and self.last_name:
+            self.partner_name = f"{self.first_name} {self.last_name}"
+        # The dashboard shows dates as 'Jan 05, 2025'
+        if self.created_at:
+            self.created_at = self.created_at.strftime('%b %d, %Y')
+        if self.delivered_at:
+            self.delivered_at = self.delivered_at.strftime('%b %d, %Y')
+
+
+DeliverySummary.COLUMNS = tuple(name for name in DeliverySummary.__slots__ if name != 'partner_name')
+
+
+def attach_stops(cursor, deliveries):
+    """Load the stops of many deliveries with one query and append them to .stops in order"""
+    if not deliveries:
+        return deliveries
+    by_id = {delivery.id: delivery for delivery in deliveries}
+    placeholders = ', '.join(['%s'] * len(by_id))
+    cursor.execute(f"""
+        SELECT booking_id, stop_number, drop_address, receiver_name, receiver_phone, status, delivered_at
+        FROM delivery_stops
+        WHERE booking_id IN ({placeholders})
+        ORDER BY booking_id, stop_number
+    """, list(by_id))
+    for stop in fetch_all(Stop, cursor):
+        by_id[stop.booking_id].stops.append(stop)
+    return deliveries
@@ -0,0 +1,523 @@
+"""
+Request payload schemas
+Each endpoint's payload is described once as a Schema: a table of field name -> field
+spec, plus cross-field rules. Specs are compiled when the module loads into checker
+functions with their limits, character sets (frozensets) and messages bound,
+so validating a request is one pass over its fields that returns the cleaned values
+and every error at once. Rules and messages are those of validation.py.
+    values, errors = PARTNER_REGISTRATION.validate(request.json)
+    if errors: ... 400 with errors
+"""
+import math
+import string
+
+from delivery_state import PARTNER_STATUSES
+
+# Bike/scooter parcel size limits (cm)
+SMALL_VEHICLES = ('bike', 'scooter')
+SMALL_VEHICLE_MAX_HEIGHT = 60
+SMALL_VEHICLE_MAX_WIDTH = 45
+MAX_STOPS = 5
+
+_ALNUM = string.ascii_letters + string.digits
+
+
+def _charset(predicate, extras):
+    """
+    Test for a whole string: every character satisfies predicate (str.isalpha or
+    str.isalnum, which accept letters of any script) or is one of extras. ASCII text is
+    one frozenset superset check; other text has extras removed and predicate applied
+    to the rest, both in C.
+    """
+    allowed = frozenset(''.join(filter(predicate, map(chr, range(128)))) + extras)
+
+    def ok(text):
+        if allowed.issuperset(text):
+            return True
+        if text.isascii():
+            return False
+        for char in extras:
+            text = text.replace(char, '')
+        return predicate(text)
+    return ok
+
+
+_NAME_CHARS = _charset(str.isalpha, " -'.")
+_EMAIL_LOCAL_CHARS = _charset(str.isalnum, '._-+')
+_EMAIL_DOMAIN_CHARS = _charset(str.isalnum, '.-')
+_VEHICLE_NUMBER_CHARS = _charset(str.isalnum, ' -')
+_PARCEL_TYPE_CHARS = _charset(str.isalnum, ' -/')
+
+
+class Field:
+    """A field spec: compile() returns check(value) -> (clean value, error or None)"""
+
+    def __init__(self, label, required=True):
+        self.label = label
+        self.required = required
+
+    def compile(self):
+        check = self.build()
+        if self.required:
+            return check
+        def optional(value):
+            if value is None or value == '':
+                return None, None
+            return check(value)
+        return optional
+
+    def build(self):
+        raise NotImplementedError
+
+
+class Text(Field):
+    """
+    Stripped string with a length range and, optionally, an allowed character test and
+    characters it may not start or end with
+    """
+
+    def __init__(self, label, min_length=1, max_length=255, chars=None, chars_message=None,
+                 no_double_spaces=False, edges=None, required=True):
+        super().__init__(label, required)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.chars = chars
+        self.chars_message = chars_message or f"{label} contains invalid characters"
+        self.no_double_spaces = no_double_spaces
+        self.edges = edges
+
+    def build(self):
+        label, low, high, chars = self.label, self.min_length, self.max_length, self.chars
+        chars_message, no_double_spaces = self.chars_message, self.no_double_spaces
+        edges = frozenset(self.edges or '')
+        bad_edges = f"{label} cannot start or end with spaces or special characters"
+        required = f"{label} is required"
+        too_short = f"{label} must be at least {low} characters long"
+        too_long = f"{label} must not exceed {high} characters"
+        double_spaces = f"{label} cannot contain consecutive spaces"
+
+        def check(value):
+            if not value or not isinstance(value, str):
+                return None, required
+            value = value.strip()
+            if len(value) < low:
+                return None, too_short
+            if len(value) > high:
+                return None, too_long
+            if chars is not None and not chars(value):
+                return None, chars_message
+            if no_double_spaces and '  ' in value:
+                return None, double_spaces
+            if value[0] in edges or value[-1] in edges:
+                return None, bad_edges
+            return value, None
+        return check
+
+
+class Name(Text):
+    def __init__(self, label, required=True):
+        super().__init__(
+            label, 2, 50, chars=_NAME_CHARS,
+            chars_message=f"{label} contains invalid characters. Only letters, spaces, hyphens, "
+                          f"apostrophes, and dots are allowed",
+            no_double_spaces=True, edges=" -'.", required=required)
+
+
+class Address(Text):
+    def __init__(self, label, required=True):
+        allowed = frozenset(_ALNUM + " .,-/#'()")
+        super().__init__(label, 10, 200, chars=allowed.issuperset, no_double_spaces=True, required=required)
+
+
+class Email(Field):
+    def __init__(self, label='Email', required=True):
+        super().__init__(label, required)
+
+    def build(self):
+        local_ok, domain_ok = _EMAIL_LOCAL_CHARS, _EMAIL_DOMAIN_CHARS
+
+        def check(value):
+            if not value or not isinstance(value, str):
+                return None, "Email is required"
+            value = value.strip()
+            if len(value) < 5:
+                return None, "Email is too short"
+            if len(value) > 100:
+                return None, "Email is too long"
+            local, at, domain = value.partition('@')
+            if not at:
+                return None, "Email must contain @ symbol"
+            if '@' in domain:
+                return None, "Email must have exactly one @ symbol"
+            if not local:
+                return None, "Email local part cannot be empty"
+            if len(local) > 64:
+                return None, "Email local part is too long"
+            if not domain:
+                return None, "Email domain cannot be empty"
+            if '.' not in domain:
+                return None, "Email domain must contain a dot"
+            if len(domain.rsplit('.', 1)[1]) < 2:
+                return None, "Email domain extension must be at least 2 characters"
+            if not local_ok(local):
+                return None, "Email contains invalid characters"
+            if not domain_ok(domain):
+                return None, "Email domain contains invalid characters"
+            return value, None
+        return check
+
+
+class Phone(Field):
+    """10-digit Indian mobile number, optionally written with + - ( ) and spaces"""
+    digits = 10
+    prefixes = '6789'
+
+    def __init__(self, label='Phone number', required=True):
+        super().__init__(label, required)
+
+    def build(self):
+        label, length, prefixes = self.label, self.digits, self.prefixes
+
+        def check(value):
+            if not value or not isinstance(value, str):
+                return None, f"{label} is required"
+            digits = value.strip()
+            if not digits.isdigit():
+                # str.replace beats a translate table on strings this short
+                digits = digits.replace('+', '').replace('-', '').replace(' ', '').replace('(', '').replace(')', '')
+            if not digits.isdigit():
+                return None, f"{label} must contain only digits"
+            if len(digits) != length:
+                return None, f"{label} must be exactly {length} digits"
+            if digits[0] not in prefixes:
+                return None, f"{label} must start with 6, 7, 8, or 9"
+            return value.strip(), None
+        return check
+
+
+class Password(Field):
+    def __init__(self, label='Password', required=True):
+        super().__init__(label, required)
+
+    def build(self):
+        def check(value):
+            if not value or not isinstance(value, str):
+                return None, "Password is required"
+            if len(value) < 6:
+                return None, "Password must be at least 6 characters long"
+            if len(value) > 50:
+                return None, "Password must not exceed 50 characters"
+            if not any(map(str.isalpha, value)):
+                return None, "Password must contain at least one letter"
+            return value, None
+        return check
+
+
+class Aadhar(Field):
+    def __init__(self, label='Aadhar number', required=True):
+        super().__init__(label, required)
+
+    def build(self):
+        def check(value):
+            if not value or not isinstance(value, str):
+                return None, "Aadhar number is required"
+            digits = value.strip()
+            if not digits.isdigit():
+                digits = digits.replace(' ', '').replace('-', '')
+            if not digits.isdigit():
+                return None, "Aadhar number must contain only digits"
+            if len(digits) != 12:
+                return None, "Aadhar number must be exactly 12 digits"
+            if digits.count(digits[0]) == 12:
+                return None, "Aadhar number cannot be all same digits"
+            return digits, None
+        return check
+
+
+class VehicleNumber(Field):
+    def __init__(self, label='Vehicle number', required=True):
+        super().__init__(label, required)
+
+    def build(self):
+        chars = _VEHICLE_NUMBER_CHARS
+
+        def check(value):
+            if not value or not isinstance(value, str):
+                return None, "Vehicle number is required"
+            value = value.strip().upper()
+            if len(value) < 8:
+                return None, "Vehicle number is too short"
+            if len(value) > 15:
+                return None, "Vehicle number is too long"
+            if not chars(value):
+                return None, "Vehicle number can only contain letters, numbers, spaces, and hyphens"
+            return value, None
+        return check
+
+
+class Choice(Field):
+    """One of a fixed set of values, compared lowercased and stripped"""
+
+    def __init__(self, label, choices, message=None, required=True, default=None):
+        super().__init__(label, required)
+        self.choices = tuple(choices)
+        self.message = message or f"{label} must be one of: {', '.join(self.choices)}"
+        self.default = default
+
+    def build(self):
+        allowed, message, default = frozenset(self.choices), self.message, self.default
+        missing = f"{self.label} is required"
+
+        def check(value):
+            if value is None and default is not None:
+                return default, None
+            if not value or not isinstance(value, str):
+                return None, missing
+            value = value.lower().strip()
+            if value not in allowed:
+                return None, message
+            return value, None
+        return check
+
+
+class Number(Field):
+    """Float within (low, high]; low_inclusive makes the lower bound allowed"""
+
+    def __init__(self, label, low, high, too_low, too_high, low_inclusive=False, required=True):
+        super().__init__(label, required)
+        self.low, self.high = low, high
+        self.too_low, self.too_high = too_low, too_high
+        self.low_inclusive = low_inclusive
+
+    def compile(self):
+        # '' counts as missing here, as the bulk CSV leaves empty cells
+        check = self.build()
+        if self.required:
+            return lambda value: check(None if value == '' else value)
+        return super().compile()
+
+    def build(self):
+        low, high, inclusive = self.low, self.high, self.low_inclusive
+        missing, not_number = f"{self.label} is required", f"{self.label} must be a valid number"
+        too_low, too_high = self.too_low, self.too_high
+
+        def check(value):
+            if value is None:
+                return None, missing
+            if isinstance(value, bool):  # JSON true/false are not quantities
+                return None, not_number
+            try:
+                number = float(value)
+            except (ValueError, TypeError):
+                return None, not_number
+            if not math.isfinite(number):  # 'nan' and 'inf' parse, but fail every comparison
+                return None, not_number
+            if number < low or (number == low and not inclusive):
+                return None, too_low
+            if number > high:
+                return None, too_high
+            return number, None
+        return check
+
+
+class Integer(Field):
+    def __init__(self, label, low=1, required=True):
+        super().__init__(label, required)
+        self.low = low
+
+    def build(self):
+        label, low = self.label, self.low
+
+        def check(value):
+            if value is None:
+                return None, f"{label} is required"
+            try:
+                number = int(value)
+            except (ValueError, TypeError):
+                return None, f"{label} must be a valid integer"
+            if number < low:
+                return None, f"{label} must be at least {low}"
+            return number, None
+        return check
+
+
+class TrackingId(Field):
+    def __init__(self, label='Tracking ID', required=True):
+        super().__init__(label, required)
+
+    def build(self):
+        label = self.label
+
+        def check(value):
+            if not value or not isinstance(value, str):
+                return None, f"{label} is required"
+            value = value.strip().upper()
+            if len(value) < 3:
+                return None, f"{label} is too short"
+            if len(value) > 20:
+                return None, f"{label} is too long"
+            if not value.startswith('QP'):
+                return None, f"{label} must start with 'QP'"
+            if not value[2:].isdigit():
+                return None, f"{label} must have digits after 'QP'"
+            return value, None
+        return check
+
+
+class Stops(Field):
+    """List of 1..MAX_STOPS stop dicts (snake_case or camelCase keys); every stop is checked"""
+
+    def __init__(self, label='Stops', max_stops=MAX_STOPS):
+        super().__init__(label, True)
+        self.max_stops = max_stops
+
+    def build(self):
+        max_stops = self.max_stops
+        # Checkers per stop number, compiled once with the stop's labels in their messages
+        per_stop = [(Address(f"Stop {i} drop address").compile(),
+                     Name(f"Stop {i} receiver name").compile(),
+                     Phone().compile())
+                    for i in range(1, max_stops + 1)]
+
+        def check(value):
+            if not value or not isinstance(value, list):
+                return None, ["At least one delivery stop is required"]
+            if len(value) > max_stops:
+                return None, [f"Maximum {max_stops} stops are allowed"]
+            errors, clean = [], []
+            for i, (stop, (address, name, phone)) in enumerate(zip(value, per_stop), 1):
+                if not isinstance(stop, dict):
+                    errors.append(f"Stop {i} is invalid")
+                    continue
+                drop_address, error = address(stop.get('drop_address') or stop.get('dropAddress'))
+                if error:
+                    errors.append(error)
+                receiver_name, error = name(stop.get('receiver_name') or stop.get('receiverName'))
+                if error:
+                    errors.append(error)
+                receiver_phone, error = phone(stop.get('receiver_phone') or stop.get('receiverPhone'))
+                if error:
+                    errors.append(f"Stop {i} receiver phone: {error}")
+                clean.append(dict(stop, drop_address=drop_address, receiver_name=receiver_name,
+                                  receiver_phone=receiver_phone))
+            return (None, errors) if errors else (clean, None)
+        return check
+
+
+class Schema:
+    """
+    fields: {payload key: Field}; rules: functions (values, data) -> error or None,
+    run when every field they read passed
+    """
+
+    def __init__(self, fields, rules=()):
+        self.fields = dict(fields)
+        self._checks = tuple((key, spec.compile()) for key, spec in fields.items())
+        self._rules = tuple(rules)
+
+    def validate(self, data):
+        """(cleaned values, list of every error); values holds the fields that passed"""
+        if not isinstance(data, dict):
+            return {}, ["No data provided"]
+        values, errors = {}, []
+        get = data.get
+        for key, check in self._checks:
+            value, error = check(get(key))
+            if error is None:
+                values[key] = value
+            elif isinstance(error, list):
+                errors.extend(error)
+            else:
+                errors.append(error)
+        for rule in self._rules:
+            try:
+                error = rule(values, data)
+            except KeyError:
+                continue  # a field the rule needs already failed
+            if error:
+                errors.append(error)
+        return values, errors
+
+
+def _other_needs_spec(values, data):
+    if values['parcelType'] != 'other':
+        return None
+    spec = data.get('parcelOtherSpec')
+    if not isinstance(spec, str) or not spec.strip():
+        return 'Please specify what you are sending when parcel type is Other'
+
+
+def _fits_small_vehicle(values, data):
+    if values['preferredVehicle'] not in SMALL_VEHICLES:
+        return None
+    try:
+        height = float(data.get('parcelHeight') or 0)
+        width = float(data.get('parcelWidth') or 0)
+    except (TypeError, ValueError):
+        height = width = 0
+    if height > SMALL_VEHICLE_MAX_HEIGHT or width > SMALL_VEHICLE_MAX_WIDTH:
+        return (f'For Bike/Scooter delivery, parcel size must not exceed {SMALL_VEHICLE_MAX_HEIGHT} cm '
+                f'height and {SMALL_VEHICLE_MAX_WIDTH} cm width. Please reduce dimensions or choose Car.')
+
+
+# POST /api/deliveries/create, and each row of a bulk import
+BOOKING = Schema({
+    'stops': Stops(),
+    'parcelType': Text('Parcel type', 2, 50, chars=_PARCEL_TYPE_CHARS),
+    'parcelWeight': Number('Parcel weight', 0, 1000, 'Parcel weight must be greater than 0',
+                           'Parcel weight cannot exceed 1000 kg'),
+    'preferredVehicle': Choice('Vehicle type', ('bike', 'scooter', 'car'), required=False),
+}, rules=(_other_needs_spec, _fits_small_vehicle))
+
+# POST /api/customer/send-registration-otp
+REGISTRATION_OTP = Schema({
+    'email': Email(),
+    'firstName': Name('First name', required=False),
+})
+
+# POST /api/customer/verify-registration-otp
+CUSTOMER_REGISTRATION = Schema({
+    'firstName': Name('First name'),
+    'lastName': Name('Last name'),
+    'email': Email(),
+    'phone': Phone(),
+    'address': Address('Address'),
+    'password': Password(),
+    'otp': Text('OTP', 4, 4, chars=frozenset(string.digits).issuperset, chars_message='Invalid OTP format'),
+})
+
+# POST /api/partner/register
+PARTNER_REGISTRATION = Schema({
+    'firstName': Name('First name'),
+    'lastName': Name('Last name'),
+    'phone': Phone(),
+    'email': Email(),
+    'vehicleType': Choice('Vehicle type', ('bike', 'scooter', 'car')),
+    'vehicleNumber': VehicleNumber(),
+    'aadhar': Aadhar(),
+    'password': Password(),
+})
+
+# POST /api/partner/status (online/offline; offline when not given)
+PARTNER_STATUS = Schema({
+    'status': Choice('Partner status', ('online', 'offline'), default='offline'),
+})
+
+# POST /api/partner/accept-delivery
+ACCEPT_DELIVERY = Schema({
+    'delivery_id': TrackingId('Delivery ID'),
+})
+
+# POST /api/partner/update-status
+UPDATE_DELIVERY_STATUS = Schema({
+    'delivery_id': TrackingId('Delivery ID'),
+    'status': Choice('Status', PARTNER_STATUSES,
+                     message=f"Status can only be set to: {', '.join(PARTNER_STATUSES)}"),
+})
+
+# POST /api/partner/deliver-stop
+DELIVER_STOP = Schema({
+    'delivery_id': TrackingId('Delivery ID'),
+    'stop_number': Integer('Stop number'),
+})
+
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app modules live flat in Boxy_local/, as app.py imports them
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,75 @@
+"""
+batch_validation against the scalar schema checks, on random and malformed rows.
+No database needed.
+    python -m pytest tests
+"""
+import random
+
+import pytest
+
+import batch_validation
+from schema import BOOKING, Address, Name, Phone
+
+# Values of every shape an upload can carry, well-formed or not
+VALUES = ['', ' ', '  ', 'Ravi Kumar', 'Ravi  Kumar', 'Zoë', "D'Souza", ' -Ravi', 'Ravi3',
+          '12, SG Highway, Bodakdev', '12; SG Highway', 'x' * 201, '9876543210', '98765 43210',
+          '+91 98765 43210', '5876543210', '98765abc10', '2.5', ' 2.5 ', '0', '-1', '1000.5',
+          'nan', 'inf', 'heavy', 'documents', ' Car ', 'truck', 'other', 'bike', '75',
+          None, 0, 2.5, float('nan'), float('inf'), True, False, [], {}, ['x'], {'a': 1}]
+
+FIELDS = {'name': Name('Receiver name'), 'address': Address('Drop address'), 'phone': Phone(),
+          'weight': BOOKING.fields['parcelWeight'], 'type': BOOKING.fields['parcelType'],
+          'vehicle': BOOKING.fields['preferredVehicle']}
+
+
+def random_stop(rng):
+    if rng.random() < 0.05:
+        return rng.choice(VALUES)
+    return {'receiver_name': rng.choice(VALUES + ['Asha Patel'] * 5),
+            'drop_address': rng.choice(VALUES + ['12, SG Highway, Ahmedabad'] * 5),
+            'receiver_phone': rng.choice(VALUES + ['9876543210'] * 5)}
+
+
+def random_row(rng):
+    stops = [random_stop(rng) for _ in range(rng.choice((0, 1, 1, 2, 5, 6)))]
+    row = {'stops': stops if rng.random() < 0.95 else rng.choice(VALUES)}
+    for key in ('parcelType', 'parcelWeight', 'parcelOtherSpec', 'parcelHeight', 'parcelWidth',
+                'preferredVehicle'):
+        if rng.random() < 0.9:
+            row[key] = rng.choice(VALUES)
+    return row
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_booking_errors_match_schema(seed):
+    rng = random.Random(seed)
+    rows = [random_row(rng) for _ in range(500)]
+    expected = {}
+    for index, row in enumerate(rows):
+        found = BOOKING.validate(row)[1]
+        if found:
+            expected[index] = found
+    assert batch_validation.booking_errors(rows) == expected
+
+
+@pytest.mark.parametrize('name', sorted(FIELDS))
+def test_column_errors_match_the_scalar_check(name):
+    field = FIELDS[name]
+    check = field.compile()
+    column = VALUES * 3
+    expected = {index: check(value)[1] for index, value in enumerate(column) if check(value)[1]}
+    assert batch_validation.column_errors(field, column) == expected
+
+
+def test_validate_columns_masks_rows_with_any_error():
+    mask, errors = batch_validation.validate_columns(
+        {'phone': ['9876543210', '123', '9876543210'], 'weight': ['2.5', '2.5', 'nan']},
+        {'phone': FIELDS['phone'], 'weight': FIELDS['weight']})
+    assert list(map(bool, mask)) == [False, True, True]
+    assert set(errors['phone']) == {1} and set(errors['weight']) == {2}
+
+
+def test_validate_columns_needs_equal_lengths():
+    with pytest.raises(ValueError):
+        batch_validation.validate_columns({'phone': ['9876543210'], 'weight': []},
+                                          {'phone': FIELDS['phone'], 'weight': FIELDS['weight']})
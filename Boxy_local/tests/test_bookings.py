@@ -0,0 +1,40 @@
+"""
+build_booking() stores what the booking schema cleaned, not the raw payload.
+No database needed.
+    python -m pytest tests
+"""
+from datetime import datetime
+
+from bookings import build_booking
+from schema import BOOKING
+
+DATA = {'parcelType': ' other ', 'parcelOtherSpec': '  Books ', 'parcelWeight': ' 2.5 ',
+        'parcelHeight': '20', 'parcelWidth': '', 'preferredVehicle': ' Car ',
+        'stops': [{'dropAddress': ' 12, SG Highway, Ahmedabad ', 'receiverName': 'Asha Patel ',
+                   'receiverPhone': '98765 43210'}]}
+
+
+def booking_for(data):
+    values, errors = BOOKING.validate(data)
+    assert errors == []
+    return build_booking('QP000000001', 'Sender', 'Sender address', '', values, data, 120.0,
+                         datetime(2026, 1, 1))
+
+
+def test_cleaned_values_are_stored():
+    booking = booking_for(DATA)
+    assert booking['parcel_type'] == 'other'
+    assert booking['parcel_type_specification'] == 'Books'
+    assert booking['weight'] == 2.5
+    assert booking['preferred_vehicle'] == 'car'
+    assert (booking['parcel_height'], booking['parcel_width']) == (20.0, None)
+    assert booking['receiver_address'] == '12, SG Highway, Ahmedabad'
+    assert booking['receiver_name'] == 'Asha Patel'
+    assert booking['stops'][0]['drop_address'] == '12, SG Highway, Ahmedabad'
+
+
+def test_blank_optional_fields_are_null():
+    booking = booking_for(dict(DATA, parcelType='documents', parcelOtherSpec='', preferredVehicle=''))
+    assert booking['parcel_type_specification'] is None
+    assert booking['preferred_vehicle'] is None
+    assert booking['sender_email'] is None
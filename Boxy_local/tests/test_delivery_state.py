@@ -0,0 +1,181 @@
+"""
+Every (from, to) status pair against the transition table, and the status guards of
+the SQL that performs each transition against the same table, both as written and
+run on SQLite. No database server needed.
+    python -m pytest tests
+"""
+import itertools
+import re
+import sqlite3
+
+import pytest
+
+import delivery_state
+from delivery_state import STATUSES, TRANSITIONS, can_transition
+
+ALL_PAIRS = list(itertools.product(STATUSES, STATUSES))
+
+# The forward chain from the module docstring: each status is reached from the one before it
+EXPECTED = {(current, new) for current, new in zip(STATUSES, STATUSES[1:])}
+
+# Target status -> the UPDATE statements that move a delivery there
+STATEMENTS = {
+    'accepted': [delivery_state._ACCEPT_SQL],
+    'picked': [delivery_state._PARTNER_UPDATE_SQL['picked']],
+    'on_the_way': [delivery_state._PARTNER_UPDATE_SQL['on_the_way']],
+    'delivered': [delivery_state._PARTNER_UPDATE_SQL['delivered']],
+    'completed': list(delivery_state._PAYMENT_SQL.values()),
+}
+
+
+def guarded_statuses(sql):
+    """Statuses the UPDATE's WHERE clause accepts, from its 'status IN (...)' guard"""
+    guards = re.findall(r"\bstatus IN \(([^)]*)\)", sql)
+    assert len(guards) == 1, sql
+    return set(re.findall(r"'([a-z_]+)'", guards[0]))
+
+
+@pytest.mark.parametrize('current, new', ALL_PAIRS)
+def test_can_transition_matches_the_chain(current, new):
+    assert can_transition(current, new) == ((current, new) in EXPECTED)
+
+
+@pytest.mark.parametrize('current, new', ALL_PAIRS)
+def test_sql_guards_match_the_table(current, new):
+    statements = STATEMENTS.get(new, [])
+    assert bool(statements) == (new in TRANSITIONS)
+    for sql in statements:
+        assert (current in guarded_statuses(sql)) == can_transition(current, new)
+
+
+@pytest.mark.parametrize('current', STATUSES)
+def test_stop_completion_only_skips_partner_steps(current):
+    # The last stop may be delivered on any leg after acceptance, but never from
+    # available, delivered or completed
+    allowed = guarded_statuses(delivery_state._STOP_COMPLETION_SQL)
+    assert allowed == set(delivery_state.STOP_COMPLETION_FROM)
+    assert (current in allowed) == (current in ('accepted', 'picked', 'on_the_way'))
+
+
+def test_every_status_is_known():
+    for new, sources in TRANSITIONS.items():
+        assert new in STATUSES
+        assert set(sources) <= set(STATUSES)
+    for sql in itertools.chain.from_iterable(STATEMENTS.values()):
+        assert guarded_statuses(sql) <= set(STATUSES)
+
+
+def test_partners_cannot_set_other_statuses():
+    for status in set(STATUSES) - set(delivery_state.PARTNER_STATUSES):
+        with pytest.raises(ValueError):
+            delivery_state.advance(None, 'QP000000001', 'P1', status)
+
+
+class RowsCursor:
+    """Answers each SELECT with the next prepared row, like a dictionary cursor"""
+
+    def __init__(self, *rows):
+        self.rows = list(rows)
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+
+def delivery(status='available', preferred_vehicle=None):
+    return {'status': status, 'partner_id': None, 'total_stops': 1, 'preferred_vehicle': preferred_vehicle,
+            'payment_status': 'pending', 'payment_method': None}
+
+
+@pytest.mark.parametrize('row, partner, message', [
+    (delivery('accepted'), None, 'Delivery is no longer available'),
+    (delivery(), {'status': 'offline', 'vehicle_type': 'bike'}, 'You must be online to accept deliveries'),
+    (delivery(preferred_vehicle='car'), {'status': 'online', 'vehicle_type': 'bike'},
+     'This delivery is for car only. Your vehicle type does not match.'),
+    # Lost race: nothing about the partner is wrong, someone else accepted it first
+    (delivery(), {'status': 'online', 'vehicle_type': 'bike'}, 'Delivery is no longer available'),
+    (delivery(preferred_vehicle=' Bike '), {'status': 'online', 'vehicle_type': 'bike'},
+     'Delivery is no longer available'),
+])
+def test_accept_rejection_messages(row, partner, message):
+    cursor = RowsCursor(row, partner)
+    assert delivery_state.explain_rejection(cursor, 'QP000000001', 'accepted', 'P1') == (message, 400)
+
+
+class SqliteCursor:
+    """
+    Runs the module's SQL against an in-memory SQLite deliveries table, with
+    MySQL's %s placeholders and NOW(), and dictionary rows like the app's cursors
+    """
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function('NOW', 0, lambda: '2026-01-01 12:00:00')
+        self.conn.executescript("""
+            CREATE TABLE deliveries (
+                id TEXT PRIMARY KEY, status TEXT, partner_id TEXT, total_stops INT DEFAULT 1,
+                delivered_stops INT DEFAULT 0, preferred_vehicle TEXT, payment_status TEXT DEFAULT 'pending',
+                payment_method TEXT, accepted_at TEXT, updated_at TEXT, delivered_at TEXT);
+            CREATE TABLE delivery_events (
+                tracking_id TEXT, event_type TEXT, status TEXT, payment_status TEXT,
+                partner_id TEXT, stop_number INT, details TEXT);
+        """)
+        self.rowcount = -1
+        self._result = None
+
+    def execute(self, sql, params=()):
+        self._result = self.conn.execute(sql.replace('%s', '?'), params)
+        self.rowcount = self._result.rowcount
+
+    def fetchone(self):
+        row = self._result.fetchone()
+        return dict(row) if row is not None else None
+
+    def row(self, sql, params=()):
+        return dict(self.conn.execute(sql, params).fetchone())
+
+
+def seeded(status, partner_id='P1'):
+    cursor = SqliteCursor()
+    cursor.conn.execute("INSERT INTO deliveries (id, status, partner_id) VALUES ('QP000000001', ?, ?)",
+                        (status, partner_id))
+    return cursor
+
+
+@pytest.mark.parametrize('current, new', list(itertools.product(STATUSES, delivery_state.PARTNER_STATUSES)))
+def test_partner_transitions_against_sqlite(current, new):
+    cursor = seeded(current)
+    moved = delivery_state.advance(cursor, 'QP000000001', 'P1', new)
+    assert moved == can_transition(current, new)
+    status = cursor.row("SELECT status FROM deliveries")['status']
+    events = cursor.row("SELECT COUNT(*) AS n FROM delivery_events")['n']
+    if moved:
+        assert (cursor.rowcount, status, events) == (1, new, 1)
+    else:
+        # The guard refused it: no row changed, nothing was recorded, and the reason is given
+        assert (cursor.rowcount, status, events) == (0, current, 0)
+        assert delivery_state.explain_rejection(cursor, 'QP000000001', new, 'P1') == (
+            f"Cannot change status from '{current}' to '{new}'", 400)
+
+
+def test_other_partners_delivery_is_not_advanced():
+    cursor = seeded('accepted')
+    assert not delivery_state.advance(cursor, 'QP000000001', 'P2', 'picked')
+    assert cursor.rowcount == 0
+    assert delivery_state.explain_rejection(cursor, 'QP000000001', 'picked', 'P2') == ('Unauthorized', 403)
+
+
+@pytest.mark.parametrize('current', STATUSES)
+def test_online_payment_against_sqlite(current):
+    cursor = seeded(current)
+    paid = delivery_state.complete_payment(cursor, 'QP000000001', 'online')
+    assert paid == (current == 'delivered')
+    if not paid:
+        assert cursor.rowcount == 0
+        assert cursor.row("SELECT status, payment_status FROM deliveries") == {
+            'status': current, 'payment_status': 'pending'}
+        assert delivery_state.explain_rejection(cursor, 'QP000000001', 'completed', payment_method='online') == (
+            'Delivery not yet completed', 400)
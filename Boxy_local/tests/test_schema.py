@@ -0,0 +1,40 @@
+"""
+Booking schema edge cases the form never sends but the API accepts. No database needed.
+    python -m pytest tests
+"""
+import pytest
+
+from schema import BOOKING
+
+VALID = {'parcelType': 'documents', 'parcelWeight': '2.5', 'parcelHeight': '20', 'parcelWidth': '15',
+         'preferredVehicle': 'bike',
+         'stops': [{'drop_address': '12, SG Highway, Ahmedabad', 'receiver_name': 'Asha Patel',
+                    'receiver_phone': '9876543210'}]}
+
+
+def errors_for(**changes):
+    return BOOKING.validate(dict(VALID, **changes))[1]
+
+
+def test_valid_booking_passes():
+    assert errors_for() == []
+
+
+@pytest.mark.parametrize('spec', [None, '', '   ', 42, 0, True, ['books']])
+def test_other_needs_a_text_spec(spec):
+    assert errors_for(parcelType='other', parcelOtherSpec=spec) == [
+        'Please specify what you are sending when parcel type is Other']
+
+
+def test_other_with_a_spec_passes():
+    assert errors_for(parcelType='other', parcelOtherSpec='Books') == []
+
+
+@pytest.mark.parametrize('weight', ['nan', 'NaN', 'inf', '-inf', float('nan'), float('inf'), True, False])
+def test_weight_must_be_a_finite_number(weight):
+    assert errors_for(parcelWeight=weight)
+
+
+def test_weight_is_cleaned_to_a_float():
+    values, errors = BOOKING.validate(dict(VALID, parcelWeight=' 2.5 '))
+    assert errors == [] and values['parcelWeight'] == 2.5